@@ -0,0 +1,438 @@
+"""Query-count and latency measurement of every API endpoint."""
+import asyncio
+import dataclasses
+import itertools
+import json
+import math
+import time
+from dataclasses import dataclass, field
+from typing import Callable
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import AsyncClient, Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from post import bulk
+from post.models import Hashtag, Post
+from user.models import Profile
+
+
+@dataclass
+class Endpoint:
+    name: str
+    method: str
+    url: str
+    data: object = None
+    # Replay the ETag of the warmup response as If-None-Match.
+    revalidate: bool = False
+    # Token of the user sending the request, the viewer's when None.
+    token: str = None
+    # Called before every request, outside the measurement, by endpoints
+    # that use up what they act on; returns fields of this endpoint to
+    # replace for that request.
+    prepare: Callable = None
+
+
+@dataclass
+class Result:
+    name: str
+    queries: int
+    latencies: list = field(default_factory=list)
+
+    def percentile(self, percent):
+        ordered = sorted(self.latencies)
+        rank = max(math.ceil(percent / 100 * len(ordered)) - 1, 0)
+        return ordered[rank]
+
+    def as_dict(self):
+        return {
+            "queries": self.queries,
+            "p50_ms": round(self.percentile(50), 3),
+            "p95_ms": round(self.percentile(95), 3),
+            "p99_ms": round(self.percentile(99), 3),
+        }
+
+
+def endpoints(seeded):
+    viewer = seeded.viewer
+    other = seeded.users[-1]
+    post_id = viewer.timeline.values_list("post_id", flat=True).first()
+    own_post_id = Post.objects.filter(author=viewer).values_list("id", flat=True)[0]
+    hashtag = seeded.hashtags[0]
+    renamed = seeded.hashtags[-1]
+    numbers = itertools.count()
+
+    def new_hashtag():
+        return {"data": {"name": f"benchmark{next(numbers)}"}}
+
+    def hashtag_to_delete():
+        created = Hashtag.objects.create(name=f"benchmark{next(numbers)}")
+        return {"url": reverse("post:hashtag-detail", args=[created.id])}
+
+    def post_to_delete():
+        created = Post.objects.create(author=viewer, title="Delete", content="c")
+        return {"url": reverse("post:post-detail", args=[created.id])}
+
+    def posts_to_delete():
+        items = [{"title": f"Delete {i}", "content": "c"} for i in range(50)]
+        created = bulk.create_posts(viewer, items)
+        return {"data": {"ids": [post.id for post in created]}}
+
+    def new_user():
+        return {
+            "data": {"email": f"new{next(numbers)}@example.com", "password": "secret"}
+        }
+
+    def other_user(profile=False):
+        user = get_user_model().objects.create_user(
+            email=f"other{next(numbers)}@example.com"
+        )
+        prepared = {"token": Token.objects.create(user=user).key}
+        if profile:
+            created = Profile.objects.create(user=user, username=user.email[:25])
+            prepared["url"] = reverse("user:profile-detail", args=[created.id])
+        return prepared
+
+    return [
+        Endpoint("hashtag-list", "get", reverse("post:hashtag-list")),
+        Endpoint(
+            "hashtag-autocomplete",
+            "get",
+            reverse("post:hashtag-list") + f"?prefix={hashtag.name[:3]}",
+        ),
+        Endpoint(
+            "hashtag-detail",
+            "get",
+            reverse("post:hashtag-detail", args=[hashtag.id]),
+        ),
+        Endpoint("hashtag-trending", "get", reverse("post:hashtag-trending")),
+        Endpoint(
+            "hashtag-create",
+            "post",
+            reverse("post:hashtag-list"),
+            prepare=new_hashtag,
+        ),
+        Endpoint(
+            "hashtag-update",
+            "put",
+            reverse("post:hashtag-detail", args=[renamed.id]),
+            {"name": renamed.name},
+        ),
+        Endpoint(
+            "hashtag-partial-update",
+            "patch",
+            reverse("post:hashtag-detail", args=[renamed.id]),
+            {"name": renamed.name},
+        ),
+        Endpoint("hashtag-destroy", "delete", None, prepare=hashtag_to_delete),
+        Endpoint("post-list", "get", reverse("post:post-list")),
+        Endpoint(
+            "post-list-not-modified", "get", reverse("post:post-list"), revalidate=True
+        ),
+        Endpoint(
+            "post-list-hashtag",
+            "get",
+            reverse("post:post-list") + f"?hashtag={hashtag.name}",
+        ),
+        Endpoint("post-list-search", "get", reverse("post:post-list") + "?q=post"),
+        Endpoint("post-list-ranked", "get", reverse("post:post-list") + "?ranking=top"),
+        Endpoint("post-detail", "get", reverse("post:post-detail", args=[post_id])),
+        Endpoint(
+            "post-update",
+            "put",
+            reverse("post:post-detail", args=[own_post_id]),
+            {
+                "title": "Benchmark",
+                "content": "Benchmark",
+                "author": viewer.id,
+                "hashtag": [hashtag.name],
+            },
+        ),
+        Endpoint(
+            "post-partial-update",
+            "patch",
+            reverse("post:post-detail", args=[own_post_id]),
+            {"title": "Benchmark"},
+        ),
+        Endpoint("post-destroy", "delete", None, prepare=post_to_delete),
+        Endpoint(
+            "post-bulk-delete",
+            "post",
+            reverse("post:post-bulk-delete"),
+            prepare=posts_to_delete,
+        ),
+        Endpoint("async-post-list", "get", reverse("post:async-post-list")),
+        Endpoint(
+            "async-post-detail",
+            "get",
+            reverse("post:async-post-detail", args=[post_id]),
+        ),
+        Endpoint(
+            "post-create",
+            "post",
+            reverse("post:post-list"),
+            {
+                "title": "Benchmark",
+                "content": "Benchmark",
+                "author": viewer.id,
+                "hashtag": [hashtag.name, seeded.hashtags[1].name],
+            },
+        ),
+        Endpoint(
+            "post-bulk-create",
+            "post",
+            reverse("post:post-bulk-create"),
+            [
+                {
+                    "title": f"Bulk {i}",
+                    "content": "Benchmark",
+                    "hashtag": [seeded.hashtags[i % len(seeded.hashtags)].name],
+                }
+                for i in range(50)
+            ],
+        ),
+        Endpoint("profile-list", "get", reverse("user:profile-list")),
+        Endpoint(
+            "profile-detail",
+            "get",
+            reverse("user:profile-detail", args=[other.profile.id]),
+        ),
+        Endpoint(
+            "async-profile-detail",
+            "get",
+            reverse("user:async-profile-detail", args=[other.profile.id]),
+        ),
+        Endpoint(
+            "profile-detail-not-modified",
+            "get",
+            reverse("user:profile-detail", args=[other.profile.id]),
+            revalidate=True,
+        ),
+        Endpoint("profile-suggestions", "get", reverse("user:profile-suggestions")),
+        Endpoint(
+            "profile-relationships",
+            "get",
+            reverse("user:profile-relationships")
+            + "?ids="
+            + ",".join(str(user.id) for user in seeded.users[:100]),
+        ),
+        Endpoint(
+            "profile-follow-switch",
+            "post",
+            reverse("user:profile-follow-switch", args=[other.profile.id]),
+        ),
+        Endpoint(
+            "profile-partial-update",
+            "patch",
+            reverse("user:profile-detail", args=[viewer.profile.id]),
+            {"bio": "Benchmark"},
+        ),
+        Endpoint(
+            "profile-destroy",
+            "delete",
+            None,
+            prepare=lambda: other_user(profile=True),
+        ),
+        Endpoint("user-manage", "get", reverse("user:manage")),
+        Endpoint(
+            "user-manage-update",
+            "put",
+            reverse("user:manage"),
+            {"email": viewer.email, "password": "benchmark"},
+        ),
+        Endpoint(
+            "user-manage-partial-update",
+            "patch",
+            reverse("user:manage"),
+            {"email": viewer.email},
+        ),
+        Endpoint("user-export", "get", reverse("user:export")),
+        Endpoint("user-register", "post", reverse("user:create"), prepare=new_user),
+        Endpoint(
+            "user-login",
+            "post",
+            reverse("user:login"),
+            {"username": viewer.email, "password": "benchmark"},
+        ),
+        Endpoint("user-logout", "delete", reverse("user:logout"), prepare=other_user),
+    ]
+
+
+def throughput_pairs(seeded):
+    """``(name, WSGI view url, async view url)`` of the endpoints with twins."""
+    post_id = seeded.viewer.timeline.values_list("post_id", flat=True).first()
+    profile_id = seeded.users[-1].profile.id
+    return [
+        ("post-list", reverse("post:post-list"), reverse("post:async-post-list")),
+        (
+            "post-detail",
+            reverse("post:post-detail", args=[post_id]),
+            reverse("post:async-post-detail", args=[post_id]),
+        ),
+        (
+            "profile-detail",
+            reverse("user:profile-detail", args=[profile_id]),
+            reverse("user:async-profile-detail", args=[profile_id]),
+        ),
+    ]
+
+
+def testserver():
+    # The test client talks to "testserver", which only the test runner allows.
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, "testserver"])
+
+
+def measure(seeded, iterations, warmup=2):
+    with testserver():
+        return _measure(seeded, iterations, warmup)
+
+
+def throughput(seeded, requests, concurrency):
+    """Requests per second of the WSGI views and of their async twins.
+
+    The WSGI handler serves ``requests`` one after another, like a sync
+    worker thread; the ASGI handler keeps ``concurrency`` of them in flight
+    on one event loop. Both run in this process against the same data, so
+    the numbers compare handler and view overhead, not network behaviour.
+    """
+    headers = {"Authorization": f"Token {seeded.token}"}
+    results = []
+    with testserver():
+        for name, sync_url, async_url in throughput_pairs(seeded):
+            client = Client(headers=headers)
+            start = time.perf_counter()
+            for _ in range(requests):
+                check(name, client.get(sync_url))
+            wsgi = requests / (time.perf_counter() - start)
+
+            start = time.perf_counter()
+            async_to_sync(_gather)(name, async_url, headers, requests, concurrency)
+            asgi = requests / (time.perf_counter() - start)
+            results.append((name, wsgi, asgi))
+    return results
+
+
+async def _gather(name, url, headers, requests, concurrency):
+    client = AsyncClient()
+    slots = asyncio.Semaphore(concurrency)
+
+    async def get():
+        async with slots:
+            check(name, await client.get(url, headers=headers))
+
+    await asyncio.gather(*(get() for _ in range(requests)))
+
+
+def check(name, response):
+    if response.status_code >= 400:
+        raise RuntimeError(
+            f"{name} answered {response.status_code}: "
+            f"{getattr(response, 'data', response.content)}"
+        )
+
+
+def request(seeded, endpoint, **headers):
+    """Prepare one request to ``endpoint``, return a function sending it.
+
+    Streamed responses are read to the end, so their queries are counted.
+    """
+    if endpoint.prepare is not None:
+        endpoint = dataclasses.replace(endpoint, **endpoint.prepare())
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f"Token {endpoint.token or seeded.token}")
+
+    def send():
+        response = getattr(client, endpoint.method)(
+            endpoint.url, endpoint.data, format="json", **headers
+        )
+        if response.streaming:
+            response.getvalue()
+        return response
+
+    return send
+
+
+def _measure(seeded, iterations, warmup):
+    results = []
+    for endpoint in endpoints(seeded):
+        for _ in range(warmup):
+            response = request(seeded, endpoint)()
+        headers = {}
+        if endpoint.revalidate:
+            headers["HTTP_IF_NONE_MATCH"] = response["ETag"]
+
+        result = Result(endpoint.name, queries=0)
+        for _ in range(iterations):
+            send = request(seeded, endpoint, **headers)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                response = send()
+                elapsed = time.perf_counter() - start
+            check(endpoint.name, response)
+            result.latencies.append(elapsed * 1000)
+            result.queries = max(result.queries, len(queries))
+        results.append(result)
+    return results
+
+
+def compare(results, baseline, dataset, latency_tolerance):
+    """Return human readable regressions of ``results`` against ``baseline``."""
+    failures = []
+    same_dataset = baseline.get("dataset") == dataset
+    for result in results:
+        expected = baseline.get("endpoints", {}).get(result.name)
+        if expected is None:
+            continue
+        if result.queries > expected["queries"]:
+            failures.append(
+                f"{result.name}: {result.queries} queries, "
+                f"baseline {expected['queries']}"
+            )
+        p95 = result.percentile(95)
+        limit = expected["p95_ms"] * (1 + latency_tolerance)
+        if same_dataset and latency_tolerance >= 0 and p95 > limit:
+            failures.append(
+                f"{result.name}: p95 {p95:.2f}ms, baseline {expected['p95_ms']}ms"
+            )
+    return failures
+
+
+def load_baseline(path):
+    try:
+        with open(path) as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baseline(path, results, dataset, reset_latencies=False):
+    """Write ``results`` as the baseline at ``path``.
+
+    Query counts are always rewritten. Latencies of endpoints already in
+    a baseline of the same dataset are kept unless ``reset_latencies``, so
+    a noisy run cannot raise the bar other endpoints are checked against.
+    """
+    stored = load_baseline(path)
+    kept = {}
+    if not reset_latencies and stored.get("dataset") == dataset:
+        kept = stored.get("endpoints", {})
+    endpoints = {}
+    for result in results:
+        measured = result.as_dict()
+        if result.name in kept:
+            measured = {**kept[result.name], "queries": measured["queries"]}
+        endpoints[result.name] = measured
+    with open(path, "w") as file:
+        json.dump(
+            {"dataset": dataset, "endpoints": endpoints},
+            file,
+            indent=2,
+            sort_keys=True,
+        )
+        file.write("\n")
@@ -0,0 +1,136 @@
+from pathlib import Path
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from benchmarks import harness
+from benchmarks.seed import Dataset, seed
+from post.hashtag_index import hashtag_index
+from user.authentication import token_cache
+from user.follow_graph import follow_graph
+
+DEFAULT_BASELINE = Path(__file__).resolve().parents[2] / "baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a synthetic dataset, call every API endpoint and report queries "
+        "per request and p50/p95/p99 latency. Fails when the stored baseline "
+        "is exceeded. All data is rolled back afterwards."
+    )
+
+    def add_arguments(self, parser):
+        defaults = Dataset()
+        parser.add_argument("--users", type=int, default=defaults.users)
+        parser.add_argument(
+            "--follows-per-user", type=int, default=defaults.follows_per_user
+        )
+        parser.add_argument(
+            "--posts-per-user", type=int, default=defaults.posts_per_user
+        )
+        parser.add_argument(
+            "--hashtags-per-post", type=int, default=defaults.hashtags_per_post
+        )
+        parser.add_argument("--hashtag-pool", type=int, default=defaults.hashtag_pool)
+        parser.add_argument("--iterations", type=int, default=50)
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+        parser.add_argument(
+            "--latency-tolerance",
+            type=float,
+            default=0.5,
+            help="Allowed relative p95 increase over the baseline, negative "
+            "values only check query counts.",
+        )
+        parser.add_argument(
+            "--throughput",
+            type=int,
+            default=0,
+            metavar="REQUESTS",
+            help="Also compare requests per second of the WSGI views and their "
+            "async twins over this many requests per endpoint.",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=20,
+            help="Requests in flight on the event loop for --throughput.",
+        )
+        parser.add_argument(
+            "--update-baseline",
+            action="store_true",
+            help="Write the measured query counts, and the latencies of new "
+            "endpoints, as the new baseline.",
+        )
+        parser.add_argument(
+            "--reset-latencies",
+            action="store_true",
+            help="With --update-baseline, also rewrite the latencies of "
+            "endpoints already in the baseline.",
+        )
+
+    def handle(self, *args, **options):
+        dataset = Dataset(
+            users=options["users"],
+            follows_per_user=options["follows_per_user"],
+            posts_per_user=options["posts_per_user"],
+            hashtags_per_post=options["hashtags_per_post"],
+            hashtag_pool=options["hashtag_pool"],
+        )
+
+        with transaction.atomic():
+            seeded = seed(dataset)
+            results = harness.measure(seeded, options["iterations"])
+            if options["throughput"]:
+                throughput = harness.throughput(
+                    seeded, options["throughput"], options["concurrency"]
+                )
+            transaction.set_rollback(True)
+        # In-process caches may point at the rolled back rows.
+        cache.clear()
+        token_cache.clear()
+        hashtag_index.invalidate()
+        follow_graph.invalidate()
+
+        self.report(results)
+        if options["throughput"]:
+            self.report_throughput(throughput)
+
+        if options["update_baseline"]:
+            harness.save_baseline(
+                options["baseline"],
+                results,
+                dataset.as_dict(),
+                options["reset_latencies"],
+            )
+            self.stdout.write(
+                self.style.SUCCESS(f"Baseline written to {options['baseline']}")
+            )
+            return
+
+        failures = harness.compare(
+            results,
+            harness.load_baseline(options["baseline"]),
+            dataset.as_dict(),
+            options["latency_tolerance"],
+        )
+        if failures:
+            raise CommandError("Benchmark regressions:\n  " + "\n  ".join(failures))
+        self.stdout.write(self.style.SUCCESS("No regressions against the baseline."))
+
+    def report(self, results):
+        self.stdout.write(
+            f"{'endpoint':<28} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+        )
+        for result in results:
+            row = result.as_dict()
+            self.stdout.write(
+                f"{result.name:<28} {row['queries']:>7} {row['p50_ms']:>8.2f} "
+                f"{row['p95_ms']:>8.2f} {row['p99_ms']:>8.2f}"
+            )
+
+    def report_throughput(self, throughput):
+        self.stdout.write("")
+        self.stdout.write(f"{'endpoint':<28} {'wsgi rps':>9} {'asgi rps':>9}")
+        for name, wsgi, asgi in throughput:
+            self.stdout.write(f"{name:<28} {wsgi:>9.1f} {asgi:>9.1f}")
@@ -0,0 +1,101 @@
+"""Synthetic dataset generation for the benchmark harness."""
+import random
+from dataclasses import asdict, dataclass
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from rest_framework.authtoken.models import Token
+
+from post import search, timeline
+from post.models import Hashtag, Post
+from user import counters
+from user.models import Follow, Profile
+
+BATCH_SIZE = 1000
+
+
+@dataclass(frozen=True)
+class Dataset:
+    users: int = 200
+    follows_per_user: int = 20
+    posts_per_user: int = 10
+    hashtags_per_post: int = 2
+    hashtag_pool: int = 100
+    seed: int = 0
+
+    def as_dict(self):
+        return asdict(self)
+
+
+@dataclass
+class Seeded:
+    viewer: object
+    token: str
+    users: list
+    hashtags: list
+
+
+def seed(dataset):
+    """Bulk insert ``dataset`` and rebuild every derived structure."""
+    rng = random.Random(dataset.seed)
+    User = get_user_model()
+
+    password = make_password("benchmark")
+    users = User.objects.bulk_create(
+        [
+            User(email=f"bench{i}@example.com", password=password)
+            for i in range(dataset.users)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    Profile.objects.bulk_create(
+        [
+            Profile(user=user, username=f"bench{i}", bio="Benchmark user")
+            for i, user in enumerate(users)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    edges = []
+    follows = min(dataset.follows_per_user, dataset.users - 1)
+    for user in users:
+        candidates = [
+            other for other in rng.sample(users, follows + 1) if other is not user
+        ]
+        edges.extend(
+            Follow(follower=user, followee=followee)
+            for followee in candidates[:follows]
+        )
+    Follow.objects.bulk_create(edges, batch_size=BATCH_SIZE, ignore_conflicts=True)
+
+    hashtags = Hashtag.objects.bulk_create(
+        [Hashtag(name=f"bench{i}") for i in range(dataset.hashtag_pool)],
+        batch_size=BATCH_SIZE,
+    )
+    posts = Post.objects.bulk_create(
+        [
+            Post(author=user, title=f"Post {n} by {user.email}", content="Benchmark")
+            for user in users
+            for n in range(dataset.posts_per_user)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+    tags = min(dataset.hashtags_per_post, len(hashtags))
+    Post.hashtag.through.objects.bulk_create(
+        [
+            Post.hashtag.through(post_id=post.id, hashtag_id=hashtag.id)
+            for post in posts
+            for hashtag in rng.sample(hashtags, tags)
+        ],
+        batch_size=BATCH_SIZE,
+    )
+
+    user_ids = [user.id for user in users]
+    timeline.rebuild(user_ids)
+    counters.refresh_follow_counts(user_ids)
+    counters.refresh_post_counts(user_ids)
+    search.get_backend().rebuild()
+
+    viewer = users[0]
+    token = Token.objects.create(user=viewer)
+    return Seeded(viewer=viewer, token=token.key, users=users, hashtags=hashtags)
@@ -0,0 +1,85 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from benchmarks import harness
+from benchmarks.seed import Dataset, seed
+from post.models import Post
+from user.models import Follow
+
+BASELINE = os.path.join(os.path.dirname(harness.__file__), "baseline.json")
+
+
+class BenchmarkApiCommandTest(TestCase):
+    def run_command(self, *args):
+        stdout = StringIO()
+        call_command(
+            "benchmark_api",
+            "--users=20",
+            "--follows-per-user=5",
+            "--posts-per-user=3",
+            "--iterations=2",
+            "--latency-tolerance=-1",
+            *args,
+            stdout=stdout,
+        )
+        return stdout.getvalue()
+
+    def test_query_counts_stay_within_baseline(self):
+        output = self.run_command(f"--baseline={BASELINE}")
+
+        self.assertIn("No regressions", output)
+        self.assertFalse(Post.objects.exists())
+        for name in ("post-destroy", "post-bulk-delete", "user-export", "user-logout"):
+            self.assertIn(name, output)
+
+    def test_throughput_report(self):
+        output = self.run_command(
+            f"--baseline={BASELINE}", "--throughput=4", "--concurrency=2"
+        )
+
+        self.assertIn("asgi rps", output)
+        self.assertIn("profile-detail", output.split("asgi rps")[1])
+
+    def test_query_regression_fails(self):
+        baseline = harness.load_baseline(BASELINE)
+        baseline["endpoints"]["post-list"]["queries"] = 0
+        with tempfile.NamedTemporaryFile("w", suffix=".json", delete=False) as file:
+            json.dump(baseline, file)
+        self.addCleanup(os.remove, file.name)
+
+        with self.assertRaisesMessage(CommandError, "post-list"):
+            self.run_command(f"--baseline={file.name}")
+
+    def test_update_baseline_keeps_stored_latencies(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        path = os.path.join(directory.name, "baseline.json")
+        self.run_command(f"--baseline={path}", "--update-baseline")
+        baseline = harness.load_baseline(path)
+        baseline["endpoints"]["post-list"].update(p95_ms=1234.0, queries=0)
+        del baseline["endpoints"]["post-detail"]
+        with open(path, "w") as file:
+            json.dump(baseline, file)
+
+        self.run_command(f"--baseline={path}", "--update-baseline")
+
+        endpoints = harness.load_baseline(path)["endpoints"]
+        self.assertEqual(endpoints["post-list"]["p95_ms"], 1234.0)
+        self.assertGreater(endpoints["post-list"]["queries"], 0)
+        self.assertIn("post-detail", endpoints)
+
+
+class SeedTest(TestCase):
+    def test_dataset_shape(self):
+        seeded = seed(Dataset(users=10, follows_per_user=3, posts_per_user=2))
+
+        self.assertEqual(len(seeded.users), 10)
+        self.assertEqual(Post.objects.count(), 20)
+        self.assertEqual(Follow.objects.count(), 30)
+        seeded.viewer.profile.refresh_from_db()
+        self.assertEqual(seeded.viewer.profile.following_count, 3)
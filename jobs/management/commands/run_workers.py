@@ -0,0 +1,62 @@
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from jobs.queue import Worker
+
+
+def work(batch_size, drain):
+    worker = Worker(batch_size=batch_size)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    return worker.run(drain=drain)
+
+
+class Command(BaseCommand):
+    help = "Run background job workers until interrupted."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--processes",
+            type=int,
+            default=1,
+            help="Number of worker processes (default 1). SQLite lets one "
+            "process write at a time, keep one worker there.",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            help="Jobs of one kind handed to a handler at once.",
+        )
+        parser.add_argument(
+            "--drain",
+            action="store_true",
+            help="Exit once no job is due instead of waiting for more.",
+        )
+
+    def handle(self, *args, **options):
+        batch_size, drain = options["batch_size"], options["drain"]
+        if options["processes"] <= 1:
+            processed = work(batch_size, drain)
+            self.stdout.write(self.style.SUCCESS(f"Processed {processed} jobs."))
+            return
+
+        # Forked children must not share the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context("fork")
+        workers = [
+            context.Process(target=work, args=(batch_size, drain))
+            for _ in range(options["processes"])
+        ]
+        for process in workers:
+            process.start()
+        try:
+            for process in workers:
+                process.join()
+        except KeyboardInterrupt:
+            # Children got the SIGINT too and finish their current batch.
+            for process in workers:
+                process.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped."))
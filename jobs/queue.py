@@ -0,0 +1,195 @@
+"""Database-backed queue for side effects that should not slow down writes.
+
+Handlers are registered with ``@task(kind)`` and always receive a list of
+JSON payloads, so a worker can hand them every due job of one kind at
+once (up to ``BATCH_SIZE``) and they can do their work in bulk. Jobs are
+rows of ``Job`` written in the caller's transaction: a rolled back write
+never leaves a job behind and a committed one never loses its job.
+
+``manage.py run_workers`` claims and runs jobs. A failing batch is split
+and its jobs retried one by one, each failure pushing the job back by
+``BACKOFF_SECONDS * 2 ** (attempts - 1)`` until ``MAX_ATTEMPTS`` is
+reached and the job is kept as ``failed``. Claims expire after
+``LEASE_SECONDS``, so the jobs of a crashed worker are picked up again;
+handlers must be idempotent.
+
+With ``JOBS["EAGER"]``, the default, ``enqueue`` runs the handler inline
+instead, which needs no worker and keeps tests deterministic. Tasks
+registered with ``eager=False`` are too slow for any request and are
+always queued; until a worker runs them, they must leave the data in a
+correct if slower state.
+"""
+import logging
+import os
+import socket
+import time
+import traceback
+import uuid
+from dataclasses import dataclass
+from datetime import timedelta
+from itertools import islice
+from typing import Callable
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+OPTIONS = {
+    "EAGER": True,
+    "BATCH_SIZE": 100,
+    "MAX_ATTEMPTS": 5,
+    "BACKOFF_SECONDS": 2,
+    "MAX_BACKOFF_SECONDS": 600,
+    "LEASE_SECONDS": 300,
+    "POLL_INTERVAL": 1.0,
+    **getattr(settings, "JOBS", {}),
+}
+
+
+@dataclass
+class Task:
+    kind: str
+    handler: Callable
+    batch_size: int = None
+    eager: bool = True
+
+
+tasks = {}
+
+
+def task(kind, batch_size=None, eager=True):
+    """Register the decorated function as the handler of ``kind`` jobs."""
+
+    def register(handler):
+        tasks[kind] = Task(kind, handler, batch_size, eager)
+        return handler
+
+    return register
+
+
+def get_task(kind):
+    try:
+        return tasks[kind]
+    except KeyError:
+        raise ValueError(f"Unknown job kind {kind!r}.") from None
+
+
+def batch_size(kind):
+    return get_task(kind).batch_size or OPTIONS["BATCH_SIZE"]
+
+
+def enqueue(kind, **payload):
+    enqueue_many(kind, [payload])
+
+
+def enqueue_many(kind, payloads):
+    payloads = iter(payloads)
+    size = batch_size(kind)
+    eager = OPTIONS["EAGER"] and get_task(kind).eager
+    while batch := list(islice(payloads, size)):
+        if eager:
+            get_task(kind).handler(batch)
+        else:
+            Job.objects.bulk_create([Job(kind=kind, payload=p) for p in batch])
+
+
+def backoff(attempts):
+    delay = OPTIONS["BACKOFF_SECONDS"] * 2 ** (attempts - 1)
+    return timedelta(seconds=min(delay, OPTIONS["MAX_BACKOFF_SECONDS"]))
+
+
+def claim(worker_id, limit=None):
+    """Lock the oldest due jobs of one kind for ``worker_id``.
+
+    The claiming ``UPDATE`` re-checks that the jobs are still due, so two
+    workers racing for the same rows each get a disjoint share.
+    """
+    now = timezone.now()
+    due = Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now)
+        | Q(status=Job.RUNNING, locked_until__lt=now)
+    ).order_by("run_at", "id")
+    kind = due.values_list("kind", flat=True).first()
+    if kind is None:
+        return []
+    # Jobs of unknown kinds are claimed alone and fail like any other.
+    size = (limit or batch_size(kind)) if kind in tasks else 1
+    ids = list(due.filter(kind=kind).values_list("id", flat=True)[:size])
+    due.filter(pk__in=ids).update(
+        status=Job.RUNNING,
+        locked_by=worker_id,
+        locked_until=now + timedelta(seconds=OPTIONS["LEASE_SECONDS"]),
+        attempts=F("attempts") + 1,
+    )
+    return list(Job.objects.filter(pk__in=ids, status=Job.RUNNING, locked_by=worker_id))
+
+
+def execute(jobs):
+    """Run claimed ``jobs`` of one kind, return how many succeeded."""
+    try:
+        # The jobs are deleted together with the handler's writes.
+        with transaction.atomic():
+            get_task(jobs[0].kind).handler([job.payload for job in jobs])
+            Job.objects.filter(
+                pk__in=[job.pk for job in jobs], locked_by=jobs[0].locked_by
+            ).delete()
+    except Exception as exc:
+        if len(jobs) > 1:
+            # Retry one by one, so a bad payload does not hold back the rest.
+            return sum(execute([job]) for job in jobs)
+        fail(jobs[0], exc)
+        return 0
+    return len(jobs)
+
+
+def fail(job, exc):
+    error = "".join(traceback.format_exception(exc))
+    if job.attempts >= OPTIONS["MAX_ATTEMPTS"]:
+        logger.error("Job %s failed for good:\n%s", job, error)
+        changes = {"status": Job.FAILED}
+    else:
+        logger.warning("Job %s failed, retrying:\n%s", job, error)
+        changes = {
+            "status": Job.QUEUED,
+            "run_at": timezone.now() + backoff(job.attempts),
+        }
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        locked_by="", locked_until=None, last_error=error, **changes
+    )
+
+
+class Worker:
+    def __init__(self, batch_size=None, poll_interval=None):
+        self.id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval or OPTIONS["POLL_INTERVAL"]
+        self.stopping = False
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run_once(self):
+        """Claim and run one batch, return the number of jobs claimed."""
+        jobs = claim(self.id, self.batch_size)
+        if jobs:
+            execute(jobs)
+        return len(jobs)
+
+    def run(self, drain=False):
+        """Work until stopped, or until no job is due when ``drain``."""
+        processed = 0
+        while not self.stopping:
+            claimed = self.run_once()
+            processed += claimed
+            if not claimed:
+                if drain:
+                    break
+                # Idle: drop connections the database may have timed out.
+                close_old_connections()
+                time.sleep(self.poll_interval)
+        return processed
@@ -0,0 +1,252 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from jobs import queue
+from jobs.models import Job
+from post import search
+from post.models import Post, TimelineEntry
+from user import follows
+
+User = get_user_model()
+
+calls = []
+
+
+@queue.task("tests.record")
+def record(payloads):
+    calls.append([payload["value"] for payload in payloads])
+    if any(payload.get("fail") for payload in payloads):
+        raise RuntimeError("Boom.")
+
+
+@queue.task("tests.slow", eager=False)
+def slow(payloads):
+    record(payloads)
+
+
+def queued():
+    return mock.patch.dict(queue.OPTIONS, {"EAGER": False})
+
+
+class QueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+        self.worker = queue.Worker()
+
+    def test_eager_mode_runs_inline(self):
+        queue.enqueue("tests.record", value=1)
+
+        self.assertEqual(calls, [[1]])
+        self.assertFalse(Job.objects.exists())
+
+    def test_slow_tasks_are_queued_in_eager_mode(self):
+        queue.enqueue("tests.slow", value=1)
+
+        self.assertEqual(calls, [])
+        self.assertEqual(self.worker.run(drain=True), 1)
+        self.assertEqual(calls, [[1]])
+
+    def test_enqueue_rejects_unknown_kinds(self):
+        with self.assertRaises(ValueError):
+            queue.enqueue("tests.missing", value=1)
+
+    def test_jobs_of_one_kind_are_batched(self):
+        with queued():
+            queue.enqueue_many("tests.record", [{"value": n} for n in range(5)])
+            self.assertEqual(calls, [])
+
+            with self.assertNumQueries(7):
+                # Kind, ids, claim, claimed rows and the deletion in a savepoint.
+                self.assertEqual(self.worker.run_once(), 5)
+
+        self.assertEqual(calls, [[0, 1, 2, 3, 4]])
+        self.assertFalse(Job.objects.exists())
+
+    def test_batches_are_bounded(self):
+        with queued(), mock.patch.dict(queue.OPTIONS, {"BATCH_SIZE": 2}):
+            queue.enqueue_many("tests.record", [{"value": n} for n in range(5)])
+            self.worker.run(drain=True)
+
+        self.assertEqual(calls, [[0, 1], [2, 3], [4]])
+
+    def test_failed_job_is_retried_with_backoff(self):
+        with queued():
+            queue.enqueue("tests.record", value=1, fail=True)
+            with self.assertLogs("jobs.queue", "WARNING"):
+                self.worker.run(drain=True)
+
+            job = Job.objects.get()
+            self.assertEqual(job.status, Job.QUEUED)
+            self.assertEqual(job.attempts, 1)
+            self.assertIn("Boom.", job.last_error)
+            self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=1))
+            # Not due yet.
+            self.assertEqual(self.worker.run_once(), 0)
+
+            Job.objects.update(run_at=timezone.now())
+            with self.assertLogs("jobs.queue", "WARNING"):
+                self.worker.run(drain=True)
+
+        job.refresh_from_db()
+        self.assertEqual(job.attempts, 2)
+        self.assertGreater(job.run_at, timezone.now() + timedelta(seconds=3))
+
+    def test_backoff_doubles_up_to_the_limit(self):
+        self.assertEqual(
+            [queue.backoff(attempts).total_seconds() for attempts in (1, 2, 3, 20)],
+            [2, 4, 8, queue.OPTIONS["MAX_BACKOFF_SECONDS"]],
+        )
+
+    def test_job_fails_for_good_after_max_attempts(self):
+        with queued(), mock.patch.dict(queue.OPTIONS, {"BACKOFF_SECONDS": 0}):
+            queue.enqueue("tests.record", value=1, fail=True)
+            with self.assertLogs("jobs.queue", "WARNING") as logs:
+                self.worker.run(drain=True)
+
+        self.assertIn("failed for good", logs.output[-1])
+        job = Job.objects.get()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, queue.OPTIONS["MAX_ATTEMPTS"])
+        self.assertEqual(len(calls), queue.OPTIONS["MAX_ATTEMPTS"])
+
+    def test_failing_job_does_not_hold_back_its_batch(self):
+        with queued():
+            queue.enqueue_many(
+                "tests.record",
+                [{"value": 1}, {"value": 2, "fail": True}, {"value": 3}],
+            )
+            with self.assertLogs("jobs.queue", "WARNING"):
+                self.worker.run_once()
+
+        self.assertEqual(calls, [[1, 2, 3], [1], [2], [3]])
+        self.assertEqual(Job.objects.get().payload["value"], 2)
+
+    def test_expired_claims_are_taken_over(self):
+        with queued():
+            queue.enqueue("tests.record", value=1)
+            self.assertEqual(len(queue.claim("crashed")), 1)
+            self.assertEqual(self.worker.run_once(), 0)
+
+            Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+            self.assertEqual(self.worker.run_once(), 1)
+
+        self.assertEqual(calls, [[1]])
+
+    def test_jobs_roll_back_with_their_transaction(self):
+        with queued(), self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                queue.enqueue("tests.record", value=1)
+                raise RuntimeError
+
+        self.assertFalse(Job.objects.exists())
+
+    def test_run_workers_command_drains_the_queue(self):
+        with queued():
+            queue.enqueue_many("tests.record", [{"value": n} for n in range(3)])
+            stdout = StringIO()
+            call_command("run_workers", "--drain", stdout=stdout)
+
+        self.assertIn("Processed 3 jobs.", stdout.getvalue())
+        self.assertEqual(calls, [[0, 1, 2]])
+
+
+class QueuedSideEffectsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="reader@email.com", password="testpass"
+        )
+        self.author = User.objects.create_user(
+            email="author@email.com", password="testpass"
+        )
+        follows.follow(self.user.id, self.author.id)
+
+    def create_post(self):
+        return Post.objects.create(
+            author=self.author, title="Queued", content="Queued content"
+        )
+
+    def searchable(self, post):
+        found = search.get_backend().search(Post.objects.all(), "queued")
+        return found.filter(pk=post.pk).exists()
+
+    def test_post_side_effects_wait_for_a_worker(self):
+        with queued():
+            post = self.create_post()
+
+            self.assertEqual(
+                list(
+                    TimelineEntry.objects.filter(post=post).values_list(
+                        "owner_id", flat=True
+                    )
+                ),
+                [self.author.id],
+            )
+            self.assertEqual(
+                sorted(Job.objects.values_list("kind", flat=True)),
+                ["post.fan_out", "post.index"],
+            )
+
+            queue.Worker().run(drain=True)
+
+        self.assertEqual(
+            set(
+                TimelineEntry.objects.filter(post=post).values_list(
+                    "owner_id", flat=True
+                )
+            ),
+            {self.user.id, self.author.id},
+        )
+        self.assertTrue(self.searchable(post))
+
+    def test_author_manages_new_post_before_the_fan_out(self):
+        client = APIClient()
+        client.force_authenticate(user=self.author)
+        with queued():
+            response = client.post(
+                reverse("post:post-list"),
+                {
+                    "title": "Queued",
+                    "content": "Queued content",
+                    "author": self.author.id,
+                },
+                format="json",
+            )
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            url = reverse("post:post-detail", kwargs={"pk": response.data["id"]})
+
+            self.assertEqual(client.get(url).status_code, status.HTTP_200_OK)
+            response = client.patch(url, {"title": "Edited"}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = client.delete(url)
+            self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+
+    def test_deleted_post_is_removed_from_the_index(self):
+        post = self.create_post()
+
+        with queued():
+            post.delete()
+            queue.Worker().run(drain=True)
+
+        self.assertFalse(self.searchable(post))
+
+    def test_follow_jobs_settle_on_the_final_edge(self):
+        post = self.create_post()
+        with queued():
+            follows.unfollow(self.user.id, self.author.id)
+            follows.follow(self.user.id, self.author.id)
+            follows.unfollow(self.user.id, self.author.id)
+            queue.Worker().run(drain=True)
+
+        self.assertFalse(
+            TimelineEntry.objects.filter(owner=self.user, post=post).exists()
+        )
@@ -1,6 +1,7 @@
 from django.contrib import admin
 
-from .models import Hashtag, Post
+from .models import Hashtag, Post, TimelineEntry
 
 admin.site.register(Hashtag)
 admin.site.register(Post)
+admin.site.register(TimelineEntry)
@@ -0,0 +1,80 @@
+"""Async twins of the post feed and post detail endpoints.
+
+Same responses as ``PostViewSet.list`` and ``PostViewSet.retrieve``
+without full-text search, conditional GETs and the response cache.
+"""
+from collections import defaultdict
+
+from django.http import JsonResponse
+from rest_framework.exceptions import NotFound, ValidationError
+
+from social_media_api import instrumentation
+from social_media_api.async_views import async_api_view
+
+from . import timeline
+from .models import Post
+from .pagination import PostCursorPagination
+from .serializers import PostDetailSerializer
+from .views import filter_feed
+
+
+@async_api_view
+async def post_list(request):
+    if request.query_params.get("q", "").strip():
+        raise ValidationError({"q": "Search the synchronous post list instead."})
+
+    feed = filter_feed(timeline.feed(request.user.pk), request.query_params)
+    paginator = PostCursorPagination()
+    pulled = [
+        author_id
+        async for author_id in timeline.pulled_authors(request.user.pk).aiterator()
+    ]
+    feed_path = "hybrid" if pulled else "push"
+    instrumentation.tag("feed", feed_path)
+    if pulled:
+        sources = [
+            filter_feed(timeline.pulled_feed(author_id), request.query_params)
+            for author_id in pulled
+        ]
+        posts = await paginator.apaginate_merged(
+            [feed.prefetch_related(None), *sources], request
+        )
+    else:
+        posts = await paginator.apaginate_queryset(feed, request)
+
+    # aiterator() cannot prefetch, the names of the page come in one query.
+    hashtags = defaultdict(list)
+    if posts:
+        links = (
+            Post.hashtag.through.objects.filter(post_id__in=[post.id for post in posts])
+            .order_by("hashtag_id")
+            .values_list("post_id", "hashtag__name")
+        )
+        async for post_id, name in links:
+            hashtags[post_id].append(name)
+
+    data = paginator.get_paginated_response(
+        [
+            {
+                "id": post.id,
+                "title": post.title,
+                "author": post.author_id,
+                "content": post.content,
+                "hashtag": hashtags[post.id],
+            }
+            for post in posts
+        ]
+    ).data
+    response = JsonResponse(data)
+    response["X-Feed-Path"] = feed_path
+    return response
+
+
+@async_api_view
+async def post_detail(request, pk):
+    feed = Post.objects.filter(timeline.visible_to(request.user.pk))
+    try:
+        post = await feed.prefetch_related("hashtag").aget(pk=pk)
+    except Post.DoesNotExist:
+        raise NotFound()
+    return PostDetailSerializer(post).data
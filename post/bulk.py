@@ -0,0 +1,113 @@
+"""Bulk creation and deletion of posts.
+
+``bulk_create`` and raw deletes skip model signals, so ``create_posts``
+and ``delete_posts`` apply the side effects of ``post.signals`` themselves,
+once per batch instead of once per post. On creation: the author's
+timeline, the author's post counter, trending usage and the response
+cache, while fan-out to followers and search indexing are queued as one
+job per post for the workers to run in batches.
+"""
+from collections import Counter
+
+from django.db import router, transaction
+
+from jobs import queue
+from user import counters
+
+from . import response_cache, timeline, trending
+from .hashtag_index import hashtag_index
+from .models import Hashtag, Post, TimelineEntry, normalize_hashtag
+
+BATCH_SIZE = 1000
+
+
+def resolve_hashtags(names):
+    """Map normalized ``names`` to hashtag ids, creating the missing ones.
+
+    One SELECT when every name exists, otherwise an INSERT of the new names
+    and a SELECT of their ids.
+    """
+    names = {normalize_hashtag(name) for name in names} - {""}
+    if not names:
+        return {}
+    ids = dict(Hashtag.objects.filter(name__in=names).values_list("name", "id"))
+    missing = names - ids.keys()
+    if missing:
+        Hashtag.objects.bulk_create(
+            [Hashtag(name=name) for name in missing], ignore_conflicts=True
+        )
+        ids.update(Hashtag.objects.filter(name__in=missing).values_list("name", "id"))
+        response_cache.invalidate_hashtags()
+        transaction.on_commit(lambda: _index_hashtags(missing))
+    return ids
+
+
+def _index_hashtags(names):
+    for name in names:
+        hashtag_index.add(name)
+
+
+def create_posts(author, items):
+    """Create posts from ``items`` of ``title``, ``content`` and ``hashtag``.
+
+    Hashtags are given by name and created when missing. Everything happens
+    in one transaction; returns the created posts in the order of ``items``.
+    """
+    tags = [
+        {normalize_hashtag(name) for name in item.get("hashtag", ())} - {""}
+        for item in items
+    ]
+    with transaction.atomic():
+        hashtag_ids = resolve_hashtags(set().union(*tags))
+        posts = Post.objects.bulk_create(
+            [
+                Post(author=author, title=item["title"], content=item["content"])
+                for item in items
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        links = Post.hashtag.through.objects.bulk_create(
+            [
+                Post.hashtag.through(post_id=post.id, hashtag_id=hashtag_ids[name])
+                for post, names in zip(posts, tags)
+                for name in names
+            ],
+            batch_size=BATCH_SIZE,
+        )
+
+        timeline.add_to_own(posts)
+        payloads = [{"post": post.id} for post in posts]
+        queue.enqueue_many("post.fan_out", payloads)
+        counters.change_post_count(author.pk, len(posts))
+        trending.record_counts(Counter(link.hashtag_id for link in links))
+        queue.enqueue_many("post.index", payloads)
+        response_cache.invalidate_posts([post.id for post in posts])
+    return posts
+
+
+def delete_posts(posts):
+    """Delete ``posts``, applying the delete side effects once per batch.
+
+    Timeline entries and hashtag links go with one query each and the
+    posts with a raw DELETE, which skips the per-row ``post_delete``
+    signals; counters are moved once per author and search removals are
+    queued like in ``create_posts``. Returns the number of deleted posts.
+    """
+    ids = [post.pk for post in posts]
+    if not ids:
+        return 0
+    with transaction.atomic():
+        timeline.touch(ids)
+        TimelineEntry.objects.filter(post_id__in=ids).delete()
+        Post.hashtag.through.objects.filter(post_id__in=ids).delete()
+        # Not .delete(): Post has pre_delete/post_delete receivers, so the
+        # collector would fetch the posts again and send the signals for
+        # each one, repeating per post the side effects applied below.
+        # The related rows are already gone, nothing is left to cascade.
+        deleted = Post.objects.filter(pk__in=ids)._raw_delete(router.db_for_write(Post))
+
+        for author_id, count in Counter(post.author_id for post in posts).items():
+            counters.change_post_count(author_id, -count)
+        queue.enqueue_many("post.index", [{"post": post_id} for post_id in ids])
+        response_cache.invalidate_posts(ids)
+    return deleted
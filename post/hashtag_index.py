@@ -0,0 +1,69 @@
+"""In-process sorted index of hashtag names for prefix autocomplete.
+
+The index is loaded lazily, kept up to date incrementally from the
+``Hashtag`` signals of this process and fully reloaded every
+``HASHTAG_INDEX["TTL"]`` seconds to pick up writes made by other workers.
+"""
+import bisect
+import threading
+import time
+
+from django.conf import settings
+
+from .models import Hashtag, normalize_hashtag
+
+
+class HashtagIndex:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._names = []
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        if (
+            self._loaded_at is not None
+            and time.monotonic() - self._loaded_at < self.ttl
+        ):
+            return
+        # Outlives the request, so never loaded from a lagging replica.
+        names = Hashtag.objects.using("default").order_by("name")
+        names = list(names.values_list("name", flat=True))
+        with self._lock:
+            self._names = names
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def add(self, name):
+        with self._lock:
+            position = bisect.bisect_left(self._names, name)
+            if position == len(self._names) or self._names[position] != name:
+                self._names.insert(position, name)
+
+    def remove(self, name):
+        with self._lock:
+            position = bisect.bisect_left(self._names, name)
+            if position < len(self._names) and self._names[position] == name:
+                del self._names[position]
+
+    def suggest(self, prefix, limit=10):
+        prefix = normalize_hashtag(prefix)
+        self._ensure_loaded()
+        with self._lock:
+            names = self._names
+            position = bisect.bisect_left(names, prefix)
+            suggestions = []
+            while (
+                position < len(names)
+                and len(suggestions) < limit
+                and names[position].startswith(prefix)
+            ):
+                suggestions.append(names[position])
+                position += 1
+        return suggestions
+
+
+hashtag_index = HashtagIndex(getattr(settings, "HASHTAG_INDEX", {}).get("TTL", 300))
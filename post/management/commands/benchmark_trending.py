@@ -0,0 +1,90 @@
+import random
+import time
+from collections import Counter
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from post import trending
+from post.models import Hashtag, HashtagUsage, Post
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the trending-hashtags ranking against a GROUP BY over "
+        "Post.hashtag as post volume grows. Runs in a rolled back transaction."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--volumes", type=int, nargs="+", default=[1000, 10000, 50000]
+        )
+        parser.add_argument("--hashtags", type=int, default=500)
+        parser.add_argument("--tags-per-post", type=int, default=3)
+        parser.add_argument("--repeat", type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options)
+            transaction.set_rollback(True)
+
+    def run(self, options):
+        author = get_user_model().objects.create_user(
+            email="benchmark-trending@example.com"
+        )
+        hashtags = Hashtag.objects.bulk_create(
+            Hashtag(name=f"benchmark-{i}") for i in range(options["hashtags"])
+        )
+        through = Post.hashtag.through
+        rng = random.Random(0)
+        seeded = 0
+
+        self.stdout.write(
+            f"{'posts':>10} {'bucketed ms':>12} {'queries':>8} {'group by ms':>12}"
+        )
+        for volume in sorted(options["volumes"]):
+            posts = Post.objects.bulk_create(
+                Post(author=author, title="benchmark", content="")
+                for _ in range(volume - seeded)
+            )
+            seeded = volume
+            uses = Counter()
+            rows = []
+            for post in posts:
+                for hashtag in rng.sample(hashtags, options["tags_per_post"]):
+                    rows.append(through(post_id=post.id, hashtag_id=hashtag.id))
+                    uses[hashtag.id] += 1
+            through.objects.bulk_create(rows, batch_size=5000)
+            for hashtag_id, count in uses.items():
+                trending.record([hashtag_id], uses=count)
+
+            with CaptureQueriesContext(connection) as queries:
+                bucketed = self.time(lambda: trending.compute("day", 10), options)
+            group_by = self.time(lambda: self.group_by_posts(through), options)
+            self.stdout.write(
+                f"{volume:>10} {bucketed:>12.2f} "
+                f"{len(queries) // options['repeat']:>8} {group_by:>12.2f}"
+            )
+
+        HashtagUsage.objects.all().delete()
+
+    @staticmethod
+    def group_by_posts(through):
+        since = timezone.now() - trending.WINDOWS["day"]
+        return list(
+            through.objects.filter(post__created__gte=since)
+            .values("hashtag__name")
+            .annotate(uses=Count("id"))
+            .order_by("-uses")[:10]
+        )
+
+    @staticmethod
+    def time(func, options):
+        start = time.perf_counter()
+        for _ in range(options["repeat"]):
+            func()
+        return (time.perf_counter() - start) * 1000 / options["repeat"]
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from post import trending
+
+
+class Command(BaseCommand):
+    help = "Delete hashtag usage buckets older than the largest trending window."
+
+    def handle(self, *args, **options):
+        deleted = trending.prune()
+        self.stdout.write(self.style.SUCCESS(f"Deleted {deleted} usage buckets."))
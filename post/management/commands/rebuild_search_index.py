@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from post import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of posts."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            search.get_backend().rebuild()
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
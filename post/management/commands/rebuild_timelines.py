@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from post import timeline
+
+
+class Command(BaseCommand):
+    help = "Rebuild materialized home-feed timelines from posts and follows."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--user",
+            type=int,
+            action="append",
+            dest="users",
+            help="Only rebuild the timeline of this user id (repeatable).",
+        )
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if not options["users"]:
+                # Re-flag pulled authors, e.g. after changing the thresholds.
+                timeline.reset_pull_state()
+            timeline.rebuild(options["users"])
+        self.stdout.write(self.style.SUCCESS("Timelines rebuilt."))
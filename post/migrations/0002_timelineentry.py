@@ -0,0 +1,92 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:50
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def populate_timelines(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    TimelineEntry = apps.get_model("post", "TimelineEntry")
+    Profile = apps.get_model("user", "Profile")
+
+    followers = {}
+    for owner_id, author_id in Profile.following.through.objects.values_list(
+        "profile__user_id", "user_id"
+    ):
+        followers.setdefault(author_id, set()).add(owner_id)
+
+    entries = []
+    for post_id, author_id, created in Post.objects.values_list(
+        "id", "author_id", "created"
+    ).iterator():
+        for owner_id in {author_id, *followers.get(author_id, ())}:
+            entries.append(
+                TimelineEntry(owner_id=owner_id, post_id=post_id, created=created)
+            )
+    TimelineEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ("post", "0001_initial"),
+        ("user", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="post",
+            name="author",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE,
+                related_name="author",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+        migrations.CreateModel(
+            name="TimelineEntry",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField()),
+                (
+                    "owner",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "post",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="timeline_entries",
+                        to="post.post",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        fields=["owner", "-created"], name="timeline_owner_created"
+                    )
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="timelineentry",
+            constraint=models.UniqueConstraint(
+                fields=("owner", "post"), name="unique_timeline_entry"
+            ),
+        ),
+        migrations.RunPython(populate_timelines, migrations.RunPython.noop),
+    ]
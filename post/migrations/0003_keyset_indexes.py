@@ -0,0 +1,33 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0002_timelineentry"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="timelineentry",
+            name="timeline_owner_created",
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(fields=["-created", "-id"], name="post_created_id"),
+        ),
+        migrations.AddIndex(
+            model_name="post",
+            index=models.Index(
+                fields=["author", "-created", "-id"], name="post_author_created_id"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="timelineentry",
+            index=models.Index(
+                fields=["owner", "-created", "-post"],
+                name="timeline_owner_created_post",
+            ),
+        ),
+    ]
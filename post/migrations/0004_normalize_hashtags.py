@@ -0,0 +1,40 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:58
+
+from django.db import migrations
+
+
+def normalize_hashtags(apps, schema_editor):
+    Hashtag = apps.get_model("post", "Hashtag")
+    Through = apps.get_model("post", "Post").hashtag.through
+
+    canonical = {}
+    for hashtag in Hashtag.objects.order_by("id"):
+        name = hashtag.name.strip().lower()
+        if name not in canonical:
+            canonical[name] = hashtag
+            continue
+
+        # Merge case-variants into the oldest hashtag with that name.
+        keep = canonical[name]
+        tagged = set(
+            Through.objects.filter(hashtag=keep).values_list("post_id", flat=True)
+        )
+        Through.objects.filter(hashtag=hashtag).exclude(post_id__in=tagged).update(
+            hashtag=keep
+        )
+        hashtag.delete()
+
+    for name, hashtag in canonical.items():
+        if hashtag.name != name:
+            hashtag.name = name
+            hashtag.save(update_fields=["name"])
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0003_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_hashtags, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:00
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0004_normalize_hashtags"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="HashtagUsage",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("bucket", models.DateTimeField()),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "hashtag",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="usage",
+                        to="post.hashtag",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="hashtagusage",
+            constraint=models.UniqueConstraint(
+                fields=("bucket", "hashtag"), name="unique_hashtag_usage_bucket"
+            ),
+        ),
+    ]
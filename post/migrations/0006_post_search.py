@@ -0,0 +1,31 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:05
+
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "sqlite":
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS post_search USING fts5("
+        "title, content, tokenize = 'unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute(
+        "INSERT INTO post_search (rowid, title, content) "
+        "SELECT id, title, content FROM post_post"
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == "sqlite":
+        schema_editor.execute("DROP TABLE IF EXISTS post_search")
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0005_hashtagusage"),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:14
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_created(apps, schema_editor):
+    Post = apps.get_model("post", "Post")
+    Post.objects.update(updated=F("created"))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0006_post_search"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="post",
+            name="updated",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_created, migrations.RunPython.noop),
+    ]
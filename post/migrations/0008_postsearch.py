@@ -0,0 +1,35 @@
+# Generated by Django 4.2.2 on 2026-10-18 21:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("post", "0007_post_updated"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="PostSearch",
+            fields=[
+                (
+                    "post",
+                    models.OneToOneField(
+                        db_column="rowid",
+                        db_constraint=False,
+                        on_delete=django.db.models.deletion.DO_NOTHING,
+                        primary_key=True,
+                        related_name="search_document",
+                        serialize=False,
+                        to="post.post",
+                    ),
+                ),
+                ("document", models.TextField(db_column="post_search")),
+            ],
+            options={
+                "db_table": "post_search",
+                "managed": False,
+            },
+        ),
+    ]
@@ -1,11 +1,54 @@
-from django.db import models
+import sys
+
+from django.db import connections, models
 
 from social_media_api import settings
 
 
+def normalize_hashtag(name):
+    return name.strip().lower()
+
+
+def prefix_successor(prefix):
+    """Smallest string above every string starting with ``prefix``.
+
+    ``None`` when there is none, for a prefix of only U+10FFFF.
+    """
+    stripped = prefix.rstrip(chr(sys.maxunicode))
+    if not stripped:
+        return None
+    return stripped[:-1] + chr(ord(stripped[-1]) + 1)
+
+
+class HashtagQuerySet(models.QuerySet):
+    def with_prefix(self, prefix):
+        """Names starting with ``prefix``.
+
+        SQLite cannot serve ``startswith`` (a ``LIKE``) from the name index,
+        so there the prefix also becomes a range scan, which holds because
+        its default ``BINARY`` collation orders names by code point.
+        """
+        prefix = normalize_hashtag(prefix)
+        if not prefix:
+            return self
+        queryset = self.filter(name__startswith=prefix)
+        if connections[self.db].vendor == "sqlite":
+            queryset = queryset.filter(name__gte=prefix)
+            upper = prefix_successor(prefix)
+            if upper is not None:
+                queryset = queryset.filter(name__lt=upper)
+        return queryset
+
+
 class Hashtag(models.Model):
     name = models.CharField(max_length=120, unique=True)
 
+    objects = HashtagQuerySet.as_manager()
+
+    def save(self, *args, **kwargs):
+        self.name = normalize_hashtag(self.name)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
@@ -17,7 +60,84 @@ class Post(models.Model):
     title = models.CharField(max_length=255)
     content = models.TextField()
     created = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     hashtag = models.ManyToManyField(Hashtag, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=("-created", "-id"), name="post_created_id"),
+            models.Index(
+                fields=("author", "-created", "-id"), name="post_author_created_id"
+            ),
+        ]
+
     def __str__(self):
         return self.title
+
+
+class PostSearch(models.Model):
+    """Row of the SQLite FTS5 ``post_search`` table (see ``post.search``).
+
+    Only lets the ORM join the index; rows are written by the backend.
+    """
+
+    post = models.OneToOneField(
+        Post,
+        on_delete=models.DO_NOTHING,
+        primary_key=True,
+        db_column="rowid",
+        db_constraint=False,
+        related_name="search_document",
+    )
+    # FTS5's hidden column named after the table, the left side of MATCH.
+    document = models.TextField(db_column="post_search")
+
+    class Meta:
+        managed = False
+        db_table = "post_search"
+
+
+class HashtagUsage(models.Model):
+    """Number of times ``hashtag`` was attached to posts during ``bucket``."""
+
+    hashtag = models.ForeignKey(Hashtag, on_delete=models.CASCADE, related_name="usage")
+    bucket = models.DateTimeField()
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("bucket", "hashtag"), name="unique_hashtag_usage_bucket"
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.hashtag} @ {self.bucket}: {self.count}"
+
+
+class TimelineEntry(models.Model):
+    """Materialized home feed row: ``post`` is visible in ``owner``'s feed."""
+
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="timeline"
+    )
+    post = models.ForeignKey(
+        Post, on_delete=models.CASCADE, related_name="timeline_entries"
+    )
+    created = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("owner", "post"), name="unique_timeline_entry"
+            ),
+        ]
+        indexes = [
+            models.Index(
+                fields=("owner", "-created", "-post"),
+                name="timeline_owner_created_post",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.owner} <- {self.post}"
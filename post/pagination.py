@@ -0,0 +1,21 @@
+from rest_framework.pagination import PageNumberPagination
+
+from social_media_api.pagination import KeysetCursorPagination
+
+
+class PostCursorPagination(KeysetCursorPagination):
+    """Feed pages keyed on the annotations of ``post.timeline.feed``."""
+
+    ordering = ("-feed_created", "-feed_post")
+    position_fields = {"feed_created": "created", "feed_post": "id"}
+
+    def get_position_field(self, model, name):
+        return model._meta.get_field(self.position_fields[name])
+
+
+class PostSearchPagination(PageNumberPagination):
+    """Search results are ordered by rank, which has no keyset to resume from."""
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
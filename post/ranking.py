@@ -0,0 +1,170 @@
+"""Ranked home feed (``?ranking=top``).
+
+``candidates`` reads a bounded candidate set, the newest
+``FEED_RANKING["CANDIDATES"]`` posts of the feed, in one query per source. ``rank``
+passes it through the chain of ``SCORERS``: each scorer loads the features
+it needs for all candidates at once in ``prepare`` and then multiplies
+every candidate's score by its own factor. The page is picked from the
+scored candidates with a heap.
+
+Ranking is best effort. Once a request has spent ``BUDGET_MS`` in it, the
+remaining scorers are skipped and the candidates come back in
+chronological order.
+"""
+import heapq
+import time
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from operator import attrgetter
+
+from django.conf import settings
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from user.models import Follow
+
+from .models import Post
+
+OPTIONS = {
+    "CANDIDATES": 500,
+    "BUDGET_MS": 50,
+    "SCORERS": [
+        ("post.ranking.RecencyScorer", {"half_life_hours": 24}),
+        ("post.ranking.AuthorAffinityScorer", {"boost": 1.0}),
+        ("post.ranking.HashtagAffinityScorer", {"boost": 1.0, "history": 100}),
+    ],
+    **getattr(settings, "FEED_RANKING", {}),
+}
+
+
+@dataclass
+class Candidate:
+    post_id: int
+    author_id: int
+    created: datetime
+    score: float = 1.0
+
+
+class Scorer:
+    def prepare(self, user, candidates):
+        """Load the features of all ``candidates`` in bulk."""
+
+    def score(self, candidate):
+        raise NotImplementedError
+
+
+class RecencyScorer(Scorer):
+    """Halves the score every ``half_life_hours``."""
+
+    def __init__(self, half_life_hours=24):
+        self.half_life = half_life_hours * 3600
+
+    def prepare(self, user, candidates):
+        self.now = timezone.now()
+
+    def score(self, candidate):
+        age = max((self.now - candidate.created).total_seconds(), 0)
+        return 0.5 ** (age / self.half_life)
+
+
+class AuthorAffinityScorer(Scorer):
+    """Favours authors who follow the user back."""
+
+    def __init__(self, boost=1.0):
+        self.boost = boost
+
+    def prepare(self, user, candidates):
+        authors = {candidate.author_id for candidate in candidates}
+        self.mutual = set(
+            Follow.objects.filter(followee=user, follower_id__in=authors).values_list(
+                "follower_id", flat=True
+            )
+        )
+
+    def score(self, candidate):
+        return 1 + self.boost if candidate.author_id in self.mutual else 1
+
+
+class HashtagAffinityScorer(Scorer):
+    """Favours hashtags the user put on their own last ``history`` posts."""
+
+    def __init__(self, boost=1.0, history=100):
+        self.boost = boost
+        self.history = history
+
+    def prepare(self, user, candidates):
+        self.affinity = {}
+        self.hashtags = defaultdict(list)
+        recent = Post.objects.filter(author=user).order_by("-created", "-id")
+        usage = Counter(
+            Post.hashtag.through.objects.filter(
+                post_id__in=recent.values("id")[: self.history]
+            ).values_list("hashtag_id", flat=True)
+        )
+        if not usage:
+            return
+        total = sum(usage.values())
+        self.affinity = {hashtag_id: uses / total for hashtag_id, uses in usage.items()}
+        links = Post.hashtag.through.objects.filter(
+            post_id__in=[candidate.post_id for candidate in candidates],
+            hashtag_id__in=self.affinity,
+        ).values_list("post_id", "hashtag_id")
+        for post_id, hashtag_id in links:
+            self.hashtags[post_id].append(hashtag_id)
+
+    def score(self, candidate):
+        return 1 + self.boost * sum(
+            self.affinity[hashtag_id] for hashtag_id in self.hashtags[candidate.post_id]
+        )
+
+
+def get_scorers():
+    # Scorers keep the features of one request, build them per request.
+    return [import_string(path)(**kwargs) for path, kwargs in OPTIONS["SCORERS"]]
+
+
+def candidates(*querysets):
+    """The newest ``CANDIDATES`` posts of ``querysets``, newest first.
+
+    Several querysets, such as pushed and pulled posts of a hybrid feed,
+    are merged and posts found in more than one are kept once. They are
+    keyed like ``timeline.feed``.
+    """
+    limit = OPTIONS["CANDIDATES"]
+    sources = [
+        [
+            Candidate(*row)
+            for row in queryset.prefetch_related(None)
+            .order_by("-feed_created", "-feed_post")
+            .values_list("id", "author_id", "feed_created")[:limit]
+        ]
+        for queryset in querysets
+    ]
+    merged = heapq.merge(*sources, key=attrgetter("created", "post_id"), reverse=True)
+    seen = set()
+    result = []
+    for candidate in merged:
+        if candidate.post_id not in seen:
+            seen.add(candidate.post_id)
+            result.append(candidate)
+            if len(result) == limit:
+                break
+    return result
+
+
+def rank(user, candidates, limit):
+    """Return the ``limit`` best ``candidates`` and whether they are ranked.
+
+    ``candidates`` must be newest first, which is also the order returned
+    when the time budget runs out.
+    """
+    deadline = time.monotonic() + OPTIONS["BUDGET_MS"] / 1000
+    for scorer in get_scorers():
+        if time.monotonic() > deadline:
+            return candidates[:limit], False
+        scorer.prepare(user, candidates)
+        for candidate in candidates:
+            candidate.score *= scorer.score(candidate)
+    # nlargest is stable, equal scores stay newest first.
+    return heapq.nlargest(limit, candidates, key=attrgetter("score")), True
@@ -0,0 +1,110 @@
+"""Versioned cache of post detail and hashtag list responses.
+
+Every cache key embeds version tokens that are replaced whenever the
+underlying rows change (see ``post.signals``), so a write makes all
+previously cached responses unreachable instead of deleting them. A post
+detail key combines the post's own version with the hashtag names
+version, because renaming or deleting a hashtag changes every post
+showing it. Creating hashtags only moves the hashtag list version, so
+the steady stream of new tags leaves cached post details alone.
+
+The same tokens validate feeds: each timeline has a version, bumped
+whenever its entries or the posts they show change (see
+``post.timeline``), so a conditional GET of the feed reads a few cache
+keys instead of aggregating the timeline.
+
+Versions are bumped immediately and again when the transaction commits:
+a response built from pre-commit data by a concurrent reader ends up
+under a version that is already stale.
+"""
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+OPTIONS = {
+    "CACHE_ALIAS": "default",
+    "TTL": 600,
+    **getattr(settings, "RESPONSE_CACHE", {}),
+}
+
+HASHTAGS = "response-version:hashtags"
+HASHTAG_NAMES = "response-version:hashtag-names"
+TIMELINES = "response-version:timelines"
+
+
+def _cache():
+    return caches[OPTIONS["CACHE_ALIAS"]]
+
+
+def _post_version_key(post_id):
+    return f"response-version:post:{post_id}"
+
+
+def _timeline_version_key(owner_id):
+    return f"response-version:timeline:{owner_id}"
+
+
+def _version(key):
+    version = _cache().get(key)
+    if version is None:
+        _cache().add(key, uuid.uuid4().hex, None)
+        version = _cache().get(key)
+    return version
+
+
+def _bump(*keys):
+    def bump():
+        _cache().set_many({key: uuid.uuid4().hex for key in keys}, None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def post_detail_key(post_id):
+    return (
+        f"response:post:{post_id}:"
+        f"{_version(_post_version_key(post_id))}:{_version(HASHTAG_NAMES)}"
+    )
+
+
+def hashtag_list_key(query_string=""):
+    return f"response:hashtags:{_version(HASHTAGS)}:{query_string}"
+
+
+def feed_versions(owner_ids):
+    """Version tokens of the timelines of ``owner_ids`` and what they show."""
+    keys = [TIMELINES, HASHTAG_NAMES, *map(_timeline_version_key, owner_ids)]
+    return [_version(key) for key in keys]
+
+
+def fetch(key):
+    return _cache().get(key)
+
+
+def store(key, data):
+    _cache().set(key, data, OPTIONS["TTL"])
+
+
+def invalidate_posts(post_ids):
+    if post_ids:
+        _bump(*(_post_version_key(post_id) for post_id in post_ids))
+
+
+def invalidate_hashtags():
+    """Hashtags were added: only the hashtag lists changed."""
+    _bump(HASHTAGS)
+
+
+def invalidate_hashtag_names():
+    """Hashtags were renamed or removed from posts not known one by one."""
+    _bump(HASHTAGS, HASHTAG_NAMES)
+
+
+def invalidate_timelines(owner_ids=None):
+    """Timelines of ``owner_ids`` changed, every timeline when ``None``."""
+    if owner_ids is None:
+        _bump(TIMELINES)
+    elif owner_ids:
+        _bump(*(_timeline_version_key(owner_id) for owner_id in owner_ids))
@@ -0,0 +1,159 @@
+"""Full-text search over post titles and contents.
+
+The backend is selected with ``POST_SEARCH["BACKEND"]``. SQLite databases
+use an FTS5 inverted index (created by migration ``0006``) ranked with
+BM25; other databases fall back to ``DatabaseSearchBackend`` until a
+native backend is plugged in. Backends are kept in sync by ``post.index``
+jobs queued from the ``Post`` signals and can be rebuilt with
+``manage.py rebuild_search_index``.
+"""
+import re
+
+from django.conf import settings
+from django.db import connections, router
+from django.db.models import F, FloatField, Func, Lookup, Q, Value
+from django.utils.module_loading import import_string
+
+from .models import Post, PostSearch
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+class Match(Lookup):
+    lookup_name = "match"
+
+    def as_sql(self, compiler, connection):
+        lhs, lhs_params = self.process_lhs(compiler, connection)
+        rhs, rhs_params = self.process_rhs(compiler, connection)
+        return f"{lhs} MATCH {rhs}", lhs_params + rhs_params
+
+
+PostSearch._meta.get_field("document").register_lookup(Match)
+
+
+class SearchBackend:
+    def index(self, posts):
+        raise NotImplementedError
+
+    def remove(self, post_ids):
+        raise NotImplementedError
+
+    def rebuild(self):
+        raise NotImplementedError
+
+    def search(self, queryset, query):
+        """Filter ``queryset`` to matches annotated with ``search_rank``.
+
+        Lower ranks are better, matching SQLite's ``bm25()``. A query
+        without any word matches nothing.
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def no_matches(queryset):
+        # Still annotated, callers order by ``search_rank``.
+        return queryset.none().annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """Portable fallback that scans with ``icontains`` and needs no index."""
+
+    def index(self, posts):
+        pass
+
+    def remove(self, post_ids):
+        pass
+
+    def rebuild(self):
+        pass
+
+    def search(self, queryset, query):
+        tokens = TOKEN.findall(query)
+        if not tokens:
+            return self.no_matches(queryset)
+        condition = Q()
+        for token in tokens:
+            condition &= Q(title__icontains=token) | Q(content__icontains=token)
+        return queryset.filter(condition).annotate(
+            search_rank=Value(0.0, output_field=FloatField())
+        )
+
+
+class SQLiteFTS5Backend(SearchBackend):
+    table = "post_search"
+    # BM25 column weights: a hit in the title counts more than in content.
+    weights = (4.0, 1.0)
+
+    @property
+    def connection(self):
+        return connections[router.db_for_write(Post)]
+
+    @staticmethod
+    def match_expression(query):
+        """Turn free text into a safe FTS5 query with prefix matching."""
+        tokens = TOKEN.findall(query.lower())
+        return " ".join(f'"{token}"*' for token in tokens)
+
+    def index(self, posts):
+        rows = [(post.id, post.title, post.content) for post in posts]
+        if not rows:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                [(row[0],) for row in rows],
+            )
+            cursor.executemany(
+                f"INSERT INTO {self.table} (rowid, title, content) "
+                f"VALUES (%s, %s, %s)",
+                rows,
+            )
+
+    def remove(self, post_ids):
+        with self.connection.cursor() as cursor:
+            cursor.executemany(
+                f"DELETE FROM {self.table} WHERE rowid = %s",
+                [(post_id,) for post_id in post_ids],
+            )
+
+    def rebuild(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {self.table}")
+            cursor.execute(
+                f"INSERT INTO {self.table} (rowid, title, content) "
+                f"SELECT id, title, content FROM {Post._meta.db_table}"
+            )
+
+    def search(self, queryset, query):
+        expression = self.match_expression(query)
+        if not expression:
+            return self.no_matches(queryset)
+        # Joined once, so bm25() is evaluated for the rows of this MATCH.
+        return queryset.filter(search_document__document__match=expression).annotate(
+            search_rank=Func(
+                F("search_document__document"),
+                *(Value(weight) for weight in self.weights),
+                function="bm25",
+                output_field=FloatField(),
+            )
+        )
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        path = getattr(settings, "POST_SEARCH", {}).get("BACKEND")
+        if path is None:
+            vendor = connections[router.db_for_write(Post)].vendor
+            backend_class = (
+                SQLiteFTS5Backend if vendor == "sqlite" else DatabaseSearchBackend
+            )
+        else:
+            backend_class = import_string(path)
+        _backend = backend_class()
+    return _backend
@@ -1,15 +1,44 @@
 from rest_framework import serializers
+from rest_framework.validators import UniqueValidator
 
-from .models import Hashtag, Post
+from social_media_api.instrumentation import TimedSerializerMixin
 
+from .bulk import resolve_hashtags
+from .models import Hashtag, Post, normalize_hashtag
+
+
+class HashtagNameField(serializers.CharField):
+    def to_internal_value(self, data):
+        return normalize_hashtag(super().to_internal_value(data))
+
+
+MAX_POST_HASHTAGS = 30
+
+
+class HashtagNamesField(serializers.ListField):
+    """Hashtags of a post written and represented by name."""
+
+    child = HashtagNameField(max_length=120)
+
+    def __init__(self, **kwargs):
+        kwargs.setdefault("max_length", MAX_POST_HASHTAGS)
+        super().__init__(**kwargs)
+
+    def to_representation(self, hashtags):
+        return [hashtag.name for hashtag in hashtags.all()]
+
+
+class HashtagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    name = HashtagNameField(
+        max_length=120, validators=[UniqueValidator(queryset=Hashtag.objects.all())]
+    )
 
-class HashtagSerializer(serializers.ModelSerializer):
     class Meta:
         model = Hashtag
         fields = ("name",)
 
 
-class HashtagsSerializer(serializers.ModelSerializer):
+class HashtagsSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = Hashtag
         fields = ("name",)
@@ -19,7 +48,14 @@ class HashtagsSerializer(serializers.ModelSerializer):
         return instance.name
 
 
-class PostSerializer(serializers.ModelSerializer):
+class TrendingHashtagSerializer(TimedSerializerMixin, serializers.Serializer):
+    name = serializers.CharField()
+    uses = serializers.IntegerField()
+
+
+class PostSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    hashtag = HashtagNamesField(required=False)
+
     class Meta:
         model = Post
         fields = (
@@ -31,11 +67,40 @@ class PostSerializer(serializers.ModelSerializer):
         )
         read_only_fields = ("user",)
 
+    def create(self, validated_data):
+        names = validated_data.pop("hashtag", [])
+        post = super().create(validated_data)
+        if names:
+            post.hashtag.set(resolve_hashtags(names).values())
+        return post
+
+    def update(self, instance, validated_data):
+        names = validated_data.pop("hashtag", None)
+        post = super().update(instance, validated_data)
+        if names is not None:
+            post.hashtag.set(resolve_hashtags(names).values())
+        return post
 
-class PostDetailSerializer(serializers.ModelSerializer):
+
+class PostDetailSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     hashtag = HashtagsSerializer(read_only=True, many=True)
 
     class Meta:
         model = Post
         fields = "__all__"
         read_only_fields = ("user",)
+
+
+class BulkPostSerializer(TimedSerializerMixin, serializers.Serializer):
+    title = serializers.CharField(max_length=255)
+    content = serializers.CharField()
+    hashtag = HashtagNamesField(required=False, default=list)
+
+
+class BulkDeleteSerializer(TimedSerializerMixin, serializers.Serializer):
+    # Post ids are 64-bit primary keys.
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=2**63 - 1),
+        allow_empty=False,
+        max_length=1000,
+    )
@@ -0,0 +1,179 @@
+from django.db import transaction
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from jobs import queue
+from user import counters
+from user.models import Follow
+
+from . import response_cache, timeline, trending
+from .hashtag_index import hashtag_index
+from .models import Hashtag, Post
+
+
+@receiver(post_save, sender=Post, dispatch_uid="post_fan_out")
+def fan_out_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.add_to_own([instance])
+        queue.enqueue("post.fan_out", post=instance.pk)
+
+
+@receiver(post_save, sender=Post, dispatch_uid="post_search_index")
+def index_post(sender, instance, raw=False, **kwargs):
+    if not raw:
+        queue.enqueue("post.index", post=instance.pk)
+
+
+@receiver(post_delete, sender=Post, dispatch_uid="post_search_remove")
+def unindex_post(sender, instance, **kwargs):
+    queue.enqueue("post.index", post=instance.pk)
+
+
+@receiver(post_save, sender=Post, dispatch_uid="post_count_increment")
+def increment_posts_count(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_post_count(instance.author_id, 1)
+
+
+@receiver(post_delete, sender=Post, dispatch_uid="post_count_decrement")
+def decrement_posts_count(sender, instance, **kwargs):
+    counters.change_post_count(instance.author_id, -1)
+
+
+@receiver(post_save, sender=Follow, dispatch_uid="timeline_follow")
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        queue.enqueue(
+            "timeline.sync_follow",
+            follower=instance.follower_id,
+            followee=instance.followee_id,
+        )
+        # After commit, once every receiver has updated the counters.
+        followee = instance.followee_id
+        transaction.on_commit(lambda: timeline.promote([followee]))
+
+
+@receiver(post_delete, sender=Follow, dispatch_uid="timeline_unfollow")
+def prune_timeline(sender, instance, **kwargs):
+    queue.enqueue(
+        "timeline.sync_follow",
+        follower=instance.follower_id,
+        followee=instance.followee_id,
+    )
+    followee = instance.followee_id
+    transaction.on_commit(lambda: _demote([followee]))
+
+
+def _demote(author_ids):
+    queue.enqueue_many(
+        "timeline.demote",
+        [{"author": author_id} for author_id in timeline.demotable(author_ids)],
+    )
+
+
+@receiver(post_save, sender=Hashtag, dispatch_uid="hashtag_index_save")
+def index_hashtag(sender, instance, created, **kwargs):
+    if created:
+        name = instance.name
+        transaction.on_commit(lambda: hashtag_index.add(name))
+    else:
+        # The previous name is unknown here, reload on next lookup.
+        transaction.on_commit(hashtag_index.invalidate)
+
+
+@receiver(post_delete, sender=Hashtag, dispatch_uid="hashtag_index_delete")
+def unindex_hashtag(sender, instance, **kwargs):
+    name = instance.name
+    transaction.on_commit(lambda: hashtag_index.remove(name))
+
+
+@receiver(m2m_changed, sender=Post.hashtag.through, dispatch_uid="hashtag_usage")
+def record_hashtag_usage(sender, instance, action, reverse, pk_set, **kwargs):
+    if action != "post_add" or not pk_set:
+        return
+    if reverse:
+        trending.record([instance.pk], uses=len(pk_set))
+    else:
+        trending.record(pk_set)
+
+
+@receiver(post_save, sender=Post, dispatch_uid="post_response_cache_save")
+@receiver(post_delete, sender=Post, dispatch_uid="post_response_cache_delete")
+def invalidate_post_response(sender, instance, **kwargs):
+    response_cache.invalidate_posts([instance.pk])
+
+
+@receiver(
+    m2m_changed, sender=Post.hashtag.through, dispatch_uid="post_hashtags_response"
+)
+def invalidate_post_hashtags_response(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    if not action.startswith("post_"):
+        return
+    if not reverse:
+        response_cache.invalidate_posts([instance.pk])
+    elif pk_set:
+        response_cache.invalidate_posts(pk_set)
+    else:
+        # Clearing a hashtag's posts does not tell which posts were affected.
+        response_cache.invalidate_hashtag_names()
+
+
+@receiver(post_save, sender=Hashtag, dispatch_uid="hashtag_response_cache_save")
+def invalidate_hashtag_responses(sender, created, **kwargs):
+    if created:
+        response_cache.invalidate_hashtags()
+    else:
+        response_cache.invalidate_hashtag_names()
+
+
+@receiver(post_delete, sender=Hashtag, dispatch_uid="hashtag_response_cache_delete")
+def invalidate_deleted_hashtag_responses(sender, **kwargs):
+    response_cache.invalidate_hashtag_names()
+
+
+@receiver(post_save, sender=Post, dispatch_uid="post_timeline_touch")
+def touch_edited_post(sender, instance, created, raw=False, **kwargs):
+    # New posts reach the timelines through add_to_own and fan_out.
+    if not created and not raw:
+        timeline.touch([instance.pk])
+
+
+@receiver(pre_delete, sender=Post, dispatch_uid="post_timeline_delete_touch")
+def touch_deleted_post(sender, instance, **kwargs):
+    # Before the post's timeline entries are deleted with it.
+    timeline.touch([instance.pk])
+
+
+@receiver(m2m_changed, sender=Post.hashtag.through, dispatch_uid="post_hashtags_touch")
+def touch_retagged_posts(sender, instance, action, reverse, pk_set, **kwargs):
+    # Feeds show the tags; clearing a hashtag's posts moves the hashtag
+    # names version of every feed instead.
+    if not reverse:
+        if action in ("post_add", "post_remove", "post_clear"):
+            Post.objects.filter(pk=instance.pk).update(updated=timezone.now())
+            timeline.touch([instance.pk])
+    elif action == "pre_clear":
+        Post.objects.filter(hashtag=instance).update(updated=timezone.now())
+    elif action in ("post_add", "post_remove") and pk_set:
+        Post.objects.filter(pk__in=pk_set).update(updated=timezone.now())
+        timeline.touch(pk_set)
+
+
+@receiver(post_save, sender=Hashtag, dispatch_uid="hashtag_rename_touch")
+def touch_posts_of_renamed_hashtag(sender, instance, created, raw=False, **kwargs):
+    # Posts show hashtags by name.
+    if not created and not raw:
+        Post.objects.filter(hashtag=instance).update(updated=timezone.now())
+
+
+@receiver(pre_delete, sender=Hashtag, dispatch_uid="hashtag_delete_touch")
+def touch_posts_of_deleted_hashtag(sender, instance, **kwargs):
+    Post.objects.filter(hashtag=instance).update(updated=timezone.now())
@@ -0,0 +1,51 @@
+"""Queued side effects of post and follow writes (see ``jobs.queue``).
+
+Payloads carry ids only and handlers read the current rows, so a job
+that runs late, twice or after a newer job of the same object still
+leaves the derived data matching the database.
+"""
+from jobs.queue import task
+from user.models import Follow
+
+from . import search, timeline
+from .models import Post
+
+
+@task("post.fan_out")
+def fan_out(payloads):
+    posts = Post.objects.filter(pk__in={payload["post"] for payload in payloads})
+    timeline.fan_out(list(posts.only("id", "author_id", "created")))
+
+
+@task("post.index")
+def index(payloads):
+    post_ids = {payload["post"] for payload in payloads}
+    posts = list(Post.objects.filter(pk__in=post_ids).only("id", "title", "content"))
+    backend = search.get_backend()
+    backend.index(posts)
+    deleted = post_ids - {post.id for post in posts}
+    if deleted:
+        backend.remove(deleted)
+
+
+@task("timeline.sync_follow")
+def sync_follow(payloads):
+    """Backfill or prune a follower's timeline, whichever the edge needs now."""
+    pairs = {(payload["follower"], payload["followee"]) for payload in payloads}
+    edges = set(
+        Follow.objects.filter(
+            follower_id__in={follower for follower, _ in pairs},
+            followee_id__in={followee for _, followee in pairs},
+        ).values_list("follower_id", "followee_id")
+    )
+    for follower, followee in pairs:
+        if (follower, followee) in edges:
+            timeline.backfill(follower, followee)
+        else:
+            timeline.prune(follower, followee)
+
+
+@task("timeline.demote", batch_size=1, eager=False)
+def demote(payloads):
+    for payload in payloads:
+        timeline.demote(payload["author"])
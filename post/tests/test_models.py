@@ -23,6 +23,26 @@ class HashtagModelTest(TestCase):
     def test_str_representation(self):
         self.assertEquals(str(self.hashtag), self.hashtag.name)
 
+    def test_name_is_normalized_on_save(self):
+        hashtag = Hashtag.objects.create(name="  Django ")
+        self.assertEqual(hashtag.name, "django")
+
+    def test_with_prefix(self):
+        Hashtag.objects.create(name="testing")
+        Hashtag.objects.create(name="tesla")
+        names = Hashtag.objects.with_prefix("TEST").values_list("name", flat=True)
+        self.assertEqual(sorted(names), ["test hashtag", "testing"])
+
+    def test_with_prefix_ending_in_the_last_code_point(self):
+        last = chr(0x10FFFF)
+        Hashtag.objects.create(name=f"a{last}{last}")
+        Hashtag.objects.create(name="b")
+
+        names = Hashtag.objects.with_prefix(f"a{last}").values_list("name", flat=True)
+        self.assertEqual(list(names), [f"a{last}{last}"])
+        names = Hashtag.objects.with_prefix(last).values_list("name", flat=True)
+        self.assertEqual(list(names), [])
+
 
 class PostModelTest(TestCase):
     def setUp(self):
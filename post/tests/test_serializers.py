@@ -3,6 +3,7 @@ from django.test import TestCase
 
 from post.models import Hashtag, Post
 from post.serializers import (
+    MAX_POST_HASHTAGS,
     HashtagSerializer,
     HashtagsSerializer,
     PostSerializer,
@@ -58,6 +59,33 @@ class PostSerializerTest(TestCase):
         self.assertFalse(serializer.is_valid())
         self.assertIn("content", serializer.errors)
 
+    def test_hashtags_are_resolved_by_name(self):
+        existing = Hashtag.objects.create(name="existing")
+        data = {
+            "author": self.user.id,
+            "title": "Test Post",
+            "content": "Test content",
+            "hashtag": ["EXISTING", "new"],
+        }
+        serializer = PostSerializer(data=data)
+        self.assertTrue(serializer.is_valid())
+
+        post = serializer.save()
+
+        self.assertIn(existing, post.hashtag.all())
+        self.assertEqual(sorted(serializer.data["hashtag"]), ["existing", "new"])
+
+    def test_hashtags_are_limited(self):
+        data = {
+            "author": self.user.id,
+            "title": "Test Post",
+            "content": "Test content",
+            "hashtag": [f"tag{n}" for n in range(MAX_POST_HASHTAGS + 1)],
+        }
+        serializer = PostSerializer(data=data)
+        self.assertFalse(serializer.is_valid())
+        self.assertIn("hashtag", serializer.errors)
+
     def test_read_only_fields(self):
         post = Post.objects.create(
             author=self.user, title="Test Post", content="Test content"
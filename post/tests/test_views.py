@@ -1,12 +1,28 @@
+import json
+from base64 import b64encode
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
+from django.utils import timezone
 from rest_framework import status
+from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
-from post.models import Hashtag, Post
+from jobs import queue
+from jobs.models import Job
+from post import bulk, ranking, response_cache, search, timeline, trending
+from post.hashtag_index import hashtag_index
+from post.models import Hashtag, Post, TimelineEntry
 from post.serializers import HashtagSerializer, PostSerializer, PostDetailSerializer
-from user.models import Profile
+from social_media_api import instrumentation
+from social_media_api.instrumentation import registry
+from user import follows
+from user.models import Follow, Profile
 
 User = get_user_model()
 
@@ -83,16 +99,16 @@ class PostViewSetTestCase(TestCase):
 
     def test_list_posts(self):
         response = self.client.get(reverse("post:post-list"))
-        posts = Post.objects.all()
+        posts = Post.objects.order_by("-created", "-id")
         serializer = PostSerializer(posts, many=True)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, serializer.data)
+        self.assertEqual(response.data["results"], serializer.data)
 
     def test_create_post(self):
         data = {
             "title": "New Post",
             "content": "New post content",
-            "hashtag": [self.hashtag1.id, self.hashtag2.id],
+            "hashtag": [self.hashtag1.name, self.hashtag2.name],
             "author": self.user.id,
         }
 
@@ -104,6 +120,30 @@ class PostViewSetTestCase(TestCase):
             list(Post.objects.last().hashtag.all()), [self.hashtag1, self.hashtag2]
         )
 
+    def test_create_post_with_new_hashtag_names(self):
+        data = {
+            "title": "New Post",
+            "content": "New post content",
+            "hashtag": ["Test1", "brand new", "brand new"],
+            "author": self.user.id,
+        }
+
+        response = self.client.post(reverse("post:post-list"), data, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(response.data["hashtag"]), ["brand new", "test1"])
+        self.assertEqual(Hashtag.objects.count(), 3)
+
+    def test_update_post_replaces_hashtags(self):
+        url = reverse("post:post-detail", kwargs={"pk": self.post1.id})
+
+        response = self.client.patch(url, {"hashtag": ["other"]}, format="json")
+
+        self.assertEqual(response.data["hashtag"], ["other"])
+        self.assertEqual(
+            list(self.post1.hashtag.values_list("name", flat=True)), ["other"]
+        )
+
     def test_retrieve_post(self):
         response = self.client.get(
             reverse("post:post-detail", kwargs={"pk": self.post1.id})
@@ -117,7 +157,7 @@ class PostViewSetTestCase(TestCase):
         data = {
             "title": "Updated Post",
             "content": "Updated post content",
-            "hashtag": [self.hashtag1.id],
+            "hashtag": [self.hashtag1.name],
             "author": self.user.id,
         }
         response = self.client.put(
@@ -135,3 +175,1053 @@ class PostViewSetTestCase(TestCase):
         )
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertFalse(Post.objects.filter(id=self.post1.id).exists())
+
+    def test_failed_create_rolls_back_counter_and_timeline(self):
+        data = {
+            "title": "New Post",
+            "content": "c",
+            "hashtag": ["test1"],
+            "author": self.user.id,
+        }
+
+        # Hashtags are recorded after the post, its counter and timeline.
+        with mock.patch.object(trending, "record", side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                self.client.post(reverse("post:post-list"), data)
+
+        self.assertEqual(Post.objects.count(), 2)
+        self.assertEqual(TimelineEntry.objects.filter(owner=self.user).count(), 2)
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.posts_count, 2)
+
+    def test_failed_delete_rolls_back_counter(self):
+        url = reverse("post:post-detail", kwargs={"pk": self.post1.id})
+
+        # The response cache is invalidated after the counter moved.
+        with mock.patch.object(
+            response_cache, "invalidate_posts", side_effect=RuntimeError
+        ):
+            with self.assertRaises(RuntimeError):
+                self.client.delete(url)
+
+        self.assertTrue(Post.objects.filter(id=self.post1.id).exists())
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.posts_count, 2)
+
+
+class PostFeedTimelineTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="reader@email.com", password="testpass"
+        )
+        self.profile = Profile.objects.create(
+            user=self.user, username="reader", bio="Reader bio"
+        )
+        self.author = User.objects.create_user(
+            email="author@email.com", password="testpass"
+        )
+        self.stranger = User.objects.create_user(
+            email="stranger@email.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+
+    def feed_titles(self):
+        response = self.client.get(reverse("post:post-list"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {post["title"] for post in response.data["results"]}
+
+    def test_new_post_is_pushed_to_followers(self):
+        Follow.objects.create(follower=self.user, followee=self.author)
+        Post.objects.create(author=self.author, title="Followed", content="c")
+        Post.objects.create(author=self.stranger, title="Stranger", content="c")
+
+        self.assertEqual(self.feed_titles(), {"Followed"})
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                owner=self.user, post__title="Followed"
+            ).exists()
+        )
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        Post.objects.create(author=self.author, title="Old post", content="c")
+        Post.objects.create(author=self.user, title="Own post", content="c")
+
+        self.assertEqual(self.feed_titles(), {"Own post"})
+
+        Follow.objects.create(follower=self.user, followee=self.author)
+        self.assertEqual(self.feed_titles(), {"Own post", "Old post"})
+
+        follows.unfollow(self.user.id, self.author.id)
+        self.assertEqual(self.feed_titles(), {"Own post"})
+
+    def test_deleting_followed_user_prunes_timeline(self):
+        Post.objects.create(author=self.author, title="Old post", content="c")
+        Follow.objects.create(follower=self.user, followee=self.author)
+
+        self.author.delete()
+        self.assertEqual(self.feed_titles(), set())
+
+    def test_rebuild_matches_fan_out(self):
+        Follow.objects.create(follower=self.user, followee=self.author)
+        Post.objects.create(author=self.author, title="Followed", content="c")
+        Post.objects.create(author=self.user, title="Own post", content="c")
+        expected = set(TimelineEntry.objects.values_list("owner", "post"))
+
+        timeline.rebuild()
+
+        self.assertEqual(
+            set(TimelineEntry.objects.values_list("owner", "post")), expected
+        )
+
+
+class PostCursorPaginationTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="pager@email.com", password="testpass"
+        )
+        Profile.objects.create(user=self.user, username="pager", bio="bio")
+        self.client.force_authenticate(user=self.user)
+        self.posts = [
+            Post.objects.create(author=self.user, title=f"Post {i}", content="c")
+            for i in range(5)
+        ]
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            ids.extend(post["id"] for post in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_pages_are_ordered_newest_first(self):
+        ids = self.walk(reverse("post:post-list") + "?page_size=2")
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+
+    def test_ties_on_created_are_broken_by_id(self):
+        Post.objects.update(created=self.posts[0].created)
+        TimelineEntry.objects.update(created=self.posts[0].created)
+        ids = self.walk(reverse("post:post-list") + "?page_size=2")
+        self.assertEqual(ids, sorted((post.id for post in self.posts), reverse=True))
+
+    def test_inserts_while_paging_do_not_shift_pages(self):
+        response = self.client.get(reverse("post:post-list") + "?page_size=2")
+        Post.objects.create(author=self.user, title="Newest", content="c")
+
+        ids = [post["id"] for post in response.data["results"]]
+        ids += self.walk(response.data["next"])
+        self.assertEqual(ids, [post.id for post in reversed(self.posts)])
+
+    def test_previous_link_returns_prior_page(self):
+        first = self.client.get(reverse("post:post-list") + "?page_size=2")
+        second = self.client.get(first.data["next"])
+        previous = self.client.get(second.data["previous"])
+
+        self.assertEqual(previous.data["results"], first.data["results"])
+        self.assertIsNone(previous.data["previous"])
+
+    def test_filter_by_hashtag_prefix(self):
+        self.posts[0].hashtag.add(Hashtag.objects.create(name="Python"))
+        self.posts[1].hashtag.add(Hashtag.objects.create(name="rust"))
+
+        response = self.client.get(reverse("post:post-list"), {"hashtag": "PY"})
+        self.assertEqual(
+            [post["id"] for post in response.data["results"]], [self.posts[0].id]
+        )
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse("post:post-list") + "?cursor=bogus")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor(self):
+        created = self.posts[0].created.isoformat()
+        positions = [
+            [1, 2],
+            [{"x": 1}, 2],
+            [[created], 2],
+            [None, None],
+            [created, None],
+            [True, 2],
+            [created, 2**64],
+            [created, "99999999999999999999"],
+            [created, 1e400],
+        ]
+        for position in positions:
+            cursor = b64encode(json.dumps({"p": position}).encode()).decode()
+            response = self.client.get(reverse("post:post-list"), {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
+
+
+class HashtagAutocompleteTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        hashtag_index.invalidate()
+        for name in ("python", "pytest", "django", "PyPI"):
+            Hashtag.objects.create(name=name)
+
+    def suggest(self, **params):
+        response = self.client.get(reverse("post:hashtag-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [hashtag["name"] for hashtag in response.data]
+
+    def test_names_are_normalized(self):
+        self.assertTrue(Hashtag.objects.filter(name="pypi").exists())
+
+        response = self.client.post(reverse("post:hashtag-list"), {"name": "Django"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_prefix_suggestions_are_sorted(self):
+        self.assertEqual(self.suggest(prefix="PY"), ["pypi", "pytest", "python"])
+        self.assertEqual(self.suggest(prefix="py", limit=1), ["pypi"])
+        self.assertEqual(self.suggest(prefix="rust"), [])
+
+    def test_index_is_refreshed_incrementally(self):
+        self.suggest(prefix="py")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("post:hashtag-list"), {"name": "pyramid"})
+        with self.captureOnCommitCallbacks(execute=True):
+            Hashtag.objects.get(name="pytest").delete()
+
+        self.assertEqual(self.suggest(prefix="py"), ["pypi", "pyramid", "python"])
+
+    def test_invalid_limit(self):
+        response = self.client.get(
+            reverse("post:hashtag-list"), {"prefix": "py", "limit": "x"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TrendingHashtagsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="trend@email.com", password="testpass"
+        )
+        self.python = Hashtag.objects.create(name="python")
+        self.django = Hashtag.objects.create(name="django")
+
+    def tag_posts(self, count, *hashtags):
+        for _ in range(count):
+            post = Post.objects.create(author=self.user, title="t", content="c")
+            post.hashtag.add(*hashtags)
+
+    def trending(self, **params):
+        response = self.client.get(reverse("post:hashtag-trending"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_ranks_by_usage_in_window(self):
+        self.tag_posts(2, self.python, self.django)
+        self.tag_posts(1, self.python)
+
+        self.assertEqual(
+            self.trending(),
+            [{"name": "python", "uses": 3}, {"name": "django", "uses": 2}],
+        )
+
+    def test_old_buckets_fall_out_of_the_hour_window(self):
+        trending.record([self.django.id], timezone.now() - timedelta(hours=3), 5)
+        self.tag_posts(1, self.python)
+
+        self.assertEqual(self.trending(), [{"name": "python", "uses": 1}])
+        self.assertEqual(
+            self.trending(window="day"),
+            [{"name": "django", "uses": 5}, {"name": "python", "uses": 1}],
+        )
+
+    def test_cost_does_not_grow_with_post_volume(self):
+        self.tag_posts(1, self.python)
+        with self.assertNumQueries(1):
+            trending.compute("day", 10)
+
+        self.tag_posts(30, self.python, self.django)
+        with self.assertNumQueries(1):
+            trending.compute("day", 10)
+
+    def test_results_are_cached(self):
+        self.tag_posts(1, self.python)
+        self.trending()
+        with self.assertNumQueries(0):
+            self.trending()
+
+    def test_invalid_window(self):
+        response = self.client.get(reverse("post:hashtag-trending"), {"window": "year"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostSearchTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="searcher@email.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.title_hit = Post.objects.create(
+            author=self.user, title="Django tips", content="Some advice"
+        )
+        self.content_hit = Post.objects.create(
+            author=self.user, title="Weekend", content="Played with django"
+        )
+        self.miss = Post.objects.create(
+            author=self.user, title="Cooking", content="Pasta recipe"
+        )
+
+    def search(self, query, **params):
+        response = self.client.get(reverse("post:post-list"), {"q": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def ids(self, response):
+        return [post["id"] for post in response.data["results"]]
+
+    def test_results_are_ranked(self):
+        response = self.search("django")
+        self.assertEqual(response.data["count"], 2)
+        self.assertEqual(self.ids(response), [self.title_hit.id, self.content_hit.id])
+
+    def test_prefix_and_multiple_terms(self):
+        self.assertEqual(self.ids(self.search("pas rec")), [self.miss.id])
+        self.assertEqual(self.ids(self.search('"unbalanced')), [])
+
+    def test_query_without_words_matches_nothing(self):
+        for query in ("!!!", '"', "*-"):
+            response = self.search(query)
+            self.assertEqual(response.data["count"], 0)
+            self.assertEqual(self.ids(response), [])
+
+    def test_index_follows_update_and_delete(self):
+        self.title_hit.title = "Flask tips"
+        self.title_hit.save()
+        self.content_hit.delete()
+
+        self.assertEqual(self.ids(self.search("django")), [])
+        self.assertEqual(self.ids(self.search("flask")), [self.title_hit.id])
+
+    def test_search_is_limited_to_the_feed(self):
+        stranger = User.objects.create_user(email="s@email.com", password="pass")
+        Post.objects.create(author=stranger, title="Django news", content="c")
+
+        self.assertEqual(self.search("django").data["count"], 2)
+
+    def test_results_are_paginated(self):
+        response = self.search("django", page_size=1)
+        self.assertEqual(self.ids(response), [self.title_hit.id])
+        self.assertIsNotNone(response.data["next"])
+
+    def test_database_fallback_backend(self):
+        queryset = search.DatabaseSearchBackend().search(Post.objects.all(), "DJANGO")
+        self.assertEqual(
+            set(queryset.values_list("id", flat=True)),
+            {self.title_hit.id, self.content_hit.id},
+        )
+        self.assertFalse(
+            search.DatabaseSearchBackend().search(Post.objects.all(), "!!!").exists()
+        )
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="reader@email.com", password="testpass"
+        )
+        self.client.force_authenticate(user=self.user)
+        self.hashtag = Hashtag.objects.create(name="django")
+        self.post = Post.objects.create(
+            author=self.user, title="Cached", content="Content"
+        )
+        self.post.hashtag.add(self.hashtag)
+        self.url = reverse("post:post-detail", args=[self.post.id])
+
+    def test_post_detail_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        with self.assertNumQueries(1):
+            second = self.client.get(self.url)
+
+        self.assertEqual(second.status_code, status.HTTP_200_OK)
+        self.assertEqual(second.data, first.data)
+
+    def test_post_update_invalidates_detail(self):
+        self.client.get(self.url)
+        self.post.title = "Changed"
+        self.post.save()
+
+        self.assertEqual(self.client.get(self.url).data["title"], "Changed")
+
+    def test_hashtag_changes_invalidate_detail(self):
+        self.client.get(self.url)
+        self.post.hashtag.add(Hashtag.objects.create(name="python"))
+        self.assertEqual(
+            self.client.get(self.url).data["hashtag"], ["django", "python"]
+        )
+
+        self.hashtag.name = "flask"
+        self.hashtag.save()
+        self.assertIn("flask", self.client.get(self.url).data["hashtag"])
+
+        self.hashtag.post_set.clear()
+        self.assertEqual(self.client.get(self.url).data["hashtag"], ["python"])
+
+    def test_new_hashtags_keep_detail_cached(self):
+        self.client.get(self.url)
+        Hashtag.objects.create(name="python")
+
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_cached_detail_respects_visibility(self):
+        self.client.get(self.url)
+        stranger = User.objects.create_user(email="s@email.com", password="pass")
+        self.client.force_authenticate(user=stranger)
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_deleted_post_is_not_served(self):
+        self.client.get(self.url)
+        self.post.delete()
+
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_hashtag_list_is_cached_and_invalidated(self):
+        url = reverse("post:hashtag-list")
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+        Hashtag.objects.create(name="python")
+
+        self.assertEqual(
+            self.client.get(url).data, [{"name": "django"}, {"name": "python"}]
+        )
+
+
+class PostConditionalGetTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="poller@email.com", password="testpass"
+        )
+        self.author = User.objects.create_user(
+            email="author@email.com", password="testpass"
+        )
+        follows.follow(self.user.id, self.author.id)
+        self.client.force_authenticate(user=self.user)
+        self.post = Post.objects.create(
+            author=self.author, title="Title", content="Content"
+        )
+        self.url = reverse("post:post-list")
+
+    def get(self, etag=None, **params):
+        headers = {"HTTP_IF_NONE_MATCH": etag} if etag else {}
+        return self.client.get(self.url, params, **headers)
+
+    def assertChanged(self, etag):
+        self.assertEqual(self.get(etag).status_code, status.HTTP_200_OK)
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.get()["ETag"]
+
+        # The lookup of pulled authors, versions come from the cache.
+        with self.assertNumQueries(1):
+            response = self.get(etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_etag_depends_on_query(self):
+        etag = self.get()["ETag"]
+
+        self.assertEqual(self.get(etag, page_size=1).status_code, status.HTTP_200_OK)
+
+    def test_new_post_changes_etag(self):
+        etag = self.get()["ETag"]
+        Post.objects.create(author=self.author, title="New", content="Content")
+        self.assertChanged(etag)
+
+    def test_edit_and_delete_change_etag(self):
+        etag = self.get()["ETag"]
+        self.post.title = "Edited"
+        self.post.save()
+        self.assertChanged(etag)
+
+        etag = self.get()["ETag"]
+        self.post.delete()
+        self.assertChanged(etag)
+
+    def test_retagging_changes_etag(self):
+        hashtag = Hashtag.objects.create(name="django")
+        etag = self.get()["ETag"]
+        self.post.hashtag.add(hashtag)
+        self.assertChanged(etag)
+
+        etag = self.get()["ETag"]
+        hashtag.name = "flask"
+        hashtag.save()
+        self.assertChanged(etag)
+
+        etag = self.get()["ETag"]
+        hashtag.delete()
+        self.assertChanged(etag)
+
+    def test_unfollow_changes_etag(self):
+        etag = self.get()["ETag"]
+        follows.unfollow(self.user.id, self.author.id)
+        self.assertChanged(etag)
+
+    def test_queued_fan_out_changes_etag(self):
+        with mock.patch.dict(queue.OPTIONS, {"EAGER": False}):
+            Post.objects.create(author=self.author, title="New", content="Content")
+            etag = self.get()["ETag"]
+            queue.Worker().run(drain=True)
+
+        self.assertChanged(etag)
+
+    def test_bulk_delete_changes_etag(self):
+        etag = self.get()["ETag"]
+        bulk.delete_posts([self.post])
+        self.assertChanged(etag)
+
+
+class PostBulkTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="importer@email.com", password="testpass"
+        )
+        Profile.objects.create(user=self.user, username="importer", bio="")
+        self.follower = User.objects.create_user(
+            email="follower@email.com", password="testpass"
+        )
+        follows.follow(self.follower.id, self.user.id)
+        self.client.force_authenticate(user=self.user)
+        self.existing = Hashtag.objects.create(name="django")
+        self.create_url = reverse("post:post-bulk-create")
+        self.delete_url = reverse("post:post-bulk-delete")
+
+    def test_bulk_create(self):
+        payload = [
+            {"title": "First", "content": "One", "hashtag": ["Django", "python"]},
+            {"title": "Second", "content": "Two", "hashtag": ["python", " PYTHON"]},
+            {"title": "Third", "content": "Three"},
+        ]
+
+        response = self.client.post(self.create_url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(
+            [post["title"] for post in response.data], ["First", "Second", "Third"]
+        )
+        self.assertEqual(sorted(response.data[0]["hashtag"]), ["django", "python"])
+        self.assertEqual(response.data[1]["hashtag"], ["python"])
+        self.assertEqual(Hashtag.objects.count(), 2)
+
+    def test_bulk_create_applies_side_effects(self):
+        payload = [
+            {"title": "Django one", "content": "c", "hashtag": ["django"]},
+            {"title": "Django two", "content": "c", "hashtag": ["django"]},
+        ]
+
+        self.client.post(self.create_url, payload, format="json")
+
+        self.assertEqual(TimelineEntry.objects.filter(owner=self.follower).count(), 2)
+        self.assertEqual(Profile.objects.get(user=self.user).posts_count, 2)
+        self.assertEqual(trending.compute("hour", 10), [{"name": "django", "uses": 2}])
+        response = self.client.get(reverse("post:post-list"), {"q": "django"})
+        self.assertEqual(response.data["count"], 2)
+
+    def test_bulk_create_is_atomic(self):
+        payload = [
+            {"title": "Valid", "content": "c"},
+            {"title": "", "content": "c"},
+        ]
+
+        response = self.client.post(self.create_url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Post.objects.exists())
+
+    def test_bulk_create_limit(self):
+        payload = [{"title": "t", "content": "c"}] * 1001
+
+        response = self.client.post(self.create_url, payload, format="json")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_delete(self):
+        posts = [
+            Post.objects.create(author=self.user, title=f"Post {i}", content="c")
+            for i in range(3)
+        ]
+
+        response = self.client.post(
+            self.delete_url, {"ids": [posts[0].id, posts[1].id]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(list(Post.objects.all()), [posts[2]])
+        self.assertEqual(Profile.objects.get(user=self.user).posts_count, 1)
+
+    def test_bulk_delete_applies_side_effects_in_bulk(self):
+        posts = [
+            Post.objects.create(author=self.user, title=f"Post {i}", content="c")
+            for i in range(3)
+        ]
+        posts[0].hashtag.add(self.existing)
+        ids = [post.id for post in posts]
+
+        with mock.patch.dict(queue.OPTIONS, {"EAGER": False}):
+            # Posts, then in a savepoint the timelines to invalidate, timeline
+            # entries, links, the raw delete, the counter and the index jobs.
+            with self.assertNumQueries(9):
+                response = self.client.post(
+                    self.delete_url, {"ids": ids}, format="json"
+                )
+            self.assertEqual(
+                sorted(Job.objects.values_list("payload__post", flat=True)), ids
+            )
+            queue.Worker().run(drain=True)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(TimelineEntry.objects.filter(post_id__in=ids).exists())
+        self.assertFalse(Post.hashtag.through.objects.exists())
+        self.assertEqual(Profile.objects.get(user=self.user).posts_count, 0)
+        response = self.client.get(reverse("post:post-list"), {"q": "post"})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_bulk_delete_requires_ownership_of_every_post(self):
+        own = Post.objects.create(author=self.user, title="Own", content="c")
+        foreign = Post.objects.create(
+            author=self.follower, title="Foreign", content="c"
+        )
+
+        response = self.client.post(
+            self.delete_url, {"ids": [own.id, foreign.id]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(Post.objects.count(), 2)
+
+    def test_bulk_delete_missing_post(self):
+        own = Post.objects.create(author=self.user, title="Own", content="c")
+
+        response = self.client.post(
+            self.delete_url, {"ids": [own.id, own.id + 100]}, format="json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Post.objects.filter(id=own.id).exists())
+
+    def test_bulk_delete_rejects_ids_out_of_range(self):
+        own = Post.objects.create(author=self.user, title="Own", content="c")
+
+        for ids in ([99999999999999999999999], [0], [own.id, -1]):
+            response = self.client.post(self.delete_url, {"ids": ids}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, ids)
+        self.assertTrue(Post.objects.filter(id=own.id).exists())
+
+
+class AsyncPostViewsTestCase(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="reader@email.com", password="testpass"
+        )
+        self.author = User.objects.create_user(
+            email="writer@email.com", password="testpass"
+        )
+        follows.follow(self.user.id, self.author.id)
+        django = Hashtag.objects.create(name="django")
+        python = Hashtag.objects.create(name="python")
+        self.posts = []
+        for i in range(5):
+            post = Post.objects.create(
+                author=self.author, title=f"Post {i}", content="Content"
+            )
+            post.hashtag.set([django, python] if i % 2 else [django])
+            self.posts.append(post)
+        self.hidden = Post.objects.create(
+            author=User.objects.create_user(email="stranger@email.com"),
+            title="Hidden",
+            content="Content",
+        )
+
+        self.token = Token.objects.create(user=self.user)
+        self.headers = {"Authorization": f"Token {self.token.key}"}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    async def test_list_matches_sync_feed(self):
+        for query in ("", "?author=" + str(self.author.id), "?hashtag=pyt"):
+            response = await self.async_client.get(
+                reverse("post:async-post-list") + query, headers=self.headers
+            )
+            expected = await sync_to_async(self.client.get)(
+                reverse("post:post-list") + query
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                sort_hashtags(response.json()["results"]),
+                sort_hashtags(expected.json()["results"]),
+            )
+
+    async def test_list_pages_through_the_feed(self):
+        url = reverse("post:async-post-list") + "?page_size=2"
+        seen = []
+        while url:
+            data = (await self.async_client.get(url, headers=self.headers)).json()
+            seen += [post["id"] for post in data["results"]]
+            url = data["next"]
+
+        self.assertEqual(seen, [post.id for post in reversed(self.posts)])
+
+    async def test_list_rejects_search(self):
+        response = await self.async_client.get(
+            reverse("post:async-post-list") + "?q=post", headers=self.headers
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    async def test_retrieve_matches_sync_detail(self):
+        post = self.posts[1]
+        response = await self.async_client.get(
+            reverse("post:async-post-detail", args=[post.id]), headers=self.headers
+        )
+        expected = await sync_to_async(self.client.get)(
+            reverse("post:post-detail", args=[post.id])
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            sort_hashtags([response.json()]), sort_hashtags([expected.json()])
+        )
+
+    async def test_retrieve_outside_feed_is_not_found(self):
+        response = await self.async_client.get(
+            reverse("post:async-post-detail", args=[self.hidden.id]),
+            headers=self.headers,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_requires_token(self):
+        response = await self.async_client.get(reverse("post:async-post-list"))
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(response["WWW-Authenticate"], "Token")
+
+    async def test_invalid_token(self):
+        response = await self.async_client.get(
+            reverse("post:async-post-list"), headers={"Authorization": "Token nope"}
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    async def test_is_read_only(self):
+        response = await self.async_client.post(
+            reverse("post:async-post-list"), headers=self.headers
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+
+def sort_hashtags(posts):
+    return [{**post, "hashtag": sorted(post["hashtag"])} for post in posts]
+
+
+class ReverseIdScorer(ranking.Scorer):
+    def score(self, candidate):
+        return 1 / candidate.post_id
+
+
+class PostRankingTestCase(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(
+            email="reader@email.com", password="testpass"
+        )
+        self.mutual = User.objects.create_user(
+            email="mutual@email.com", password="testpass"
+        )
+        self.author = User.objects.create_user(
+            email="author@email.com", password="testpass"
+        )
+        follows.follow(self.user.id, self.mutual.id)
+        follows.follow(self.mutual.id, self.user.id)
+        follows.follow(self.user.id, self.author.id)
+        django = Hashtag.objects.create(name="django")
+
+        now = timezone.now()
+        self.own = self.create_post(self.user, "Own", now - timedelta(hours=48))
+        self.own.hashtag.add(django)
+        self.from_mutual = self.create_post(
+            self.mutual, "Mutual", now - timedelta(hours=12)
+        )
+        self.tagged = self.create_post(self.author, "Tagged", now - timedelta(hours=6))
+        self.tagged.hashtag.add(django)
+        self.newest = self.create_post(self.author, "Newest", now)
+        self.client.force_authenticate(user=self.user)
+
+    def create_post(self, author, title, created):
+        post = Post.objects.create(author=author, title=title, content="c")
+        Post.objects.filter(pk=post.pk).update(created=created)
+        TimelineEntry.objects.filter(post=post).update(created=created)
+        return post
+
+    def ranked(self, **params):
+        response = self.client.get(
+            reverse("post:post-list"), {"ranking": "top", **params}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data["ranking"], [
+            post["title"] for post in response.data["results"]
+        ]
+
+    def test_scorers_rank_the_feed(self):
+        # Recency decay times author and hashtag affinity:
+        # Tagged 0.84 * 2, Mutual 0.71 * 2, Newest 1, Own 0.25 * 2.
+        self.assertEqual(self.ranked(), ("top", ["Tagged", "Mutual", "Newest", "Own"]))
+        self.assertEqual(self.ranked(page_size=2), ("top", ["Tagged", "Mutual"]))
+
+    def test_features_are_loaded_in_bulk(self):
+        # Pulled authors, candidates, three scorer features, the page and
+        # its hashtags.
+        with self.assertNumQueries(7):
+            self.ranked()
+
+    def test_ranked_feed_is_not_conditional(self):
+        response = self.client.get(reverse("post:post-list"), {"ranking": "top"})
+
+        self.assertNotIn("ETag", response)
+
+    def test_exhausted_budget_falls_back_to_chronological(self):
+        with mock.patch.dict(ranking.OPTIONS, {"BUDGET_MS": -1}):
+            self.assertEqual(
+                self.ranked(),
+                ("chronological", ["Newest", "Tagged", "Mutual", "Own"]),
+            )
+
+    def test_scorers_are_pluggable(self):
+        scorers = [("post.tests.test_views.ReverseIdScorer", {})]
+        with mock.patch.dict(ranking.OPTIONS, {"SCORERS": scorers}):
+            self.assertEqual(
+                self.ranked(), ("top", ["Own", "Mutual", "Tagged", "Newest"])
+            )
+
+    def test_candidates_are_bounded(self):
+        with mock.patch.dict(ranking.OPTIONS, {"CANDIDATES": 2}):
+            self.assertEqual(self.ranked(), ("top", ["Tagged", "Newest"]))
+
+    def test_invalid_ranking(self):
+        for params in ({"ranking": "best"}, {"ranking": "top", "q": "post"}):
+            response = self.client.get(reverse("post:post-list"), params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PostHybridFeedTestCase(TestCase):
+    def setUp(self):
+        thresholds = mock.patch.dict(
+            timeline.OPTIONS, {"PULL_THRESHOLD": 2, "PUSH_THRESHOLD": 2}
+        )
+        thresholds.start()
+        self.addCleanup(thresholds.stop)
+        self.client = APIClient()
+        self.user, self.fan, self.celebrity, self.friend = (
+            User.objects.create_user(email=f"{name}@email.com", password="testpass")
+            for name in ("reader", "fan", "celebrity", "friend")
+        )
+        for user in (self.user, self.fan, self.celebrity, self.friend):
+            Profile.objects.create(user=user, username=user.email.split("@")[0])
+        with self.captureOnCommitCallbacks(execute=True):
+            for followee in (self.celebrity, self.friend):
+                follows.follow(self.user.id, followee.id)
+            follows.follow(self.fan.id, self.celebrity.id)
+
+        now = timezone.now()
+        self.posts = {}
+        for hours, author, title in (
+            (5, self.friend, "Friend 1"),
+            (4, self.celebrity, "Celebrity 1"),
+            (3, self.friend, "Friend 2"),
+            (2, self.celebrity, "Celebrity 2"),
+            (1, self.user, "Own"),
+        ):
+            post = Post.objects.create(author=author, title=title, content="c")
+            created = now - timedelta(hours=hours)
+            Post.objects.filter(pk=post.pk).update(created=created)
+            TimelineEntry.objects.filter(post=post).update(created=created)
+            self.posts[title] = post
+        self.client.force_authenticate(user=self.user)
+
+    def feed(self, **params):
+        response = self.client.get(reverse("post:post-list"), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def titles(self, response):
+        return [post["title"] for post in response.data["results"]]
+
+    def test_posts_of_pulled_authors_are_not_pushed(self):
+        celebrity_posts = Post.objects.filter(author=self.celebrity)
+
+        self.assertFalse(
+            TimelineEntry.objects.filter(
+                owner=self.user, post__in=celebrity_posts
+            ).exists()
+        )
+        self.assertEqual(
+            TimelineEntry.objects.filter(
+                owner=self.celebrity, post__in=celebrity_posts
+            ).count(),
+            2,
+        )
+
+    def test_pulled_posts_are_merged_into_the_feed(self):
+        response = self.feed()
+
+        self.assertEqual(
+            self.titles(response),
+            ["Own", "Celebrity 2", "Friend 2", "Celebrity 1", "Friend 1"],
+        )
+        self.assertEqual(response["X-Feed-Path"], "hybrid")
+
+    def test_merged_feed_pages_without_duplicates(self):
+        # Pushed before the celebrity crossed the threshold.
+        TimelineEntry.objects.create(
+            owner=self.user,
+            post=self.posts["Celebrity 1"],
+            created=Post.objects.get(pk=self.posts["Celebrity 1"].pk).created,
+        )
+        titles = []
+        response = self.feed(page_size=2)
+        while True:
+            titles += self.titles(response)
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+
+        self.assertEqual(
+            titles, ["Own", "Celebrity 2", "Friend 2", "Celebrity 1", "Friend 1"]
+        )
+
+    def test_merged_feed_is_filtered(self):
+        response = self.feed(author=self.celebrity.id)
+
+        self.assertEqual(self.titles(response), ["Celebrity 2", "Celebrity 1"])
+
+    def test_feed_without_pulled_authors_is_push_only(self):
+        self.client.force_authenticate(user=self.friend)
+
+        self.assertEqual(self.feed()["X-Feed-Path"], "push")
+
+    def test_feed_path_is_tagged(self):
+        registry.reset()
+        self.addCleanup(registry.reset)
+        with mock.patch.dict(instrumentation.OPTIONS, {"SAMPLE_RATE": 1.0}):
+            with self.assertLogs("social_media_api.instrumentation", "INFO"):
+                self.feed()
+
+        self.assertIn("GET post-list feed=hybrid", registry.snapshot())
+
+    async def test_async_feed_reports_its_path(self):
+        url = reverse("post:async-post-list")
+        registry.reset()
+        self.addCleanup(registry.reset)
+        for user, path in ((self.user, "hybrid"), (self.friend, "push")):
+            token = await Token.objects.acreate(user=user)
+            headers = {"Authorization": f"Token {token.key}"}
+            with mock.patch.dict(instrumentation.OPTIONS, {"SAMPLE_RATE": 1.0}):
+                with self.assertLogs("social_media_api.instrumentation", "INFO"):
+                    response = await self.async_client.get(url, headers=headers)
+
+            self.assertEqual(response["X-Feed-Path"], path)
+            self.assertIn(f"GET async-post-list feed={path}", registry.snapshot())
+
+    def test_pulled_post_detail_is_visible(self):
+        url = reverse("post:post-detail", kwargs={"pk": self.posts["Celebrity 2"].pk})
+
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+    def test_ranked_feed_includes_pulled_posts(self):
+        response = self.feed(ranking="top")
+
+        self.assertIn("Celebrity 2", self.titles(response))
+        self.assertEqual(len(response.data["results"]), 5)
+
+    def test_new_pulled_post_changes_etag(self):
+        etag = self.feed()["ETag"]
+        Post.objects.create(author=self.celebrity, title="Celebrity 3", content="c")
+
+        response = self.client.get(reverse("post:post-list"), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_reaching_threshold_pulls_posts(self):
+        self.assertTrue(Profile.objects.get(user=self.celebrity).timeline_pulled)
+        self.assertFalse(Profile.objects.get(user=self.friend).timeline_pulled)
+
+    def test_dropping_below_push_threshold_pushes_recent_posts(self):
+        with mock.patch.dict(timeline.OPTIONS, {"PUSH_RECENT_POSTS": 1}):
+            with self.captureOnCommitCallbacks(execute=True):
+                follows.unfollow(self.fan.id, self.celebrity.id)
+            # Never pushed inline: followers keep pulling until a worker ran.
+            self.assertEqual(self.feed()["X-Feed-Path"], "hybrid")
+            self.assertEqual(queue.Worker().run(drain=True), 1)
+
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(
+                    owner=self.user, post__author=self.celebrity
+                ).values_list("post__title", flat=True)
+            ),
+            ["Celebrity 2"],
+        )
+        self.assertFalse(Profile.objects.get(user=self.celebrity).timeline_pulled)
+        self.assertEqual(self.feed()["X-Feed-Path"], "push")
+
+    def test_authors_between_thresholds_stay_pulled(self):
+        with mock.patch.dict(timeline.OPTIONS, {"PUSH_THRESHOLD": 1}):
+            with self.captureOnCommitCallbacks(execute=True):
+                follows.unfollow(self.fan.id, self.celebrity.id)
+                follows.follow(self.fan.id, self.celebrity.id)
+                follows.unfollow(self.fan.id, self.celebrity.id)
+
+        self.assertFalse(Job.objects.exists())
+        self.assertTrue(Profile.objects.get(user=self.celebrity).timeline_pulled)
+        self.assertEqual(self.feed()["X-Feed-Path"], "hybrid")
+
+    def test_rebuild_skips_pulled_authors(self):
+        TimelineEntry.objects.all().delete()
+
+        timeline.rebuild()
+
+        self.assertEqual(
+            set(
+                TimelineEntry.objects.filter(owner=self.user).values_list(
+                    "post__title", flat=True
+                )
+            ),
+            {"Own", "Friend 1", "Friend 2"},
+        )
+
+    async def test_async_feed_merges_pulled_posts(self):
+        token = await Token.objects.acreate(user=self.user)
+
+        response = await self.async_client.get(
+            reverse("post:async-post-list"),
+            headers={"Authorization": f"Token {token.key}"},
+        )
+
+        self.assertEqual(
+            [post["title"] for post in response.json()["results"]],
+            ["Own", "Celebrity 2", "Friend 2", "Celebrity 1", "Friend 1"],
+        )
@@ -0,0 +1,265 @@
+"""Hybrid fan-out maintenance of the materialized home feed.
+
+Every post is pushed into the timeline of its author and of everyone who
+follows the author at creation time. Following somebody backfills their
+posts, unfollowing prunes them, so the feed endpoint mostly reads one
+indexed ``(owner, created)`` range of ``TimelineEntry``.
+
+Authors flagged ``Profile.timeline_pulled`` are the exception: pushing
+each of their posts would write a row per follower, so their posts only
+reach their own timeline and followers pull them at read time (see
+``pulled_authors``), merging them with the pushed entries. Authors are
+flagged once they reach ``TIMELINE["PULL_THRESHOLD"]`` followers and
+unflagged only below the lower ``PUSH_THRESHOLD``, so a count flapping
+around one threshold does not flip delivery back and forth. Unflagging
+pushes the author's ``PUSH_RECENT_POSTS`` newest posts to every follower,
+which always runs on a worker (``timeline.demote`` job); the author stays
+pulled until it did. Rows pushed before an author was flagged stay and
+are deduplicated when reading. Run ``reset_pull_state`` and a full
+``rebuild`` (``manage.py rebuild_timelines``) after changing the
+thresholds.
+"""
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db.models import BooleanField, ExpressionWrapper, F, Q
+
+from user.models import Follow, Profile
+
+from . import response_cache
+from .models import Post, TimelineEntry
+
+BATCH_SIZE = 1000
+OWNER_CHUNK = 500
+
+OPTIONS = {
+    "PULL_THRESHOLD": 10000,
+    "PUSH_THRESHOLD": 8000,
+    "PUSH_RECENT_POSTS": 200,
+    **getattr(settings, "TIMELINE", {}),
+}
+
+
+def pulled(author_ids):
+    """The authors among ``author_ids`` whose posts are pulled, not pushed."""
+    return set(
+        Profile.objects.filter(
+            user_id__in=author_ids, timeline_pulled=True
+        ).values_list("user_id", flat=True)
+    )
+
+
+def pulled_authors(owner_id):
+    """Followees of ``owner_id`` whose posts are merged in at read time."""
+    return Profile.objects.filter(
+        timeline_pulled=True, user__follower_edges__follower_id=owner_id
+    ).values_list("user_id", flat=True)
+
+
+def promote(author_ids):
+    """Switch authors who reached ``PULL_THRESHOLD`` followers to pulling."""
+    Profile.objects.filter(
+        user_id__in=author_ids,
+        timeline_pulled=False,
+        followers_count__gte=OPTIONS["PULL_THRESHOLD"],
+    ).update(timeline_pulled=True)
+
+
+def demotable(author_ids):
+    """The pulled authors among ``author_ids`` below ``PUSH_THRESHOLD``."""
+    return set(
+        Profile.objects.filter(
+            user_id__in=author_ids,
+            timeline_pulled=True,
+            followers_count__lt=OPTIONS["PUSH_THRESHOLD"],
+        ).values_list("user_id", flat=True)
+    )
+
+
+def demote(author_id):
+    """Push the recent posts of ``author_id`` and switch it back to pushing.
+
+    The flag is cleared after the push, so followers keep pulling the
+    posts until they are in their timelines.
+    """
+    if author_id in demotable([author_id]):
+        push_to_followers(author_id)
+        Profile.objects.filter(user_id=author_id).update(timeline_pulled=False)
+
+
+def reset_pull_state():
+    """Flag authors by ``PULL_THRESHOLD`` alone, ahead of a ``rebuild``."""
+    Profile.objects.update(
+        timeline_pulled=ExpressionWrapper(
+            Q(followers_count__gte=OPTIONS["PULL_THRESHOLD"]),
+            output_field=BooleanField(),
+        )
+    )
+
+
+def feed(owner_id):
+    """Posts pushed to ``owner_id``, keyed by their timeline entry.
+
+    Ordering on ``feed_created`` and ``feed_post`` reads the ``(owner,
+    -created, -post)`` index of ``TimelineEntry``.
+    """
+    return Post.objects.filter(timeline_entries__owner_id=owner_id).annotate(
+        feed_created=F("timeline_entries__created"),
+        feed_post=F("timeline_entries__post_id"),
+    )
+
+
+def pulled_feed(author_id):
+    """Posts of ``author_id`` with the keys of ``feed``, to merge with it."""
+    return Post.objects.filter(author_id=author_id).annotate(
+        feed_created=F("created"), feed_post=F("id")
+    )
+
+
+def visible_to(owner_id):
+    """``Q`` of the posts in ``owner_id``'s feed, pushed or pulled."""
+    # Subqueries rather than joins, a post matches once whatever its fan-out.
+    pushed = TimelineEntry.objects.filter(owner_id=owner_id).values("post_id")
+    followed = Follow.objects.filter(follower_id=owner_id).values("followee_id")
+    return Q(pk__in=pushed) | Q(author_id__in=followed)
+
+
+def followers_of(author_ids):
+    """Map each of ``author_ids`` to the set of its follower ids."""
+    followers = defaultdict(set)
+    edges = Follow.objects.filter(followee_id__in=author_ids).values_list(
+        "followee_id", "follower_id"
+    )
+    for author_id, follower_id in edges.iterator(chunk_size=BATCH_SIZE):
+        followers[author_id].add(follower_id)
+    return followers
+
+
+def add_to_own(posts):
+    """Put ``posts`` into their authors' timelines, one row per post.
+
+    Runs inline on writes so authors see, edit and delete their posts
+    right away, while ``fan_out`` to followers may be queued.
+    """
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner_id=post.author_id, post=post, created=post.created)
+            for post in posts
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    response_cache.invalidate_timelines({post.author_id for post in posts})
+
+
+def fan_out(posts):
+    """Push ``posts`` to the followers of their authors."""
+    authors = {post.author_id for post in posts}
+    followers = followers_of(authors - pulled(authors))
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner_id=owner_id, post=post, created=post.created)
+            for post in posts
+            for owner_id in followers[post.author_id]
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    response_cache.invalidate_timelines(set().union(*followers.values()))
+
+
+def backfill(owner_id, author_id):
+    if owner_id != author_id and pulled([author_id]):
+        return
+    posts = Post.objects.filter(author_id=author_id).values_list("id", "created")
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(owner_id=owner_id, post_id=post_id, created=created)
+            for post_id, created in posts.iterator(chunk_size=BATCH_SIZE)
+        ],
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    response_cache.invalidate_timelines([owner_id])
+
+
+def prune(owner_id, author_id):
+    if owner_id == author_id:
+        return
+    TimelineEntry.objects.filter(owner_id=owner_id, post__author_id=author_id).delete()
+    response_cache.invalidate_timelines([owner_id])
+
+
+def touch(post_ids):
+    """Invalidate the feeds showing ``post_ids``, e.g. after an edit.
+
+    The authors' own timelines are among them, which also covers the
+    followers who pull the posts.
+    """
+    owners = TimelineEntry.objects.filter(post_id__in=post_ids).values_list(
+        "owner_id", flat=True
+    )
+    response_cache.invalidate_timelines(set(owners))
+
+
+def push_to_followers(author_id):
+    """Push the ``PUSH_RECENT_POSTS`` newest posts of ``author_id`` to followers."""
+    posts = list(
+        Post.objects.filter(author_id=author_id)
+        .order_by("-created", "-id")
+        .values_list("id", "created")[: OPTIONS["PUSH_RECENT_POSTS"]]
+    )
+    followers = followers_of([author_id])[author_id]
+    entries = (
+        TimelineEntry(owner_id=owner_id, post_id=post_id, created=created)
+        for owner_id in followers
+        for post_id, created in posts
+    )
+    while batch := list(islice(entries, BATCH_SIZE)):
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+    response_cache.invalidate_timelines(followers)
+
+
+def rebuild(owner_ids=None):
+    """Recompute timelines from scratch for ``owner_ids`` (all users if None).
+
+    Works on chunks of owners with two joined queries each (own posts and
+    posts of followees), so the cost does not grow with the number of
+    follow edges.
+    """
+    entries = TimelineEntry.objects.all()
+    if owner_ids is not None:
+        entries = entries.filter(owner_id__in=owner_ids)
+        owners = set(owner_ids)
+    else:
+        owners = set(Post.objects.values_list("author_id", flat=True).distinct())
+        owners.update(Profile.objects.values_list("user_id", flat=True))
+        owners.update(Follow.objects.values_list("follower_id", flat=True).distinct())
+
+    entries.delete()
+    response_cache.invalidate_timelines(owner_ids)
+    owners = sorted(owners)
+    for start in range(0, len(owners), OWNER_CHUNK):
+        chunk = owners[start : start + OWNER_CHUNK]
+        own = Post.objects.filter(author_id__in=chunk).values_list(
+            "author_id", "id", "created"
+        )
+        followed = (
+            Post.objects.filter(author__follower_edges__follower_id__in=chunk)
+            .exclude(author__profile__timeline_pulled=True)
+            .values_list("author__follower_edges__follower_id", "id", "created")
+        )
+        for rows in (own, followed):
+            rows = rows.iterator(chunk_size=BATCH_SIZE)
+            while batch := list(islice(rows, BATCH_SIZE)):
+                TimelineEntry.objects.bulk_create(
+                    [
+                        TimelineEntry(
+                            owner_id=owner_id, post_id=post_id, created=created
+                        )
+                        for owner_id, post_id, created in batch
+                    ],
+                    batch_size=BATCH_SIZE,
+                    ignore_conflicts=True,
+                )
@@ -0,0 +1,84 @@
+"""Sliding-window hashtag usage counters.
+
+Every time hashtags are attached to a post the matching
+``HashtagUsage`` rows of the current time bucket are incremented. Ranking
+a window only reads the buckets inside it, so its cost depends on the
+number of distinct hashtags used in the window and not on the total
+number of posts, and the ranking itself is cached for a short TTL.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import HashtagUsage
+
+WINDOWS = {
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+OPTIONS = {
+    "BUCKET_SECONDS": 300,
+    "CACHE_TTL": 30,
+    **getattr(settings, "TRENDING_HASHTAGS", {}),
+}
+
+
+def bucket_for(moment):
+    seconds = OPTIONS["BUCKET_SECONDS"]
+    timestamp = int(moment.timestamp())
+    return moment.replace(microsecond=0) - timedelta(seconds=timestamp % seconds)
+
+
+def record(hashtag_ids, moment=None, uses=1):
+    hashtag_ids = set(hashtag_ids)
+    if not hashtag_ids:
+        return
+    bucket = bucket_for(moment or timezone.now())
+    HashtagUsage.objects.bulk_create(
+        [HashtagUsage(hashtag_id=pk, bucket=bucket) for pk in hashtag_ids],
+        ignore_conflicts=True,
+    )
+    HashtagUsage.objects.filter(bucket=bucket, hashtag_id__in=hashtag_ids).update(
+        count=F("count") + uses
+    )
+
+
+def record_counts(counts, moment=None):
+    """``record`` a mapping of hashtag id to its number of uses."""
+    by_uses = defaultdict(list)
+    for hashtag_id, uses in counts.items():
+        by_uses[uses].append(hashtag_id)
+    for uses, hashtag_ids in by_uses.items():
+        record(hashtag_ids, moment, uses)
+
+
+def compute(window, limit):
+    since = bucket_for(timezone.now() - WINDOWS[window])
+    rows = (
+        HashtagUsage.objects.filter(bucket__gt=since)
+        .values("hashtag__name")
+        .annotate(uses=Sum("count"))
+        .order_by("-uses", "hashtag__name")[:limit]
+    )
+    return [{"name": row["hashtag__name"], "uses": row["uses"]} for row in rows]
+
+
+def top(window, limit=10):
+    key = f"trending-hashtags:{window}:{limit}"
+    result = cache.get(key)
+    if result is None:
+        result = compute(window, limit)
+        cache.set(key, result, OPTIONS["CACHE_TTL"])
+    return result
+
+
+def prune(now=None):
+    """Delete buckets that no longer fall inside the largest window."""
+    since = bucket_for((now or timezone.now()) - max(WINDOWS.values()))
+    deleted, _ = HashtagUsage.objects.filter(bucket__lte=since).delete()
+    return deleted
@@ -1,5 +1,6 @@
 from django.urls import path, include
 from rest_framework import routers
+from . import async_views
 from .views import HashtagViewSet, PostViewSet
 
 router = routers.DefaultRouter()
@@ -7,6 +8,8 @@ router.register(r"hashtag", HashtagViewSet, basename="hashtag")
 router.register(r"post", PostViewSet, basename="post")
 
 urlpatterns = [
+    path("async/post/", async_views.post_list, name="async-post-list"),
+    path("async/post/<int:pk>/", async_views.post_detail, name="async-post-detail"),
     path("", include(router.urls)),
 ]
 
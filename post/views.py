@@ -1,49 +1,266 @@
-from django.db.models import Q
+from functools import cached_property, partial
+
+from django.db import transaction
+from django.db.models import prefetch_related_objects
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework.authentication import TokenAuthentication
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 
+from social_media_api import db_router, instrumentation
+from social_media_api.conditional import conditional_response, make_etag
+from social_media_api.db_router import ReplicaReadMixin
+from user.authentication import CachedTokenAuthentication
+
+from . import bulk, ranking, response_cache, search, timeline
+from . import trending as trends
+from .hashtag_index import hashtag_index
 from .models import Hashtag, Post
+from .pagination import PostCursorPagination, PostSearchPagination
 from .permissions import IsOwnerOrReadOnly
-from .serializers import HashtagSerializer, PostSerializer, PostDetailSerializer
+from .serializers import (
+    BulkDeleteSerializer,
+    BulkPostSerializer,
+    HashtagSerializer,
+    PostSerializer,
+    PostDetailSerializer,
+    TrendingHashtagSerializer,
+)
+
 
+def filter_feed(queryset, query_params):
+    """Apply the ``author`` and ``hashtag`` filters of the post list."""
+    author = query_params.get("author")
+    hashtag = query_params.get("hashtag")
 
-class HashtagViewSet(ModelViewSet):
+    if author:
+        queryset = queryset.filter(author__in=author)
+
+    if hashtag:
+        # A subquery, so a post with several matching tags is listed once.
+        tagged = Post.hashtag.through.objects.filter(
+            hashtag__in=Hashtag.objects.with_prefix(hashtag)
+        )
+        queryset = queryset.filter(pk__in=tagged.values("post_id"))
+
+    return queryset
+
+
+class HashtagViewSet(ReplicaReadMixin, ModelViewSet):
     queryset = Hashtag.objects.all()
     serializer_class = HashtagSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
+    max_suggestions = 50
+    trending_size = 10
 
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "prefix",
+                type=str,
+                description="Autocomplete hashtags starting with the prefix "
+                            "ex. ?prefix=py",
+            ),
+            OpenApiParameter(
+                "limit",
+                type=int,
+                description="Maximum number of suggestions (default 10, max 50)",
+            ),
+        ]
+    )
+    def list(self, request, *args, **kwargs):
+        prefix = request.query_params.get("prefix")
+        if prefix is None:
+            key = response_cache.hashtag_list_key(request.query_params.urlencode())
+            data = response_cache.fetch(key)
+            if data is not None:
+                return Response(data)
+            with db_router.primary():
+                response = super().list(request, *args, **kwargs)
+            response_cache.store(key, response.data)
+            return response
+
+        try:
+            limit = min(
+                int(request.query_params.get("limit", 10)), self.max_suggestions
+            )
+        except ValueError:
+            raise ValidationError({"limit": "A valid integer is required."})
+        names = hashtag_index.suggest(prefix, max(limit, 0))
+        return Response([{"name": name} for name in names])
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "window",
+                type=str,
+                enum=[*trends.WINDOWS],
+                description="Ranking window, ex. ?window=day (default hour)",
+            ),
+        ],
+        responses=TrendingHashtagSerializer(many=True),
+    )
+    @action(detail=False, methods=["get"], pagination_class=None)
+    def trending(self, request):
+        window = request.query_params.get("window", "hour")
+        if window not in trends.WINDOWS:
+            raise ValidationError({"window": f"Choose from {list(trends.WINDOWS)}."})
+        return Response(trends.top(window, self.trending_size))
 
-class PostViewSet(ModelViewSet):
-    authentication_classes = (TokenAuthentication,)
+
+class PostViewSet(ReplicaReadMixin, ModelViewSet):
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [IsOwnerOrReadOnly, IsAuthenticated]
+    pagination_class = PostCursorPagination
     queryset = Post.objects.all()
+    bulk_limit = 1000
+    rankings = ["top"]
 
     def get_queryset(self):
-        following = self.request.user.profile.following.all()
-        queryset = self.queryset.filter(
-            Q(author__in=list(following)) | Q(author=self.request.user)
-        )
-        author = self.request.query_params.get("author")
-        hashtag = self.request.query_params.get("hashtag")
+        if self.action == "retrieve":
+            # Posts of pulled authors are not in their followers' timelines.
+            queryset = self.queryset.filter(timeline.visible_to(self.request.user.pk))
+        else:
+            queryset = timeline.feed(self.request.user.pk)
+        if self.action in ("list", "retrieve"):
+            queryset = queryset.prefetch_related("hashtag")
+        queryset = filter_feed(queryset, self.request.query_params)
+
+        if self.search_query:
+            queryset = (
+                search.get_backend()
+                .search(queryset, self.search_query)
+                .order_by("search_rank", "-created", "-id")
+            )
 
-        if author:
-            queryset = queryset.filter(author__in=author)
+        return queryset
 
-        if hashtag:
-            queryset = queryset.filter(hashtag__name__icontains=hashtag)
+    @property
+    def search_query(self):
+        request = getattr(self, "request", None)
+        if request is None or self.action != "list":
+            return None
+        return request.query_params.get("q", "").strip() or None
 
-        return queryset.distinct()
+    @property
+    def paginator(self):
+        if not hasattr(self, "_paginator"):
+            if self.search_query:
+                self._paginator = PostSearchPagination()
+            else:
+                self._paginator = self.pagination_class()
+        return self._paginator
 
     def get_serializer_class(self):
         if self.action == "retrieve":
             return PostDetailSerializer
         return PostSerializer
 
+    # The post, its author's counter, timeline and hashtags change together.
+    @transaction.atomic
     def perform_create(self, serializer):
         serializer.save(author=self.request.user)
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        instance.delete()
+
+    def retrieve(self, request, *args, **kwargs):
+        if request.query_params or not kwargs["pk"].isdigit():
+            return super().retrieve(request, *args, **kwargs)
+
+        post_id = int(kwargs["pk"])
+        # The key is read before the post so a concurrent write can only
+        # leave fresher data under an outdated version, never the reverse.
+        key = response_cache.post_detail_key(post_id)
+        data = response_cache.fetch(key)
+        if data is not None and self.is_visible(post_id):
+            return Response(data)
+
+        # Cached responses are shared, never fill them from a lagging replica.
+        with db_router.primary():
+            response = super().retrieve(request, *args, **kwargs)
+        response_cache.store(key, response.data)
+        return response
+
+    @extend_schema(
+        request=BulkPostSerializer(many=True),
+        responses={status.HTTP_201_CREATED: PostSerializer(many=True)},
+        description="Create up to 1000 posts in one transaction. Hashtags are "
+        "given by name and created when missing.",
+    )
+    @action(detail=False, methods=["post"])
+    def bulk_create(self, request):
+        serializer = BulkPostSerializer(
+            data=request.data, many=True, max_length=self.bulk_limit
+        )
+        serializer.is_valid(raise_exception=True)
+        posts = bulk.create_posts(request.user, serializer.validated_data)
+
+        created = Post.objects.filter(pk__in=[post.id for post in posts])
+        created = created.prefetch_related("hashtag").order_by("id")
+        return Response(
+            PostSerializer(created, many=True).data, status=status.HTTP_201_CREATED
+        )
+
+    @extend_schema(
+        request=BulkDeleteSerializer,
+        responses={status.HTTP_204_NO_CONTENT: None},
+        description="Delete several own posts at once. Nothing is deleted "
+        "unless every post exists and belongs to the user.",
+    )
+    @action(detail=False, methods=["post"])
+    def bulk_delete(self, request):
+        serializer = BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = set(serializer.validated_data["ids"])
+
+        posts = list(Post.objects.filter(pk__in=ids).only("author_id"))
+        missing = ids - {post.id for post in posts}
+        if missing:
+            raise NotFound({"ids": sorted(missing)})
+        for post in posts:
+            self.check_object_permissions(request, post)
+
+        bulk.delete_posts(posts)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    def is_visible(self, post_id):
+        return (
+            Post.objects.filter(timeline.visible_to(self.request.user.pk))
+            .filter(pk=post_id)
+            .exists()
+        )
+
+    @cached_property
+    def pulled_authors(self):
+        return list(timeline.pulled_authors(self.request.user.pk))
+
+    def pulled_querysets(self):
+        """One queryset per pulled author, each an index range scan."""
+        return [
+            filter_feed(timeline.pulled_feed(author_id), self.request.query_params)
+            for author_id in self.pulled_authors
+        ]
+
+    def paginate_queryset(self, queryset):
+        if self.search_query:
+            return super().paginate_queryset(queryset)
+        instrumentation.tag("feed", "hybrid" if self.pulled_authors else "push")
+        if not self.pulled_authors:
+            return super().paginate_queryset(queryset)
+
+        page = self.paginator.paginate_merged(
+            [queryset.prefetch_related(None), *self.pulled_querysets()],
+            self.request,
+            view=self,
+        )
+        prefetch_related_objects(page, "hashtag")
+        return page
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -54,10 +271,68 @@ class PostViewSet(ModelViewSet):
             OpenApiParameter(
                 "hashtag",
                 type=str,
-                description="Filtering by hashtag (write some symbol that "
-                            "contains in username). ex. ?hashtag=po",
+                description="Filtering by hashtag (write the beginning of "
+                            "the hashtag name). ex. ?hashtag=po",
+            ),
+            OpenApiParameter(
+                "q",
+                type=str,
+                description="Full-text search in title and content, results "
+                            "are ranked and page numbered. ex. ?q=django",
+            ),
+            OpenApiParameter(
+                "ranking",
+                type=str,
+                enum=["top"],
+                description="Return the best page of the recent posts instead "
+                            "of the newest ones. ex. ?ranking=top",
             ),
         ]
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        if "ranking" in request.query_params:
+            if request.query_params["ranking"] not in self.rankings:
+                raise ValidationError({"ranking": f"Choose from {self.rankings}."})
+            if self.search_query:
+                raise ValidationError({"ranking": "Search results are already ranked."})
+            # Scores move with time and budget: no validator can vouch for them.
+            return self.ranked_list(request)
+        render = partial(self.feed_list, request, *args, **kwargs)
+        return conditional_response(request, render, etag=self.feed_etag())
+
+    def feed_list(self, request, *args, **kwargs):
+        response = super().list(request, *args, **kwargs)
+        if not self.search_query:
+            response["X-Feed-Path"] = "hybrid" if self.pulled_authors else "push"
+        return response
+
+    def ranked_list(self, request):
+        candidates = ranking.candidates(
+            self.filter_queryset(self.get_queryset()), *self.pulled_querysets()
+        )
+        top, ranked = ranking.rank(
+            request.user, candidates, self.paginator.get_page_size(request)
+        )
+        posts = (
+            Post.objects.filter(pk__in=[candidate.post_id for candidate in top])
+            .prefetch_related("hashtag")
+            .in_bulk()
+        )
+        page = [
+            posts[candidate.post_id] for candidate in top if candidate.post_id in posts
+        ]
+        return Response(
+            {
+                "ranking": "top" if ranked else "chronological",
+                "results": PostSerializer(page, many=True).data,
+            }
+        )
+
+    def feed_etag(self):
+        # Version tokens bumped by every change to the timelines read.
+        owners = [self.request.user.pk, *self.pulled_authors]
+        return make_etag(
+            self.request.get_full_path(),
+            *owners,
+            *response_cache.feed_versions(owners),
+        )
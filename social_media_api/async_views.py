@@ -0,0 +1,58 @@
+"""Plumbing for the async read endpoints.
+
+DRF views are synchronous, so the hottest read paths have plain Django
+``async def`` twins (see ``post.async_views`` and ``user.async_views``).
+Served by an ASGI worker they stay on the event loop and only leave it for
+the queries, so one worker keeps many slow clients in flight instead of
+tying up a thread per request.
+"""
+import functools
+
+from django.http import HttpResponseBase, JsonResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+
+from user.authentication import aauthenticate
+
+SAFE_METHODS = ("GET", "HEAD", "OPTIONS")
+
+
+def async_api_view(view):
+    """Turn ``view`` into a token authenticated, read-only JSON endpoint.
+
+    ``view`` is awaited with a DRF ``Request`` and returns the data to
+    render, or a response of its own when it sets headers; API exceptions
+    are answered like DRF's exception handler does.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        request = Request(request)
+        try:
+            if request.method not in SAFE_METHODS:
+                raise exceptions.MethodNotAllowed(request.method)
+            credentials = await aauthenticate(request)
+            if credentials is None:
+                raise exceptions.NotAuthenticated()
+            request.user, request.auth = credentials
+            data = await view(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return error_response(exc)
+        if isinstance(data, HttpResponseBase):
+            return data
+        return JsonResponse(data, safe=False)
+
+    return wrapper
+
+
+def error_response(exc):
+    if isinstance(exc.detail, (list, dict)):
+        data = exc.detail
+    else:
+        data = {"detail": exc.detail}
+    response = JsonResponse(data, status=exc.status_code, safe=False)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response["WWW-Authenticate"] = "Token"
+    if isinstance(exc, exceptions.MethodNotAllowed):
+        response["Allow"] = ", ".join(SAFE_METHODS)
+    return response
@@ -0,0 +1,33 @@
+"""Conditional GET support for API views.
+
+Views compute validators (an ETag and optionally a Last-Modified date)
+from a small aggregate query and answer ``If-None-Match`` /
+``If-Modified-Since`` with ``304 Not Modified`` before anything is
+serialized.
+"""
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def conditional_response(request, render, etag=None, last_modified=None):
+    """Return ``304`` when the client's copy is current, else ``render()``."""
+    timestamp = int(last_modified.timestamp()) if last_modified else None
+    response = get_conditional_response(
+        request, etag=quote_etag(etag) if etag else None, last_modified=timestamp
+    )
+    if response is None:
+        response = render()
+    if response.status_code in (200, 304):
+        if etag:
+            response["ETag"] = quote_etag(etag)
+        if timestamp is not None:
+            response["Last-Modified"] = http_date(timestamp)
+        # Validators depend on who is asking.
+        patch_vary_headers(response, ("Authorization",))
+    return response
@@ -0,0 +1,104 @@
+"""Routing of API reads to read replicas.
+
+Views using ``ReplicaReadMixin`` send the queries of safe-method requests
+to one of ``DATABASE_REPLICAS["ALIASES"]``, chosen once per request so a
+response never mixes two replicas. Everything else, writes included,
+stays on ``default``.
+
+Replicas lag behind the primary, so a user who sent a write is pinned to
+the primary for ``STICKY_SECONDS`` and reads their own writes. The pin is
+kept in a Django cache alias, shared between worker processes when that
+alias is.
+
+Locally, copies of ``db.sqlite3`` stand in for the replicas: list them in
+the ``DATABASE_REPLICAS`` environment variable and refresh them with
+``cp db.sqlite3 replica1.sqlite3`` to simulate replication.
+"""
+import contextvars
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.permissions import SAFE_METHODS
+
+OPTIONS = {
+    "ALIASES": [],
+    "STICKY_SECONDS": 10,
+    "CACHE_ALIAS": "default",
+    **getattr(settings, "DATABASE_REPLICAS", {}),
+}
+
+_read_alias = contextvars.ContextVar("db_read_alias", default=None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return "default"
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in OPTIONS["ALIASES"]:
+            return False
+        return None
+
+
+def choose_replica():
+    return random.choice(OPTIONS["ALIASES"])
+
+
+def reading_from_replica():
+    return _read_alias.get() is not None
+
+
+@contextmanager
+def primary():
+    """Read from the primary for the block, e.g. to fill shared caches."""
+    token = _read_alias.set(None)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _pin_key(user_id):
+    return f"db-router:pinned:{user_id}"
+
+
+def pin(user):
+    caches[OPTIONS["CACHE_ALIAS"]].set(
+        _pin_key(user.pk), True, OPTIONS["STICKY_SECONDS"]
+    )
+
+
+def is_pinned(user):
+    return bool(caches[OPTIONS["CACHE_ALIAS"]].get(_pin_key(user.pk)))
+
+
+class ReplicaReadMixin:
+    """Serve safe-method requests of an API view from a read replica.
+
+    Authentication runs on the primary, so freshly issued tokens work.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        token = _read_alias.set(None)
+        try:
+            return super().dispatch(request, *args, **kwargs)
+        finally:
+            _read_alias.reset(token)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        authenticated = request.user.is_authenticated
+        if request.method not in SAFE_METHODS:
+            if authenticated:
+                pin(request.user)
+        elif OPTIONS["ALIASES"] and not (authenticated and is_pinned(request.user)):
+            _read_alias.set(choose_replica())
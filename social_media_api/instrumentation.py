@@ -0,0 +1,296 @@
+"""Per-request performance instrumentation.
+
+``InstrumentationMiddleware`` samples ``INSTRUMENTATION["SAMPLE_RATE"]`` of
+the requests and records, per resolved route (e.g. ``GET post-list``), the
+total time, time spent in the database, the query count, the time spent
+in serializers and the response size. Sampled responses carry a
+``Server-Timing`` header and are logged as one JSON line; all samples are
+aggregated into fixed-bucket histograms exposed to staff at
+``/api/instrumentation/``.
+"""
+import bisect
+import contextvars
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import ExitStack, contextmanager
+
+from asgiref.sync import (
+    iscoroutinefunction,
+    markcoroutinefunction,
+    sync_to_async,
+)
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from user.authentication import CachedTokenAuthentication
+
+OPTIONS = {
+    "SAMPLE_RATE": 1.0,
+    "SERVER_TIMING": True,
+    "LOG": True,
+    **getattr(settings, "INSTRUMENTATION", {}),
+}
+
+logger = logging.getLogger(__name__)
+
+MILLISECONDS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+QUERIES = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+BYTES = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+
+
+class Histogram:
+    """Counts of observations falling at or below each of ``bounds``."""
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.total = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.total += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, percent):
+        """Upper bound of the bucket holding the ``percent`` percentile."""
+        if not self.total:
+            return None
+        rank = percent / 100 * self.total
+        seen = 0
+        for bound, count in zip(self.bounds, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def as_dict(self):
+        return {
+            "count": self.total,
+            "mean": round(self.sum / self.total, 3) if self.total else None,
+            "max": round(self.max, 3),
+            "p50": self.percentile(50),
+            "p95": self.percentile(95),
+            "p99": self.percentile(99),
+            "buckets": {
+                **{str(bound): count for bound, count in zip(self.bounds, self.counts)},
+                "inf": self.counts[-1],
+            },
+        }
+
+
+class Registry:
+    metrics = {
+        "total_ms": MILLISECONDS,
+        "db_ms": MILLISECONDS,
+        "serializer_ms": MILLISECONDS,
+        "queries": QUERIES,
+        "bytes": BYTES,
+    }
+
+    def __init__(self):
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, sample):
+        with self._lock:
+            histograms = self._routes.get(route)
+            if histograms is None:
+                histograms = self._routes[route] = {
+                    metric: Histogram(bounds) for metric, bounds in self.metrics.items()
+                }
+            for metric, histogram in histograms.items():
+                value = sample.get(metric)
+                if value is not None:
+                    histogram.observe(value)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                route: {
+                    metric: histogram.as_dict()
+                    for metric, histogram in histograms.items()
+                }
+                for route, histograms in sorted(self._routes.items())
+            }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+
+
+registry = Registry()
+
+
+class Sample:
+    def __init__(self):
+        self.db_time = 0.0
+        self.queries = 0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+        self.total = 0.0
+        self.tags = {}
+
+    def __call__(self, execute, sql, params, many, context):
+        # Installed as a connection execute wrapper.
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - start
+            self.queries += 1
+
+
+_current = contextvars.ContextVar("instrumentation_sample", default=None)
+
+
+class TimedSerializerMixin:
+    """Adds the time spent validating and representing to the current sample.
+
+    Only the outermost serializer is timed, so nested serializers are not
+    counted twice.
+    """
+
+    def _timed(self, method, *args, **kwargs):
+        sample = _current.get()
+        if sample is None or sample.serializer_depth:
+            return method(*args, **kwargs)
+        sample.serializer_depth += 1
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            sample.serializer_time += time.perf_counter() - start
+            sample.serializer_depth -= 1
+
+    def to_representation(self, instance):
+        return self._timed(super().to_representation, instance)
+
+    def run_validation(self, *args, **kwargs):
+        return self._timed(super().run_validation, *args, **kwargs)
+
+
+def tag(name, value):
+    """Label the current sample, e.g. with the code path that served it.
+
+    Tagged samples are also aggregated under ``"<route> <name>=<value>"``.
+    """
+    sample = _current.get()
+    if sample is not None:
+        sample.tags[name] = value
+
+
+def route_name(request):
+    match = request.resolver_match
+    name = match.url_name if match and match.url_name else "unresolved"
+    return f"{request.method} {name}"
+
+
+class InstrumentationMiddleware:
+    """Sync and async capable, so async views are not pushed onto a thread."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= OPTIONS["SAMPLE_RATE"]:
+            return self.get_response(request)
+
+        with self.sampling() as sample, wrap_connections(sample):
+            response = self.get_response(request)
+        return self.finish(request, response, sample)
+
+    async def __acall__(self, request):
+        if random.random() >= OPTIONS["SAMPLE_RATE"]:
+            return await self.get_response(request)
+
+        with self.sampling() as sample:
+            # Connections are per thread and async views query from the
+            # thread sync_to_async hands them, so wrap the ones of that thread.
+            wrappers = await sync_to_async(wrap_connections)(sample)
+            try:
+                response = await self.get_response(request)
+            finally:
+                await sync_to_async(wrappers.close)()
+        return self.finish(request, response, sample)
+
+    @contextmanager
+    def sampling(self):
+        sample = Sample()
+        token = _current.set(sample)
+        start = time.perf_counter()
+        try:
+            yield sample
+        finally:
+            _current.reset(token)
+            sample.total = time.perf_counter() - start
+
+    def finish(self, request, response, sample):
+        record = {
+            "route": route_name(request),
+            "status": response.status_code,
+            "total_ms": round(sample.total * 1000, 3),
+            "db_ms": round(sample.db_time * 1000, 3),
+            "serializer_ms": round(sample.serializer_time * 1000, 3),
+            "queries": sample.queries,
+            "bytes": None if response.streaming else len(response.content),
+        }
+        if sample.tags:
+            record["tags"] = sample.tags
+        registry.record(record["route"], record)
+        for name, value in sample.tags.items():
+            registry.record(f"{record['route']} {name}={value}", record)
+        if OPTIONS["SERVER_TIMING"]:
+            response["Server-Timing"] = server_timing(record)
+        if OPTIONS["LOG"]:
+            logger.info(json.dumps(record), extra={"instrumentation": record})
+        return response
+
+
+def wrap_connections(sample):
+    """Install ``sample`` on every connection, undone by closing the stack."""
+    stack = ExitStack()
+    for connection in connections.all():
+        stack.enter_context(connection.execute_wrapper(sample))
+    return stack
+
+
+def server_timing(record):
+    return ", ".join(
+        [
+            f"total;dur={record['total_ms']}",
+            f'db;dur={record["db_ms"]};desc="{record["queries"]} queries"',
+            f"serializer;dur={record['serializer_ms']}",
+        ]
+    )
+
+
+class InstrumentationView(APIView):
+    """Request histograms of this process, keyed by method and route."""
+
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return Response(
+            {"sample_rate": OPTIONS["SAMPLE_RATE"], "routes": registry.snapshot()}
+        )
+
+    def delete(self, request):
+        registry.reset()
+        return Response(status=204)
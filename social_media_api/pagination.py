@@ -0,0 +1,189 @@
+import heapq
+import json
+from base64 import b64decode, b64encode
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+# Integer cursor values must fit the database's signed 64-bit columns.
+MIN_INTEGER, MAX_INTEGER = -(2**63), 2**63 - 1
+
+
+class KeysetCursorPagination(CursorPagination):
+    """Cursor pagination keyed on the full ``ordering`` tuple.
+
+    DRF's ``CursorPagination`` only stores the first ordering field and
+    falls back to an OFFSET to step over ties. Here the cursor carries the
+    values of every ordering field of the boundary row, and the next page is
+    selected with a lexicographic ``(a, b) < (x, y)`` filter, so every page is
+    a single index range scan and rows inserted while a client is paging can
+    neither be duplicated nor skipped. The last ordering field must be unique.
+    """
+
+    page_size = 20
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    ordering = ("-id",)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.page_queryset(queryset, request, view)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """``paginate_queryset`` for async views, the page is read with
+        ``aiterator``."""
+        queryset = self.page_queryset(queryset, request, view)
+        return self.set_page([row async for row in queryset.aiterator()])
+
+    def paginate_merged(self, querysets, request, view=None):
+        """Paginate the union of ``querysets`` as if it were one queryset.
+
+        Every queryset contributes at most one page, read as its own range
+        scan, and the pages are k-way merged; rows found in several
+        querysets are kept once. Ordering fields must all go the same way.
+        """
+        pages = [list(self.page_queryset(qs, request, view)) for qs in querysets]
+        return self.set_page(self.merge(pages))
+
+    async def apaginate_merged(self, querysets, request, view=None):
+        pages = []
+        for queryset in querysets:
+            queryset = self.page_queryset(queryset, request, view)
+            pages.append([row async for row in queryset.aiterator()])
+        return self.set_page(self.merge(pages))
+
+    def merge(self, pages):
+        descending = self.ordering[0].startswith("-") != self.reverse
+        rows = heapq.merge(*pages, key=self.get_position, reverse=descending)
+        seen = set()
+        merged = []
+        for row in rows:
+            if row.pk not in seen:
+                seen.add(row.pk)
+                merged.append(row)
+                if len(merged) > self.page_size:
+                    break
+        return merged
+
+    def page_queryset(self, queryset, request, view=None):
+        """Slice of ``queryset`` holding the requested page and one more row."""
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.reverse, self.position = self.decode_cursor(request)
+        ordering = self.invert(self.ordering) if self.reverse else self.ordering
+
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            self.position = self.parse_position(queryset.model, self.position)
+            queryset = queryset.filter(self.after(ordering, self.position))
+        return queryset[: self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if self.reverse:
+            self.page.reverse()
+
+        if self.reverse:
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        return self.ordering
+
+    @staticmethod
+    def invert(ordering):
+        return tuple(
+            field[1:] if field.startswith("-") else f"-{field}" for field in ordering
+        )
+
+    @staticmethod
+    def after(ordering, position):
+        """Build ``Q`` selecting rows strictly past ``position`` in ``ordering``."""
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            condition |= Q(**equal, **{f"{name}__{lookup}": value})
+            equal[name] = value
+        return condition
+
+    def parse_position(self, model, position):
+        try:
+            position = [
+                self.get_position_field(model, field.lstrip("-")).to_python(value)
+                for field, value in zip(self.ordering, position)
+            ]
+        except (
+            FieldDoesNotExist,
+            ValidationError,
+            TypeError,
+            ValueError,
+            OverflowError,
+        ):
+            raise NotFound(self.invalid_cursor_message)
+        for value in position:
+            if value is None or (
+                isinstance(value, int) and not MIN_INTEGER <= value <= MAX_INTEGER
+            ):
+                raise NotFound(self.invalid_cursor_message)
+        return position
+
+    def get_position_field(self, model, name):
+        """Model field that parses the cursor value of ordering field ``name``."""
+        return model._meta.get_field(name)
+
+    def get_position(self, instance):
+        return [getattr(instance, field.lstrip("-")) for field in self.ordering]
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(False, self.get_position(self.page[-1]))
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(True, self.get_position(self.page[0]))
+
+    def encode_cursor(self, reverse, position):
+        payload = {"p": [self.serialize_value(value) for value in position]}
+        if reverse:
+            payload["r"] = 1
+        encoded = b64encode(json.dumps(payload).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return False, None
+
+        try:
+            payload = json.loads(b64decode(encoded.encode("ascii")).decode("ascii"))
+            position = payload["p"]
+            if not isinstance(position, list) or len(position) != len(self.ordering):
+                raise ValueError
+            for value in position:
+                if isinstance(value, bool) or not isinstance(value, (str, int, float)):
+                    raise ValueError
+            reverse = bool(payload.get("r"))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return reverse, position
+
+    @staticmethod
+    def serialize_value(value):
+        if hasattr(value, "isoformat"):
+            return value.isoformat()
+        return value
@@ -46,9 +46,12 @@ INSTALLED_APPS = [
     "drf_spectacular",
     "user",
     "post",
+    "jobs",
+    "benchmarks",
 ]
 
 MIDDLEWARE = [
+    "social_media_api.instrumentation.InstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -89,6 +92,32 @@ DATABASES = {
     }
 }
 
+# Read replicas as comma separated SQLite files, e.g.
+# DATABASE_REPLICAS=replica1.sqlite3,replica2.sqlite3, see
+# social_media_api.db_router. The test runner points them at the test
+# database instead of creating their own.
+DATABASES.update(
+    {
+        f"replica{index}": {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / name.strip(),
+            "TEST": {"MIRROR": "default"},
+        }
+        for index, name in enumerate(
+            filter(None, os.environ.get("DATABASE_REPLICAS", "").split(",")),
+            start=1,
+        )
+    }
+)
+
+DATABASE_ROUTERS = ["social_media_api.db_router.ReplicaRouter"]
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -129,6 +158,15 @@ STATIC_URL = "static/"
 MEDIA_ROOT = BASE_DIR / "media"
 MEDIA_URL = "/media/"
 
+# Profile picture uploads are validated against these limits, re-encoded
+# without metadata and rendered as square thumbnails of VARIANTS pixels.
+PROFILE_IMAGES = {
+    "MAX_UPLOAD_BYTES": 5 * 1024 * 1024,
+    "MAX_PIXELS": 40_000_000,
+    "MAX_DIMENSION": 2048,
+    "VARIANTS": (64, 256, 1024),
+}
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -139,6 +177,100 @@ REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
 }
 
+# Resolved auth tokens are cached in-process ("local") or in a Django
+# cache alias ("django"), which is required to share invalidation
+# between worker processes.
+TOKEN_AUTH_CACHE = {
+    "BACKEND": os.environ.get("TOKEN_AUTH_CACHE_BACKEND", "local"),
+    "TTL": 60,
+    "MAX_SIZE": 10000,
+    "CACHE_ALIAS": "default",
+}
+
+# Hashtag autocomplete keeps all names in a per-process sorted index that
+# is refreshed incrementally and fully reloaded every TTL seconds.
+HASHTAG_INDEX = {
+    "TTL": 300,
+}
+
+# "People you may know" suggestions walk a per-process follow graph that is
+# updated incrementally and fully reloaded every TTL seconds.
+FOLLOW_GRAPH = {
+    "TTL": 300,
+}
+
+# Hashtag usage is counted in BUCKET_SECONDS buckets, rankings are cached
+# for CACHE_TTL seconds.
+TRENDING_HASHTAGS = {
+    "BUCKET_SECONDS": 300,
+    "CACHE_TTL": 30,
+}
+
+# Full-text search backend for posts. Defaults to SQLite FTS5 on SQLite and
+# to post.search.DatabaseSearchBackend elsewhere.
+POST_SEARCH = {
+    "BACKEND": os.environ.get("POST_SEARCH_BACKEND"),
+}
+
+# ?ranking=top scores the newest CANDIDATES posts of the feed with the
+# SCORERS chain and falls back to chronological order after BUDGET_MS.
+FEED_RANKING = {
+    "CANDIDATES": 500,
+    "BUDGET_MS": 50,
+    "SCORERS": [
+        ("post.ranking.RecencyScorer", {"half_life_hours": 24}),
+        ("post.ranking.AuthorAffinityScorer", {"boost": 1.0}),
+        ("post.ranking.HashtagAffinityScorer", {"boost": 1.0, "history": 100}),
+    ],
+}
+
+# Authors reaching PULL_THRESHOLD followers have their posts merged into
+# feeds at read time instead of pushed to follower timelines. They go back
+# to pushing, with their PUSH_RECENT_POSTS newest posts, below
+# PUSH_THRESHOLD.
+TIMELINE = {
+    "PULL_THRESHOLD": 10000,
+    "PUSH_THRESHOLD": 8000,
+    "PUSH_RECENT_POSTS": 200,
+}
+
+# Slow write side effects (fan-out, search indexing, avatar thumbnails) go
+# through the jobs queue. EAGER runs them inline; set JOBS_EAGER=False and
+# start `manage.py run_workers` to run them in the background instead.
+JOBS = {
+    "EAGER": os.environ.get("JOBS_EAGER", "") != "False",
+    "BATCH_SIZE": 100,
+    "MAX_ATTEMPTS": 5,
+    "BACKOFF_SECONDS": 2,
+    "MAX_BACKOFF_SECONDS": 600,
+    "LEASE_SECONDS": 300,
+    "POLL_INTERVAL": 1.0,
+}
+
+# Post detail and hashtag list responses are cached for TTL seconds under
+# versioned keys that post and hashtag writes replace.
+RESPONSE_CACHE = {
+    "CACHE_ALIAS": "default",
+    "TTL": 600,
+}
+
+# Share of requests timed by InstrumentationMiddleware. Sampled requests get
+# a Server-Timing header and are logged at INFO to the
+# "social_media_api.instrumentation" logger.
+INSTRUMENTATION = {
+    "SAMPLE_RATE": float(os.environ.get("INSTRUMENTATION_SAMPLE_RATE", "0.05")),
+    "SERVER_TIMING": True,
+    "LOG": True,
+}
+
+# Safe-method API requests read from one of ALIASES; a user who wrote is
+# pinned to the primary for STICKY_SECONDS to read their own writes.
+DATABASE_REPLICAS = {
+    "ALIASES": [alias for alias in DATABASES if alias != "default"],
+    "STICKY_SECONDS": 10,
+    "CACHE_ALIAS": "default",
+}
+
 SPECTACULAR_SETTINGS = {
     "TITLE": "social media api",
     "DESCRIPTION": "API for simple Social Media with posts, hashtags and user preferences",
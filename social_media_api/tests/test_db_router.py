@@ -0,0 +1,113 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from post.models import Post
+from social_media_api import db_router
+from social_media_api.db_router import ReplicaRouter
+
+POST_URL = reverse("post:post-list")
+
+
+def with_replicas(*aliases):
+    return mock.patch.dict(db_router.OPTIONS, {"ALIASES": list(aliases)})
+
+
+class ReplicaRouterTest(TestCase):
+    def test_reads_default_outside_views(self):
+        self.assertIsNone(ReplicaRouter().db_for_read(Post))
+
+    def test_writes_go_to_default(self):
+        self.assertEqual(ReplicaRouter().db_for_write(Post), "default")
+
+    def test_replicas_are_not_migrated(self):
+        router = ReplicaRouter()
+        with with_replicas("replica1"):
+            self.assertFalse(router.allow_migrate("replica1", "post"))
+            self.assertIsNone(router.allow_migrate("default", "post"))
+
+
+class ReplicaReadMixinTest(TestCase):
+    """The test database stands in for the replica, routing is observed
+    through the aliases the router hands out."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email="reader@example.com", password="password"
+        )
+        self.other = get_user_model().objects.create_user(
+            email="other@example.com", password="password"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.post = Post.objects.create(author=self.user, title="T", content="C")
+
+        self.reads = []
+        route = ReplicaRouter.db_for_read
+
+        def db_for_read(router, model, **hints):
+            alias = route(router, model, **hints)
+            self.reads.append((model._meta.model_name, alias))
+            return alias
+
+        patcher = mock.patch.object(ReplicaRouter, "db_for_read", db_for_read)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(db_router, "choose_replica", return_value="default")
+        self.choose_replica = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_safe_requests_read_from_a_replica(self):
+        with with_replicas("replica1"):
+            response = self.client.get(POST_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.choose_replica.assert_called_once()
+        self.assertIn(("post", "default"), self.reads)
+
+    def test_without_replicas_reads_stay_on_primary(self):
+        self.client.get(POST_URL)
+
+        self.choose_replica.assert_not_called()
+        self.assertNotIn(("post", "default"), self.reads)
+
+    def test_writer_reads_own_writes_from_primary(self):
+        with with_replicas("replica1"):
+            self.client.patch(
+                reverse("post:post-detail", args=[self.post.id]), {"title": "New"}
+            )
+            self.client.get(POST_URL)
+
+        self.choose_replica.assert_not_called()
+
+        # Other users are not pinned.
+        self.client.force_authenticate(self.other)
+        with with_replicas("replica1"):
+            self.client.get(POST_URL)
+        self.choose_replica.assert_called_once()
+
+    def test_pin_expires(self):
+        with with_replicas("replica1"), mock.patch.dict(
+            db_router.OPTIONS, {"STICKY_SECONDS": 0}
+        ):
+            self.client.patch(
+                reverse("post:post-detail", args=[self.post.id]), {"title": "New"}
+            )
+            self.client.get(POST_URL)
+
+        self.choose_replica.assert_called_once()
+
+    def test_shared_cache_is_filled_from_primary(self):
+        url = reverse("post:post-detail", args=[self.post.id])
+        with with_replicas("replica1"):
+            self.client.get(url)
+
+        self.choose_replica.assert_called_once()
+        self.assertIn(("post", None), self.reads)
+        self.assertNotIn(("post", "default"), self.reads)
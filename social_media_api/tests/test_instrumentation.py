@@ -0,0 +1,105 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from post.models import Post
+from social_media_api import instrumentation
+from social_media_api.instrumentation import Histogram, registry
+
+POST_URL = reverse("post:post-list")
+INSTRUMENTATION_URL = reverse("instrumentation")
+
+
+def sample_every_request(rate=1.0):
+    return mock.patch.dict(instrumentation.OPTIONS, {"SAMPLE_RATE": rate})
+
+
+class HistogramTest(TestCase):
+    def test_percentiles_use_bucket_bounds(self):
+        histogram = Histogram((1, 10, 100))
+        for value in (0.5, 3, 4, 5, 50):
+            histogram.observe(value)
+
+        self.assertEqual(histogram.percentile(50), 10)
+        self.assertEqual(histogram.percentile(99), 50)
+        self.assertEqual(
+            histogram.as_dict()["buckets"], {"1": 1, "10": 3, "100": 1, "inf": 0}
+        )
+
+
+class InstrumentationMiddlewareTest(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            email="user@example.com", password="password"
+        )
+        self.client.force_authenticate(self.user)
+        Post.objects.create(author=self.user, title="Title", content="Content")
+        registry.reset()
+        self.addCleanup(registry.reset)
+
+    def test_sampled_request_is_timed(self):
+        with sample_every_request(), self.assertLogs(
+            "social_media_api.instrumentation", "INFO"
+        ) as logs:
+            response = self.client.get(POST_URL)
+
+        timing = response["Server-Timing"]
+        self.assertIn("total;dur=", timing)
+        self.assertIn("db;dur=", timing)
+        self.assertIn("serializer;dur=", timing)
+        self.assertIn('"route": "GET post-list"', logs.output[0])
+
+        metrics = registry.snapshot()["GET post-list"]
+        self.assertEqual(metrics["total_ms"]["count"], 1)
+        self.assertGreater(metrics["queries"]["max"], 0)
+        self.assertGreater(metrics["serializer_ms"]["max"], 0)
+        self.assertEqual(metrics["bytes"]["max"], len(response.content))
+
+    async def test_async_view_is_timed(self):
+        token = await Token.objects.acreate(user=self.user)
+        with sample_every_request(), self.assertLogs(
+            "social_media_api.instrumentation", "INFO"
+        ):
+            response = await self.async_client.get(
+                reverse("post:async-post-list"),
+                headers={"Authorization": f"Token {token.key}"},
+            )
+
+        self.assertIn("db;dur=", response["Server-Timing"])
+        metrics = registry.snapshot()["GET async-post-list"]
+        self.assertGreater(metrics["queries"]["max"], 0)
+
+    def test_unsampled_request_is_not_timed(self):
+        with sample_every_request(0.0):
+            response = self.client.get(POST_URL)
+
+        self.assertNotIn("Server-Timing", response)
+        self.assertEqual(registry.snapshot(), {})
+
+    def test_histograms_require_staff(self):
+        response = self.client.get(INSTRUMENTATION_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_reads_and_resets_histograms(self):
+        self.user.is_staff = True
+        self.user.save()
+        with sample_every_request(), self.assertLogs(
+            "social_media_api.instrumentation", "INFO"
+        ):
+            self.client.get(POST_URL)
+            response = self.client.get(INSTRUMENTATION_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("GET post-list", response.data["routes"])
+
+        response = self.client.delete(INSTRUMENTATION_URL)
+
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(registry.snapshot(), {})
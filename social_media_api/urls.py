@@ -23,11 +23,17 @@ from drf_spectacular.views import (
 )
 
 from social_media_api import settings
+from social_media_api.instrumentation import InstrumentationView
 
 urlpatterns = [
                   path("admin/", admin.site.urls),
                   path("api/user/", include("user.urls", namespace="user")),
                   path("api/post/", include("post.urls", namespace="post")),
+                  path(
+                      "api/instrumentation/",
+                      InstrumentationView.as_view(),
+                      name="instrumentation",
+                  ),
                   path("schema/", SpectacularAPIView.as_view(), name="schema"),
                   path(
                       "api/doc/swagger/",
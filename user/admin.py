@@ -2,9 +2,10 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
 from django.utils.translation import gettext_lazy as _
 
-from .models import User, Profile
+from .models import Follow, User, Profile
 
 admin.site.register(Profile)
+admin.site.register(Follow)
 
 
 @admin.register(User)
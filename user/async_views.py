@@ -0,0 +1,24 @@
+"""Async twin of the profile detail endpoint.
+
+Same response as ``ProfileViewSet.retrieve`` without conditional GETs.
+"""
+from rest_framework.exceptions import NotFound
+
+from social_media_api.async_views import async_api_view
+
+from .models import Profile
+from .serializers import ProfileDetailSerializer, includes_follows
+
+
+@async_api_view
+async def profile_detail(request, pk):
+    include_follows = includes_follows(request)
+    profiles = Profile.objects.select_related("user")
+    if include_follows:
+        profiles = profiles.prefetch_related("user__followers", "user__following")
+    try:
+        profile = await profiles.aget(pk=pk)
+    except Profile.DoesNotExist:
+        raise NotFound()
+    context = {"request": request, "include_follows": include_follows}
+    return ProfileDetailSerializer(profile, context=context).data
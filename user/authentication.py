@@ -0,0 +1,191 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    TokenAuthentication,
+    get_authorization_header,
+)
+from rest_framework.authtoken.models import Token
+
+
+class LRUCache:
+    """Thread-safe, size-bounded mapping whose entries expire after ``ttl``."""
+
+    def __init__(self, max_size, ttl):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    # In-process and never blocking, safe to call from the event loop.
+
+    async def aget(self, key):
+        return self.get(key)
+
+    async def aset(self, key, value):
+        self.set(key, value)
+
+
+class DjangoTokenCache:
+    """Token cache backed by a Django cache alias, shared between processes.
+
+    Keys carry a generation stored in the cache itself, so ``clear`` drops
+    every entry by bumping it without touching the rest of the cache.
+    """
+
+    prefix = "auth-token:"
+
+    def __init__(self, alias, ttl):
+        self.alias = alias
+        self.ttl = ttl
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _key(self, key):
+        generation = self.cache.get_or_set(self.prefix + "generation", 1, None)
+        return f"{self.prefix}{generation}:{key}"
+
+    async def _akey(self, key):
+        generation = await self.cache.aget_or_set(self.prefix + "generation", 1, None)
+        return f"{self.prefix}{generation}:{key}"
+
+    def get(self, key):
+        return self.cache.get(self._key(key))
+
+    async def aget(self, key):
+        return await self.cache.aget(await self._akey(key))
+
+    def set(self, key, value):
+        self.cache.set(self._key(key), value, self.ttl)
+
+    async def aset(self, key, value):
+        await self.cache.aset(await self._akey(key), value, self.ttl)
+
+    def delete(self, key):
+        self.cache.delete(self._key(key))
+
+    def clear(self):
+        try:
+            self.cache.incr(self.prefix + "generation")
+        except ValueError:
+            # Not set yet, or evicted: every entry is stale already.
+            self.cache.set(self.prefix + "generation", 2, None)
+
+
+def build_token_cache():
+    options = {
+        "BACKEND": "local",
+        "TTL": 60,
+        "MAX_SIZE": 10000,
+        "CACHE_ALIAS": "default",
+        **getattr(settings, "TOKEN_AUTH_CACHE", {}),
+    }
+    if options["BACKEND"] == "django":
+        return DjangoTokenCache(options["CACHE_ALIAS"], options["TTL"])
+    return LRUCache(options["MAX_SIZE"], options["TTL"])
+
+
+token_cache = build_token_cache()
+
+
+def invalidate_token(key):
+    token_cache.delete(key)
+
+
+def invalidate_user_tokens(user):
+    for key in Token.objects.filter(user=user).values_list("key", flat=True):
+        invalidate_token(key)
+
+
+def _tokens(key):
+    return Token.objects.select_related("user").filter(key=key)
+
+
+def _credentials(token):
+    """Check a looked up ``token`` and return ``(user, token)`` for a request."""
+    if token is None:
+        raise exceptions.AuthenticationFailed("Invalid token.")
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed("User inactive or deleted.")
+    # Hand every request its own copy so views cannot mutate the cached one.
+    token = copy.deepcopy(token)
+    return token.user, token
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """``TokenAuthentication`` that caches resolved tokens.
+
+    Saves the token + user join on every authenticated request. Entries are
+    dropped when the token is deleted or the user is saved (see
+    ``user.signals``); with the default in-process backend other worker
+    processes keep serving a revoked token for at most ``TOKEN_AUTH_CACHE
+    ["TTL"]`` seconds, use ``"BACKEND": "django"`` with a shared cache to
+    avoid that window.
+    """
+
+    def authenticate_credentials(self, key):
+        token = token_cache.get(key)
+        if token is None:
+            token = _tokens(key).first()
+            if token is not None:
+                token_cache.set(key, token)
+        return _credentials(token)
+
+
+async def aauthenticate(request):
+    """``CachedTokenAuthentication`` for async views outside of DRF.
+
+    Returns ``(user, token)``, or ``None`` when the request carries no token.
+    The cache and, on a miss, the database are queried with their async
+    APIs.
+    """
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != b"token":
+        return None
+    if len(auth) != 2:
+        raise exceptions.AuthenticationFailed("Invalid token header.")
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed("Invalid token header.")
+
+    token = await token_cache.aget(key)
+    if token is None:
+        token = await _tokens(key).afirst()
+        if token is not None:
+            await token_cache.aset(key, token)
+    return _credentials(token)
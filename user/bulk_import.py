@@ -0,0 +1,252 @@
+"""Batched loading of users, profiles, follows, hashtags and posts.
+
+The input is NDJSON with one record per line, distinguished by ``type``::
+
+    {"type": "user", "id": 1, "email": "a@example.com"}
+    {"type": "profile", "user": 1, "username": "a", "bio": ""}
+    {"type": "follow", "follower": 1, "followee": 2}
+    {"type": "hashtag", "name": "django"}
+    {"type": "post", "author": 1, "title": "t", "content": "c",
+     "hashtag": ["django"], "created": "2023-06-01T12:00:00Z"}
+
+``id``, ``user``, ``author``, ``follower`` and ``followee`` are ids of the
+input file; a user must appear before the records referring to it.
+Records are checked as they are added, so errors point at their line. Rows
+are written with ``bulk_create`` while model signals are muted, and the
+derived data (timelines, counters, search index) is rebuilt once at the
+end instead of row by row.
+"""
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+
+from django.contrib.auth.hashers import make_password
+from django.db.models import signals
+from django.utils.dateparse import parse_datetime
+
+from post import response_cache, search, timeline
+from post.hashtag_index import hashtag_index
+from post.models import Hashtag, Post, normalize_hashtag
+
+from . import counters
+from .follow_graph import follow_graph
+from .models import Follow, Profile, User
+
+MODEL_SIGNALS = (
+    signals.pre_save,
+    signals.post_save,
+    signals.pre_delete,
+    signals.post_delete,
+    signals.m2m_changed,
+)
+
+
+@contextmanager
+def mute_signals(*muted):
+    """Disconnect every receiver of ``muted`` signals for the block.
+
+    Affects the whole process, only meant for offline commands.
+    """
+    muted = muted or MODEL_SIGNALS
+    saved = [(signal, signal.receivers) for signal in muted]
+    for signal in muted:
+        signal.receivers = []
+        signal.sender_receivers_cache.clear()
+    try:
+        yield
+    finally:
+        for signal, receivers in saved:
+            signal.receivers = receivers
+            signal.sender_receivers_cache.clear()
+
+
+class Importer:
+    required = {
+        "user": ("id", "email"),
+        "profile": ("user", "username"),
+        "follow": ("follower", "followee"),
+        "hashtag": ("name",),
+        "post": ("author", "title", "content"),
+    }
+    # Fields holding input ids of users.
+    references = {
+        "profile": ("user",),
+        "follow": ("follower", "followee"),
+        "post": ("author",),
+    }
+
+    def __init__(self, batch_size=5000, password="password"):
+        self.batch_size = batch_size
+        # Hashing is deliberately slow, every synthetic user shares one hash.
+        self.password = make_password(password)
+        self.user_ids = {}
+        # Input ids of every user added so far, flushed or not.
+        self.known_users = set()
+        self.hashtag_ids = {}
+        self.pending = defaultdict(list)
+        self.counts = Counter()
+        self.started = time.monotonic()
+
+    def add(self, record):
+        self.validate(record)
+        kind = record["type"]
+        if kind == "user":
+            self.known_users.add(record["id"])
+        self.pending[kind].append(record)
+        if len(self.pending[kind]) >= self.batch_size:
+            self.flush(kind)
+
+    def validate(self, record):
+        """Reject ``record`` before it is batched.
+
+        Raises ``KeyError`` for a missing field and ``ValueError`` for
+        anything else that would only fail once its batch is written.
+        """
+        if not isinstance(record, dict):
+            raise ValueError("Records must be JSON objects.")
+        kind = record.get("type")
+        if kind not in self.flushers:
+            raise ValueError(f"Unknown record type {kind!r}.")
+        for field in self.required[kind]:
+            if field not in record:
+                raise KeyError(field)
+        if kind == "user" and not isinstance(record["id"], (int, str)):
+            raise ValueError(f"Invalid user id {record['id']!r}.")
+        for field in self.references.get(kind, ()):
+            user = record[field]
+            if not isinstance(user, (int, str)) or user not in self.known_users:
+                raise ValueError(f"Unknown user {user!r} in {field!r}.")
+        if kind == "post" and record.get("created"):
+            created = record["created"]
+            if not isinstance(created, str) or parse_datetime(created) is None:
+                raise ValueError(f"Invalid created date {created!r}.")
+
+    def flush(self, kind=None):
+        kinds = list(self.flushers) if kind is None else [kind]
+        if any(kind != "user" for kind in kinds):
+            # Every other record refers to users read before it.
+            kinds = ["user", *(kind for kind in kinds if kind != "user")]
+        for kind in kinds:
+            records, self.pending[kind] = self.pending[kind], []
+            if records:
+                self.flushers[kind](self, records)
+                self.counts[kind] += len(records)
+
+    def finish(self):
+        self.flush()
+        counters.refresh_follow_counts()
+        timeline.reset_pull_state()
+        timeline.rebuild()
+        counters.refresh_post_counts()
+        search.get_backend().rebuild()
+        # Imported rows may reuse ids of cached responses.
+        response_cache.invalidate_hashtag_names()
+        hashtag_index.invalidate()
+        follow_graph.invalidate()
+
+    @property
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return sum(self.counts.values()) / elapsed if elapsed else 0.0
+
+    def _users(self, records):
+        users = User.objects.bulk_create(
+            [
+                User(
+                    email=User.objects.normalize_email(record["email"]),
+                    password=record.get("password") or self.password,
+                )
+                for record in records
+            ],
+            batch_size=self.batch_size,
+        )
+        for record, user in zip(records, users):
+            self.user_ids[record["id"]] = user.id
+
+    def _profiles(self, records):
+        Profile.objects.bulk_create(
+            [
+                Profile(
+                    user_id=self.user_ids[record["user"]],
+                    username=record["username"],
+                    bio=record.get("bio", ""),
+                )
+                for record in records
+            ],
+            batch_size=self.batch_size,
+        )
+
+    def _follows(self, records):
+        Follow.objects.bulk_create(
+            [
+                Follow(
+                    follower_id=self.user_ids[record["follower"]],
+                    followee_id=self.user_ids[record["followee"]],
+                )
+                for record in records
+                if record["follower"] != record["followee"]
+            ],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+
+    def _hashtags(self, records):
+        self._resolve_hashtags(record["name"] for record in records)
+
+    def _resolve_hashtags(self, names):
+        missing = {normalize_hashtag(name) for name in names} - {""}
+        missing -= self.hashtag_ids.keys()
+        if not missing:
+            return
+        Hashtag.objects.bulk_create(
+            [Hashtag(name=name) for name in missing],
+            batch_size=self.batch_size,
+            ignore_conflicts=True,
+        )
+        names = Hashtag.objects.filter(name__in=missing).values_list("name", "id")
+        self.hashtag_ids.update(names)
+
+    def _posts(self, records):
+        tags = [
+            {normalize_hashtag(name) for name in record.get("hashtag", ())} - {""}
+            for record in records
+        ]
+        self._resolve_hashtags(set().union(*tags))
+        posts = Post.objects.bulk_create(
+            [
+                Post(
+                    author_id=self.user_ids[record["author"]],
+                    title=record["title"],
+                    content=record["content"],
+                )
+                for record in records
+            ],
+            batch_size=self.batch_size,
+        )
+        Post.hashtag.through.objects.bulk_create(
+            [
+                Post.hashtag.through(post_id=post.id, hashtag_id=self.hashtag_ids[name])
+                for post, names in zip(posts, tags)
+                for name in names
+            ],
+            batch_size=self.batch_size,
+        )
+
+        # bulk_create stamps auto_now(_add) fields, restore given dates.
+        dated = []
+        for post, record in zip(posts, records):
+            if record.get("created"):
+                post.created = post.updated = parse_datetime(record["created"])
+                dated.append(post)
+        if dated:
+            Post.objects.bulk_update(
+                dated, ["created", "updated"], batch_size=self.batch_size
+            )
+
+    flushers = {
+        "user": _users,
+        "profile": _profiles,
+        "follow": _follows,
+        "hashtag": _hashtags,
+        "post": _posts,
+    }
@@ -0,0 +1,64 @@
+"""Exact maintenance of the denormalized ``Profile`` counters.
+
+Counters move with ``F()`` expressions whenever a ``Follow`` edge or a
+``Post`` is created or deleted, inside the caller's transaction. The
+``refresh_*`` functions recompute them from the source tables with a
+single correlated ``UPDATE`` and are used to repair drift. Every change
+also moves ``Profile.updated`` so conditional GETs see the new counts.
+"""
+from django.db.models import Count, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from post.models import Post
+
+from .models import Follow, Profile
+
+
+def _count(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef("user_id")})
+            .order_by()
+            .values(field)
+            .annotate(total=Count("*"))
+            .values("total")
+        ),
+        0,
+    )
+
+
+def refresh_follow_counts(user_ids=None):
+    profiles = Profile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    return profiles.update(
+        following_count=_count(Follow.objects.all(), "follower_id"),
+        followers_count=_count(Follow.objects.all(), "followee_id"),
+        updated=timezone.now(),
+    )
+
+
+def refresh_post_counts(user_ids=None):
+    profiles = Profile.objects.all()
+    if user_ids is not None:
+        profiles = profiles.filter(user_id__in=user_ids)
+    return profiles.update(
+        posts_count=_count(Post.objects.all(), "author_id"), updated=timezone.now()
+    )
+
+
+def change_follow_counts(follower_id, followee_id, delta):
+    now = timezone.now()
+    Profile.objects.filter(user_id=follower_id).update(
+        following_count=F("following_count") + delta, updated=now
+    )
+    Profile.objects.filter(user_id=followee_id).update(
+        followers_count=F("followers_count") + delta, updated=now
+    )
+
+
+def change_post_count(user_id, delta):
+    Profile.objects.filter(user_id=user_id).update(
+        posts_count=F("posts_count") + delta, updated=timezone.now()
+    )
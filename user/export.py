@@ -0,0 +1,92 @@
+"""Streaming export of a user's profile, posts and social graph.
+
+``records`` yields one dict per exported row while walking the tables
+with ``.iterator(chunk_size=...)``, and ``ndjson`` / ``csv_lines``
+encode them lazily, so memory stays bounded by ``CHUNK_SIZE`` whatever
+the number of posts or follows.
+"""
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from post.models import Post
+
+from .models import Follow, Profile
+
+CHUNK_SIZE = 500
+
+CSV_FIELDS = (
+    "type",
+    "id",
+    "email",
+    "username",
+    "bio",
+    "title",
+    "content",
+    "hashtag",
+    "created",
+    "updated",
+)
+
+
+def records(user):
+    yield {"type": "user", "id": user.id, "email": user.email}
+
+    profile = Profile.objects.filter(user=user).first()
+    if profile is not None:
+        yield {
+            "type": "profile",
+            "id": profile.id,
+            "username": profile.username,
+            "bio": profile.bio,
+            "updated": profile.updated,
+        }
+
+    posts = Post.objects.filter(author=user).order_by("id").prefetch_related("hashtag")
+    for post in posts.iterator(chunk_size=CHUNK_SIZE):
+        yield {
+            "type": "post",
+            "id": post.id,
+            "title": post.title,
+            "content": post.content,
+            "hashtag": [hashtag.name for hashtag in post.hashtag.all()],
+            "created": post.created,
+            "updated": post.updated,
+        }
+
+    for kind, edges, field in (
+        ("follower", Follow.objects.filter(followee=user), "follower"),
+        ("following", Follow.objects.filter(follower=user), "followee"),
+    ):
+        rows = edges.order_by("id").values_list(f"{field}__email", "created")
+        for email, created in rows.iterator(chunk_size=CHUNK_SIZE):
+            yield {"type": kind, "email": email, "created": created}
+
+
+def ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder) + "\n"
+
+
+class _Echo:
+    """File-like object handing back what ``csv.writer`` writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.DictWriter(_Echo(), CSV_FIELDS)
+    yield writer.writeheader()
+    for row in rows:
+        yield writer.writerow(
+            {
+                key: json.dumps(value) if key == "hashtag" else _text(value)
+                for key, value in row.items()
+            }
+        )
+
+
+def _text(value):
+    return value.isoformat() if hasattr(value, "isoformat") else value
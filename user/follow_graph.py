@@ -0,0 +1,129 @@
+"""In-process follow graph for "people you may know" suggestions.
+
+Each user's followees are kept as a sorted ``array("q")`` of user ids, 8
+bytes per edge, so a two-hop walk only reads the arrays of the user's
+followees instead of joining ``Follow`` with itself. The graph is loaded
+lazily in one pass over ``Follow``, kept up to date incrementally from the
+``Follow`` signals of this process and fully reloaded every
+``FOLLOW_GRAPH["TTL"]`` seconds to pick up writes made by other workers.
+"""
+import bisect
+import heapq
+import threading
+import time
+from array import array
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+from django.conf import settings
+
+from .models import Follow
+
+CHUNK_SIZE = 10000
+
+EMPTY = array("q")
+
+
+def _add(graph, follower_id, followee_id):
+    followees = graph.get(follower_id, EMPTY)
+    position = bisect.bisect_left(followees, followee_id)
+    if position == len(followees) or followees[position] != followee_id:
+        followees = array("q", followees)
+        followees.insert(position, followee_id)
+        graph[follower_id] = followees
+
+
+def _remove(graph, follower_id, followee_id):
+    followees = graph.get(follower_id, EMPTY)
+    position = bisect.bisect_left(followees, followee_id)
+    if position < len(followees) and followees[position] == followee_id:
+        followees = array("q", followees)
+        del followees[position]
+        graph[follower_id] = followees
+
+
+class FollowGraph:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._following = {}
+        self._loaded_at = None
+        # Edge changes seen while a load runs, one log per load.
+        self._pending = []
+        self._lock = threading.Lock()
+
+    def _ensure_loaded(self):
+        with self._lock:
+            if (
+                self._loaded_at is not None
+                and time.monotonic() - self._loaded_at < self.ttl
+            ):
+                return
+            changes = []
+            self._pending.append(changes)
+        try:
+            following = self._load()
+        except BaseException:
+            with self._lock:
+                self._pending.remove(changes)
+            raise
+        with self._lock:
+            self._pending.remove(changes)
+            # The query may have missed edges changed since it started.
+            for apply, edge in changes:
+                apply(following, *edge)
+            self._following = following
+            self._loaded_at = time.monotonic()
+
+    @staticmethod
+    def _load():
+        # Outlives the request, so never loaded from a lagging replica.
+        edges = Follow.objects.using("default").order_by("follower_id", "followee_id")
+        edges = edges.values_list("follower_id", "followee_id")
+        return {
+            follower: array("q", map(itemgetter(1), group))
+            for follower, group in groupby(
+                edges.iterator(chunk_size=CHUNK_SIZE), key=itemgetter(0)
+            )
+        }
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    # Writers replace arrays instead of mutating them, so readers can walk
+    # the graph without taking the lock.
+
+    def _change(self, apply, follower_id, followee_id):
+        with self._lock:
+            apply(self._following, follower_id, followee_id)
+            for changes in self._pending:
+                changes.append((apply, (follower_id, followee_id)))
+
+    def add(self, follower_id, followee_id):
+        self._change(_add, follower_id, followee_id)
+
+    def remove(self, follower_id, followee_id):
+        self._change(_remove, follower_id, followee_id)
+
+    def suggest(self, user_id, limit=10):
+        """Users followed by the followees of ``user_id`` but not by them.
+
+        Returns ``(user id, mutual count)`` pairs, most mutual follows
+        first and lower ids first among equals.
+        """
+        self._ensure_loaded()
+        graph = self._following
+        followees = graph.get(user_id, EMPTY)
+        mutual = Counter()
+        for followee in followees:
+            mutual.update(graph.get(followee, EMPTY))
+        mutual.pop(user_id, None)
+        for followee in followees:
+            mutual.pop(followee, None)
+        return heapq.nsmallest(
+            limit, mutual.items(), key=lambda item: (-item[1], item[0])
+        )
+
+
+follow_graph = FollowGraph(getattr(settings, "FOLLOW_GRAPH", {}).get("TTL", 300))
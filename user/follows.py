@@ -0,0 +1,51 @@
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Follow
+
+
+def follow(follower_id, followee_id):
+    """Create the edge if missing, return whether it was created."""
+    _, created = Follow.objects.get_or_create(
+        follower_id=follower_id, followee_id=followee_id
+    )
+    return created
+
+
+def unfollow(follower_id, followee_id):
+    """Delete the edge if present, return whether it existed."""
+    deleted, _ = Follow.objects.filter(
+        follower_id=follower_id, followee_id=followee_id
+    ).delete()
+    return bool(deleted)
+
+
+def toggle(follower_id, followee_id):
+    """Flip the edge, return ``True`` if ``follower`` now follows ``followee``."""
+    with transaction.atomic():
+        if unfollow(follower_id, followee_id):
+            return False
+        follow(follower_id, followee_id)
+        return True
+
+
+def relationships(user_id, other_ids):
+    """Map each of ``other_ids`` to ``(following, followed_by)`` flags.
+
+    One query over both directions, each side served by an index on
+    ``Follow``.
+    """
+    edges = Follow.objects.filter(
+        Q(follower_id=user_id, followee_id__in=other_ids)
+        | Q(followee_id=user_id, follower_id__in=other_ids)
+    ).values_list("follower_id", "followee_id")
+    following, followed_by = set(), set()
+    for follower_id, followee_id in edges:
+        if follower_id == user_id:
+            following.add(followee_id)
+        else:
+            followed_by.add(follower_id)
+    return {
+        other_id: (other_id in following, other_id in followed_by)
+        for other_id in other_ids
+    }
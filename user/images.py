@@ -0,0 +1,106 @@
+"""Processing of uploaded profile pictures.
+
+Uploads are validated, re-encoded without metadata (EXIF, GPS, ICC
+comments) and downsized to ``MAX_DIMENSION`` while the profile is saved.
+Square thumbnail variants, so clients never need to download the original
+for an avatar, are rendered by a queued job (``user.tasks``).
+"""
+import io
+import os
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError, features
+
+OPTIONS = {
+    "MAX_UPLOAD_BYTES": 5 * 1024 * 1024,
+    "MAX_PIXELS": 40_000_000,
+    "MAX_DIMENSION": 2048,
+    "VARIANTS": (64, 256, 1024),
+    "QUALITY": 85,
+    **getattr(settings, "PROFILE_IMAGES", {}),
+}
+
+
+def output_format():
+    return ("WEBP", "webp") if features.check("webp") else ("JPEG", "jpg")
+
+
+def validate_image_upload(file):
+    if file.size > OPTIONS["MAX_UPLOAD_BYTES"]:
+        raise ValidationError(
+            "Image files may not be larger than %(limit)s bytes.",
+            params={"limit": OPTIONS["MAX_UPLOAD_BYTES"]},
+            code="image_too_large",
+        )
+    position = file.tell() if hasattr(file, "tell") else 0
+    try:
+        with Image.open(file) as image:
+            width, height = image.size
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError):
+        raise ValidationError("Upload a valid image.", code="invalid_image")
+    finally:
+        file.seek(position)
+    if width * height > OPTIONS["MAX_PIXELS"]:
+        raise ValidationError(
+            "Images may not have more than %(limit)s pixels.",
+            params={"limit": OPTIONS["MAX_PIXELS"]},
+            code="image_too_many_pixels",
+        )
+
+
+def _load(file):
+    file.seek(0)
+    with Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        # A fresh RGB(A) copy carries none of the source metadata.
+        mode = "RGBA" if image.mode in ("RGBA", "LA", "P") else "RGB"
+        return image.convert(mode)
+
+
+def _encode(image):
+    pil_format, _ = output_format()
+    if pil_format == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = io.BytesIO()
+    image.save(buffer, pil_format, quality=OPTIONS["QUALITY"], optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def process_profile_image(profile):
+    """Replace ``profile.image`` by a cleaned, downsized copy.
+
+    Must run before the profile is saved, while ``profile.image`` still
+    holds the uncommitted upload. The variants are rendered afterwards
+    from the stored copy by ``render_variants``.
+    """
+    _, extension = output_format()
+    image = _load(profile.image.file)
+    image.thumbnail((OPTIONS["MAX_DIMENSION"], OPTIONS["MAX_DIMENSION"]))
+    profile.image.save(f"avatar.{extension}", _encode(image), save=False)
+
+
+def render_variants(storage, name):
+    """Render the square variants of the stored image ``name``.
+
+    Returns the variant paths keyed by size.
+    """
+    _, extension = output_format()
+    with storage.open(name) as file:
+        image = _load(file)
+    stem, _ = os.path.splitext(name)
+    variants = {}
+    for size in OPTIONS["VARIANTS"]:
+        edge = min(size, *image.size)
+        variant = ImageOps.fit(image, (edge, edge), Image.Resampling.LANCZOS)
+        variants[str(size)] = storage.save(
+            f"{stem}_{size}.{extension}", _encode(variant)
+        )
+    return variants
+
+
+def delete_files(storage, names):
+    for name in names:
+        if name:
+            storage.delete(name)
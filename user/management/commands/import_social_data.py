@@ -0,0 +1,55 @@
+import json
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from user.bulk_import import Importer, mute_signals
+
+
+class Command(BaseCommand):
+    help = (
+        "Load users, profiles, follows, hashtags and posts from NDJSON (see "
+        "user.bulk_import) in batches with signals disabled, then rebuild "
+        "timelines, counters and the search index."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="NDJSON file to load, '-' for stdin.")
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--password",
+            default="password",
+            help="Password of users without a 'password' hash in the input.",
+        )
+
+    def handle(self, *args, **options):
+        importer = Importer(options["batch_size"], options["password"])
+        source = sys.stdin if options["path"] == "-" else open(options["path"])
+        try:
+            with source, transaction.atomic(), mute_signals():
+                for number, line in enumerate(source, 1):
+                    if not line.strip():
+                        continue
+                    try:
+                        importer.add(json.loads(line))
+                    except (ValueError, KeyError) as error:
+                        raise CommandError(f"Line {number}: {error!r}")
+                    if options["verbosity"] > 1 and number % 100000 == 0:
+                        self.stdout.write(f"{number} lines, {importer.rate:.0f} rows/s")
+                try:
+                    importer.flush()
+                except (ValueError, KeyError) as error:
+                    raise CommandError(f"Last batch: {error!r}")
+                loaded = sum(importer.counts.values())
+                rate = importer.rate
+                self.stdout.write("Rebuilding timelines, counters and search index.")
+                importer.finish()
+        except OSError as error:
+            raise CommandError(error)
+
+        for kind, count in sorted(importer.counts.items()):
+            self.stdout.write(f"{kind:<10} {count:>10}")
+        self.stdout.write(
+            self.style.SUCCESS(f"Imported {loaded} rows at {rate:.0f} rows/s.")
+        )
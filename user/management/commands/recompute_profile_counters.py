@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from user import counters
+
+
+class Command(BaseCommand):
+    help = "Recompute follower, following and post counters of every profile."
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = counters.refresh_follow_counts()
+            counters.refresh_post_counts()
+        self.stdout.write(self.style.SUCCESS(f"Recomputed {updated} profiles."))
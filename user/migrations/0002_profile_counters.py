@@ -0,0 +1,55 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:54
+
+from django.db import migrations, models
+
+
+def populate_counters(apps, schema_editor):
+    Profile = apps.get_model("user", "Profile")
+    Post = apps.get_model("post", "Post")
+    Following = Profile.following.through
+
+    followers, following, posts = {}, {}, {}
+    for owner_id, user_id in Following.objects.values_list(
+        "profile__user_id", "user_id"
+    ):
+        following[owner_id] = following.get(owner_id, 0) + 1
+        followers[user_id] = followers.get(user_id, 0) + 1
+    for author_id in Post.objects.values_list("author_id", flat=True):
+        posts[author_id] = posts.get(author_id, 0) + 1
+
+    profiles = list(Profile.objects.all())
+    for profile in profiles:
+        profile.followers_count = followers.get(profile.user_id, 0)
+        profile.following_count = following.get(profile.user_id, 0)
+        profile.posts_count = posts.get(profile.user_id, 0)
+    Profile.objects.bulk_update(
+        profiles,
+        ["followers_count", "following_count", "posts_count"],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0001_initial"),
+        ("post", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="followers_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="following_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="profile",
+            name="posts_count",
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(populate_counters, migrations.RunPython.noop),
+    ]
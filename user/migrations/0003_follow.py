@@ -0,0 +1,116 @@
+# Generated by Django 4.2.2 on 2026-10-18 19:56
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def copy_follow_edges(apps, schema_editor):
+    Profile = apps.get_model("user", "Profile")
+    Follow = apps.get_model("user", "Follow")
+
+    edges = set(
+        Profile.following.through.objects.values_list("profile__user_id", "user_id")
+    )
+    edges.update(
+        Profile.followers.through.objects.values_list("user_id", "profile__user_id")
+    )
+    Follow.objects.bulk_create(
+        [
+            Follow(follower_id=follower_id, followee_id=followee_id)
+            for follower_id, followee_id in edges
+            if follower_id != followee_id
+        ],
+        batch_size=1000,
+    )
+
+    followers, following = {}, {}
+    for follower_id, followee_id in Follow.objects.values_list(
+        "follower_id", "followee_id"
+    ):
+        following[follower_id] = following.get(follower_id, 0) + 1
+        followers[followee_id] = followers.get(followee_id, 0) + 1
+    profiles = list(Profile.objects.all())
+    for profile in profiles:
+        profile.followers_count = followers.get(profile.user_id, 0)
+        profile.following_count = following.get(profile.user_id, 0)
+    Profile.objects.bulk_update(
+        profiles, ["followers_count", "following_count"], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0002_profile_counters"),
+        ("post", "0002_timelineentry"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Follow",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("created", models.DateTimeField(auto_now_add=True)),
+                (
+                    "followee",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="follower_edges",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+                (
+                    "follower",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="following_edges",
+                        to=settings.AUTH_USER_MODEL,
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="follow",
+            index=models.Index(fields=["followee", "follower"], name="follow_followee"),
+        ),
+        migrations.AddConstraint(
+            model_name="follow",
+            constraint=models.UniqueConstraint(
+                fields=("follower", "followee"), name="unique_follow"
+            ),
+        ),
+        migrations.AddConstraint(
+            model_name="follow",
+            constraint=models.CheckConstraint(
+                check=models.Q(("follower", models.F("followee")), _negated=True),
+                name="no_self_follow",
+            ),
+        ),
+        migrations.RunPython(copy_follow_edges, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name="profile",
+            name="followers",
+        ),
+        migrations.RemoveField(
+            model_name="profile",
+            name="following",
+        ),
+        migrations.AddField(
+            model_name="user",
+            name="following",
+            field=models.ManyToManyField(
+                blank=True,
+                related_name="followers",
+                through="user.Follow",
+                to=settings.AUTH_USER_MODEL,
+            ),
+        ),
+    ]
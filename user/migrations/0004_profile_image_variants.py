@@ -0,0 +1,29 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:04
+
+from django.db import migrations, models
+import user.images
+import user.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0003_follow"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="image_variants",
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name="profile",
+            name="image",
+            field=models.ImageField(
+                blank=True,
+                null=True,
+                upload_to=user.models.profile_picture,
+                validators=[user.images.validate_image_upload],
+            ),
+        ),
+    ]
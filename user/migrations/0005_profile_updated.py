@@ -0,0 +1,17 @@
+# Generated by Django 4.2.2 on 2026-10-18 20:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0004_profile_image_variants"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="updated",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
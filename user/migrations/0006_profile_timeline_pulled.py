@@ -0,0 +1,25 @@
+# Generated by Django 4.2.2 on 2026-10-18 21:32
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def flag_pulled_authors(apps, schema_editor):
+    Profile = apps.get_model("user", "Profile")
+    threshold = getattr(settings, "TIMELINE", {}).get("PULL_THRESHOLD", 10000)
+    Profile.objects.filter(followers_count__gte=threshold).update(timeline_pulled=True)
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("user", "0005_profile_updated"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="profile",
+            name="timeline_pulled",
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(flag_pulled_authors, migrations.RunPython.noop),
+    ]
@@ -2,12 +2,18 @@ import os
 import uuid
 
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Q
+from django.db.models.fields.related_descriptors import ManyToManyDescriptor
+from django.utils.functional import cached_property
 from django.utils.text import slugify
 from django.utils.translation import gettext_lazy as _
 
+from jobs import queue
 from social_media_api import settings
 
+from .images import delete_files, process_profile_image, validate_image_upload
+
 
 class UserManager(BaseUserManager):
     use_in_migrations = True
@@ -38,9 +44,74 @@ class UserManager(BaseUserManager):
         return self._create_user(email, password, **extra_fields)
 
 
+class ReadOnlyManyToManyDescriptor(ManyToManyDescriptor):
+    """``ManyToManyDescriptor`` whose related managers refuse writes."""
+
+    write_methods = (
+        "add",
+        "remove",
+        "clear",
+        "set",
+        "create",
+        "get_or_create",
+        "update_or_create",
+    )
+
+    @cached_property
+    def related_manager_cls(self):
+        def refuse(name):
+            def method(manager, *args, **kwargs):
+                raise AttributeError(
+                    f"Cannot use {name}() on {self.rel.field}, it is read-only."
+                )
+
+            return method
+
+        manager_cls = super().related_manager_cls
+        methods = {}
+        for name in self.write_methods:
+            methods[name] = refuse(name)
+            methods[f"a{name}"] = refuse(f"a{name}")
+        return type(f"ReadOnly{manager_cls.__name__}", (manager_cls,), methods)
+
+
+class FollowsField(models.ManyToManyField):
+    """Read-only ``ManyToManyField`` over ``Follow`` edges.
+
+    Writing through the relation would skip the ``Follow`` signals that
+    keep counters, timelines and the follow graph in sync, so edges are
+    only written with ``user.follows``.
+    """
+
+    def contribute_to_class(self, cls, name, **kwargs):
+        super().contribute_to_class(cls, name, **kwargs)
+        setattr(cls, self.name, ReadOnlyManyToManyDescriptor(self.remote_field))
+
+    def contribute_to_related_class(self, cls, related):
+        super().contribute_to_related_class(cls, related)
+        setattr(
+            cls,
+            related.get_accessor_name(),
+            ReadOnlyManyToManyDescriptor(self.remote_field, reverse=True),
+        )
+
+    def deconstruct(self):
+        # Same schema and migration state as a plain ManyToManyField.
+        name, path, args, kwargs = super().deconstruct()
+        return name, "django.db.models.ManyToManyField", args, kwargs
+
+
 class User(AbstractUser):
     username = None
     email = models.EmailField(_("email address"), unique=True)
+    following = FollowsField(
+        "self",
+        through="Follow",
+        through_fields=("follower", "followee"),
+        symmetrical=False,
+        related_name="followers",
+        blank=True,
+    )
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = []
 
@@ -52,7 +123,7 @@ class User(AbstractUser):
 
 def profile_picture(instance, filename):
     _, extension = os.path.splitext(filename)
-    filename = f"{slugify(instance.title)}-{uuid.uuid4()}{extension}"
+    filename = f"{slugify(instance.username)}-{uuid.uuid4()}{extension}"
     return os.path.join("uploads/", filename)
 
 
@@ -64,13 +135,84 @@ class Profile(models.Model):
         upload_to=profile_picture,
         blank=True,
         null=True,
+        validators=[validate_image_upload],
     )
-    followers = models.ManyToManyField(
-        User, related_name="followers", blank=True, null=True
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
+    followers_count = models.PositiveIntegerField(default=0)
+    following_count = models.PositiveIntegerField(default=0)
+    posts_count = models.PositiveIntegerField(default=0)
+    # Followers pull this author's posts at read time (see post.timeline).
+    timeline_pulled = models.BooleanField(default=False, editable=False)
+    updated = models.DateTimeField(auto_now=True)
+
+    def save(self, *args, **kwargs):
+        stale = []
+        uploaded = self.image and not self.image._committed
+        if uploaded:
+            stale = self._stored_image_files()
+            process_profile_image(self)
+            self.image_variants = {}
+        elif not self.image and self.image_variants:
+            stale = self._stored_image_files()
+            self.image_variants = {}
+
+        super().save(*args, **kwargs)
+
+        if uploaded:
+            queue.enqueue(
+                "profile.render_variants", profile=self.pk, image=self.image.name
+            )
+            if queue.OPTIONS["EAGER"]:
+                # The job only wrote the row, show its variants right away.
+                self.refresh_from_db(fields=["image_variants", "updated"])
+        if stale:
+            storage = self.image.storage
+            transaction.on_commit(lambda: delete_files(storage, stale))
+
+    def _stored_image_files(self):
+        if self.pk is None:
+            return []
+        stored = Profile.objects.filter(pk=self.pk).values("image", "image_variants")
+        stored = stored.first()
+        if stored is None:
+            return []
+        return [stored["image"], *(stored["image_variants"] or {}).values()]
+
+    def __str__(self):
+        return f"{self.user} profile"
+
+
+class Follow(models.Model):
+    """Edge of the social graph: ``follower`` follows ``followee``.
+
+    Create and delete edges through this model (see ``user.follows``);
+    ``User.following`` and ``User.followers`` are read-only.
+    """
+
+    follower = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="following_edges",
     )
-    following = models.ManyToManyField(
-        User, related_name="following", blank=True, null=True
+    followee = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="follower_edges",
     )
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=("follower", "followee"), name="unique_follow"
+            ),
+            models.CheckConstraint(
+                check=~Q(follower=F("followee")), name="no_self_follow"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=("followee", "follower"), name="follow_followee"),
+        ]
 
     def __str__(self):
-        return f"{self.user} profile"
+        return f"{self.follower} follows {self.followee}"
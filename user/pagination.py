@@ -0,0 +1,5 @@
+from social_media_api.pagination import KeysetCursorPagination
+
+
+class ProfileCursorPagination(KeysetCursorPagination):
+    ordering = ("id",)
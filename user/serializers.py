@@ -1,10 +1,12 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
 
+from social_media_api.instrumentation import TimedSerializerMixin
+
 from .models import Profile, User
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     class Meta:
         model = get_user_model()
         fields = ("id", "username", "email", "password", "is_staff")
@@ -35,10 +37,45 @@ class FollowsSerializer(serializers.ModelSerializer):
         return instance.email
 
 
-class ProfileListSerializer(serializers.ModelSerializer):
-    followers = FollowsSerializer(read_only=True, many=True)
-    following = FollowsSerializer(read_only=True, many=True)
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Map of thumbnail size to absolute URL of the rendered variant."""
+
+    def to_representation(self, variants):
+        storage = Profile._meta.get_field("image").storage
+        request = self.context.get("request")
+        urls = {}
+        for size, name in variants.items():
+            url = storage.url(name)
+            urls[size] = request.build_absolute_uri(url) if request else url
+        return urls
+
+
+def includes_follows(request):
+    """Whether ``request`` opted into the follower and following lists."""
+    return request.query_params.get("include") == "follows"
+
+
+class FollowListsMixin:
+    """Serve the ``followers``/``following`` email lists on request only.
+
+    The lists grow with the audience of a profile, the counters do not, so
+    the lists are left out unless the ``include_follows`` context is set.
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if not self.context.get("include_follows"):
+            del fields["followers"], fields["following"]
+        return fields
+
+
+class ProfileListSerializer(
+    FollowListsMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
+    followers = FollowsSerializer(source="user.followers", read_only=True, many=True)
+    following = FollowsSerializer(source="user.following", read_only=True, many=True)
     user = serializers.CharField(source="user.email")
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Profile
@@ -48,16 +85,24 @@ class ProfileListSerializer(serializers.ModelSerializer):
             "username",
             "bio",
             "image",
+            "image_variants",
             "followers",
             "following",
+            "followers_count",
+            "following_count",
+            "posts_count",
         )
+        read_only_fields = ("followers_count", "following_count", "posts_count")
 
 
-class ProfileDetailSerializer(serializers.ModelSerializer):
+class ProfileDetailSerializer(
+    FollowListsMixin, TimedSerializerMixin, serializers.ModelSerializer
+):
     email = serializers.EmailField(source="user.email")
-    followers = FollowsSerializer(read_only=True, many=True)
-    following = FollowsSerializer(read_only=True, many=True)
+    followers = FollowsSerializer(source="user.followers", read_only=True, many=True)
+    following = FollowsSerializer(source="user.following", read_only=True, many=True)
     user = serializers.CharField(source="user.email")
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Profile
@@ -67,6 +112,45 @@ class ProfileDetailSerializer(serializers.ModelSerializer):
             "email",
             "username",
             "image",
+            "image_variants",
             "followers",
             "following",
+            "followers_count",
+            "following_count",
+            "posts_count",
         )
+        read_only_fields = ("followers_count", "following_count", "posts_count")
+
+
+class ProfileSuggestionSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    user = serializers.CharField(source="user.email", read_only=True)
+    mutual_follows = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Profile
+        fields = (
+            "id",
+            "user",
+            "username",
+            "image",
+            "followers_count",
+            "mutual_follows",
+        )
+
+
+class RelationshipSerializer(TimedSerializerMixin, serializers.Serializer):
+    id = serializers.IntegerField()
+    following = serializers.BooleanField()
+    followed_by = serializers.BooleanField()
+
+
+class RelationshipQuerySerializer(TimedSerializerMixin, serializers.Serializer):
+    # User ids are 64-bit primary keys.
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1, max_value=2**63 - 1),
+        allow_empty=False,
+    )
+
+
+class FollowSwitchSerializer(TimedSerializerMixin, serializers.Serializer):
+    follow = serializers.BooleanField(required=False, allow_null=True, default=None)
@@ -0,0 +1,69 @@
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from . import counters
+from .authentication import invalidate_token, invalidate_user_tokens
+from .follow_graph import follow_graph
+from .models import Follow, Profile, User
+
+
+@receiver(post_delete, sender=Token, dispatch_uid="token_cache_delete")
+def drop_deleted_token(sender, instance, **kwargs):
+    invalidate_token(instance.key)
+
+
+@receiver(post_save, sender=User, dispatch_uid="token_cache_user_save")
+def drop_tokens_of_changed_user(sender, instance, created, raw=False, **kwargs):
+    # Covers password changes, deactivation and any other field a cached
+    # ``request.user`` would otherwise serve stale.
+    if not created and not raw:
+        invalidate_user_tokens(instance)
+
+
+@receiver(post_save, sender=User, dispatch_uid="profile_touch_user_save")
+def touch_profiles_showing_user(
+    sender, instance, created, raw=False, update_fields=None, **kwargs
+):
+    # Profiles show their owner's email and those of followers and followees.
+    if created or raw or (update_fields is not None and "email" not in update_fields):
+        return
+    Profile.objects.filter(
+        Q(user=instance)
+        | Q(user__following_edges__followee=instance)
+        | Q(user__follower_edges__follower=instance)
+    ).update(updated=timezone.now())
+
+
+@receiver(post_save, sender=Profile, dispatch_uid="profile_counters_init")
+def init_profile_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.refresh_follow_counts([instance.user_id])
+        counters.refresh_post_counts([instance.user_id])
+
+
+@receiver(post_save, sender=Follow, dispatch_uid="follow_counters_increment")
+def increment_follow_counters(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        counters.change_follow_counts(instance.follower_id, instance.followee_id, 1)
+
+
+@receiver(post_delete, sender=Follow, dispatch_uid="follow_counters_decrement")
+def decrement_follow_counters(sender, instance, **kwargs):
+    counters.change_follow_counts(instance.follower_id, instance.followee_id, -1)
+
+
+@receiver(post_save, sender=Follow, dispatch_uid="follow_graph_add")
+def add_follow_edge(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        edge = instance.follower_id, instance.followee_id
+        transaction.on_commit(lambda: follow_graph.add(*edge))
+
+
+@receiver(post_delete, sender=Follow, dispatch_uid="follow_graph_remove")
+def remove_follow_edge(sender, instance, **kwargs):
+    edge = instance.follower_id, instance.followee_id
+    transaction.on_commit(lambda: follow_graph.remove(*edge))
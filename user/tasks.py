@@ -0,0 +1,25 @@
+"""Queued side effects of profile writes (see ``jobs.queue``)."""
+from django.utils import timezone
+
+from jobs.queue import task
+
+from .images import delete_files, render_variants
+from .models import Profile
+
+
+@task("profile.render_variants", batch_size=10)
+def render_profile_variants(payloads):
+    for payload in payloads:
+        profile = Profile.objects.filter(
+            pk=payload["profile"], image=payload["image"]
+        ).first()
+        if profile is None:
+            # Deleted or replaced since, the newer upload has its own job.
+            continue
+        storage = profile.image.storage
+        variants = render_variants(storage, profile.image.name)
+        rendered = Profile.objects.filter(
+            pk=profile.pk, image=profile.image.name
+        ).update(image_variants=variants, updated=timezone.now())
+        if not rendered:
+            delete_files(storage, variants.values())
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from user.authentication import DjangoTokenCache, token_cache
+
+User = get_user_model()
+
+
+class CachedTokenAuthenticationTest(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="testpassword",
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION="Token " + self.token.key)
+
+    def test_cached_token_skips_database(self):
+        self.client.get(reverse("user:manage"))
+
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse("user:manage"))
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["email"], "test@example.com")
+
+    def test_invalid_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token invalid")
+        response = self.client.get(reverse("user:manage"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_logout_invalidates_token(self):
+        self.client.get(reverse("user:manage"))
+
+        response = self.client.delete(reverse("user:logout"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(Token.objects.filter(user=self.user).exists())
+
+        response = self.client.get(reverse("user:manage"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_refreshes_cached_user(self):
+        self.client.get(reverse("user:manage"))
+        self.client.patch(reverse("user:manage"), {"password": "newpassword"})
+
+        self.assertIsNone(token_cache.get(self.token.key))
+        response = self.client.get(reverse("user:manage"))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_deactivation_invalidates_token(self):
+        self.client.get(reverse("user:manage"))
+
+        self.user.is_active = False
+        self.user.save()
+
+        response = self.client.get(reverse("user:manage"))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class DjangoTokenCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.token_cache = DjangoTokenCache("default", 60)
+
+    def test_clear_drops_tokens_only(self):
+        self.token_cache.set("key", "token")
+        cache.set("other", "value")
+
+        self.token_cache.clear()
+
+        self.assertIsNone(self.token_cache.get("key"))
+        self.assertEqual(cache.get("other"), "value")
+        self.token_cache.set("key", "token")
+        self.assertEqual(self.token_cache.get("key"), "token")
+
+    async def test_async_access_shares_entries(self):
+        await self.token_cache.aset("key", "token")
+        self.assertEqual(self.token_cache.get("key"), "token")
+
+        self.token_cache.clear()
+
+        self.assertIsNone(await self.token_cache.aget("key"))
@@ -1,7 +1,21 @@
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError
+from django.db.models.signals import post_save
+from django.test import TestCase, override_settings
+from PIL import Image
 
-from user.models import Profile
+from post.models import Post
+from user import bulk_import, follows, images
+from user.models import Follow, Profile
 
 User = get_user_model()
 
@@ -49,3 +63,274 @@ class ProfileModelTest(TestCase):
 
     def test_profile_str(self):
         self.assertEqual(str(self.profile), "test@example.com profile")
+
+
+class ProfileCountersTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="test@example.com",
+            password="testpassword",
+        )
+        self.profile = Profile.objects.create(
+            user=self.user,
+            username="testuser",
+            bio="Test bio",
+        )
+
+    def test_posts_count_follows_create_and_delete(self):
+        post = Post.objects.create(author=self.user, title="t", content="c")
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.posts_count, 1)
+
+        post.delete()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.posts_count, 0)
+
+    def test_new_profile_picks_up_existing_posts(self):
+        other = User.objects.create_user(email="o@example.com", password="pass")
+        Post.objects.create(author=other, title="t", content="c")
+
+        profile = Profile.objects.create(user=other, username="other", bio="")
+        profile.refresh_from_db()
+        self.assertEqual(profile.posts_count, 1)
+
+    def test_recompute_command_repairs_drift(self):
+        other = User.objects.create_user(email="o@example.com", password="pass")
+        Profile.objects.create(user=other, username="other", bio="")
+        Follow.objects.create(follower=self.user, followee=other)
+        Post.objects.create(author=self.user, title="t", content="c")
+        Profile.objects.update(followers_count=7, following_count=7, posts_count=7)
+
+        call_command("recompute_profile_counters", stdout=StringIO())
+
+        self.profile.refresh_from_db()
+        self.assertEqual(self.profile.following_count, 1)
+        self.assertEqual(self.profile.followers_count, 0)
+        self.assertEqual(self.profile.posts_count, 1)
+        self.assertEqual(Profile.objects.get(user=other).followers_count, 1)
+
+
+class FollowModelTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(email="a@example.com", password="pass")
+        self.other = User.objects.create_user(email="b@example.com", password="pass")
+        self.profile = Profile.objects.create(user=self.user, username="a", bio="")
+        self.other_profile = Profile.objects.create(
+            user=self.other, username="b", bio=""
+        )
+
+    def test_edge_is_unique(self):
+        Follow.objects.create(follower=self.user, followee=self.other)
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(follower=self.user, followee=self.other)
+
+    def test_self_follow_is_rejected(self):
+        with self.assertRaises(IntegrityError):
+            Follow.objects.create(follower=self.user, followee=self.user)
+
+    def test_relation_is_readable_from_both_sides(self):
+        Follow.objects.create(follower=self.user, followee=self.other)
+        self.assertEqual(list(self.user.following.all()), [self.other])
+        self.assertEqual(list(self.other.followers.all()), [self.user])
+
+    def test_relation_is_read_only(self):
+        for write in (
+            lambda: self.user.following.add(self.other),
+            lambda: self.user.following.set([self.other]),
+            lambda: self.other.followers.remove(self.user),
+            lambda: self.other.followers.clear(),
+        ):
+            with self.assertRaises(AttributeError):
+                write()
+        self.assertFalse(Follow.objects.exists())
+
+    def test_follow_and_unfollow_are_idempotent(self):
+        self.assertTrue(follows.follow(self.user.id, self.other.id))
+        self.assertFalse(follows.follow(self.user.id, self.other.id))
+        self.other_profile.refresh_from_db()
+        self.assertEqual(self.other_profile.followers_count, 1)
+
+        self.assertTrue(follows.unfollow(self.user.id, self.other.id))
+        self.assertFalse(follows.unfollow(self.user.id, self.other.id))
+        self.other_profile.refresh_from_db()
+        self.assertEqual(self.other_profile.followers_count, 0)
+
+    def test_deleting_user_updates_counters(self):
+        Follow.objects.create(follower=self.user, followee=self.other)
+        self.user.delete()
+        self.other_profile.refresh_from_db()
+        self.assertEqual(self.other_profile.followers_count, 0)
+
+
+def make_image(size=(3000, 2000), image_format="JPEG", **save_kwargs):
+    buffer = BytesIO()
+    Image.new("RGB", size, "orange").save(buffer, image_format, **save_kwargs)
+    return SimpleUploadedFile(
+        f"photo.{image_format.lower()}",
+        buffer.getvalue(),
+        content_type=f"image/{image_format.lower()}",
+    )
+
+
+class ProfileImageTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.profile = Profile.objects.create(
+            user=self.user, username="Test User", bio="Test bio"
+        )
+
+    def test_upload_is_downsized_stripped_and_thumbnailed(self):
+        exif = Image.Exif()
+        exif[0x010F] = "Camera maker"
+        self.profile.image = make_image(exif=exif.tobytes())
+        self.profile.save()
+
+        self.assertTrue(self.profile.image.name.startswith("uploads/test-user-"))
+        with Image.open(self.profile.image.path) as original:
+            self.assertEqual(max(original.size), images.OPTIONS["MAX_DIMENSION"])
+            self.assertFalse(original.getexif())
+
+        self.assertEqual(set(self.profile.image_variants), {"64", "256", "1024"})
+        for size, name in self.profile.image_variants.items():
+            with Image.open(self.profile.image.storage.path(name)) as variant:
+                self.assertEqual(variant.size, (int(size), int(size)))
+                self.assertEqual(variant.format, images.output_format()[0])
+
+    def test_variants_never_upscale(self):
+        self.profile.image = make_image(size=(100, 80))
+        self.profile.save()
+
+        name = self.profile.image_variants["1024"]
+        with Image.open(self.profile.image.storage.path(name)) as variant:
+            self.assertEqual(variant.size, (80, 80))
+
+    def test_replacing_image_deletes_old_files(self):
+        self.profile.image = make_image()
+        self.profile.save()
+        storage = self.profile.image.storage
+        old_files = [self.profile.image.name, *self.profile.image_variants.values()]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.profile.image = None
+            self.profile.save()
+
+        self.assertEqual(self.profile.image_variants, {})
+        for name in old_files:
+            self.assertFalse(storage.exists(name))
+
+    def test_validation_limits(self):
+        with self.assertRaises(ValidationError):
+            images.validate_image_upload(
+                SimpleUploadedFile(
+                    "big.jpg", b"0" * (images.OPTIONS["MAX_UPLOAD_BYTES"] + 1)
+                )
+            )
+        with self.assertRaises(ValidationError):
+            images.validate_image_upload(
+                SimpleUploadedFile("fake.jpg", b"not an image")
+            )
+
+
+class ImportSocialDataTest(TestCase):
+    records = [
+        {"type": "user", "id": 10, "email": "ann@example.com"},
+        {"type": "user", "id": 20, "email": "bob@example.com"},
+        {"type": "profile", "user": 10, "username": "ann", "bio": "Hi"},
+        {"type": "profile", "user": 20, "username": "bob"},
+        {"type": "follow", "follower": 20, "followee": 10},
+        {"type": "follow", "follower": 20, "followee": 20},
+        {"type": "hashtag", "name": "Django"},
+        {
+            "type": "post",
+            "author": 10,
+            "title": "Imported",
+            "content": "Content",
+            "hashtag": ["django", "python"],
+            "created": "2023-06-01T12:00:00Z",
+        },
+        {"type": "post", "author": 10, "title": "Second", "content": "Content"},
+    ]
+
+    def load(self, records, **options):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "data.ndjson")
+        with open(path, "w") as file:
+            file.writelines(json.dumps(record) + "\n" for record in records)
+        stdout = StringIO()
+        call_command("import_social_data", path, stdout=stdout, **options)
+        return stdout.getvalue()
+
+    def test_import(self):
+        output = self.load(self.records, batch_size=2)
+
+        self.assertIn("Imported 9 rows", output)
+        ann = User.objects.get(email="ann@example.com")
+        bob = User.objects.get(email="bob@example.com")
+        self.assertTrue(ann.check_password("password"))
+        self.assertEqual(list(bob.following.all()), [ann])
+        post = Post.objects.get(title="Imported")
+        self.assertEqual(post.created.year, 2023)
+        self.assertEqual(
+            sorted(post.hashtag.values_list("name", flat=True)), ["django", "python"]
+        )
+
+    def test_derived_data_is_rebuilt(self):
+        self.load(self.records)
+
+        ann = Profile.objects.get(username="ann")
+        self.assertEqual(ann.followers_count, 1)
+        self.assertEqual(ann.posts_count, 2)
+        bob = User.objects.get(email="bob@example.com")
+        self.assertEqual(bob.timeline.count(), 2)
+
+    def test_signals_are_muted_while_loading(self):
+        calls = []
+
+        def receiver(**kwargs):
+            calls.append(kwargs)
+
+        post_save.connect(receiver, sender=Post)
+        self.addCleanup(post_save.disconnect, receiver, sender=Post)
+        with bulk_import.mute_signals():
+            Post.objects.create(
+                author=User.objects.create_user(email="x@example.com"),
+                title="t",
+                content="c",
+            )
+        Post.objects.create(author=User.objects.get(), title="t", content="c")
+
+        self.assertEqual(len(calls), 1)
+
+    def test_unknown_record_type(self):
+        with self.assertRaisesMessage(CommandError, "Line 1"):
+            self.load([{"type": "comment"}])
+
+    def test_unknown_user_in_last_batch(self):
+        records = [
+            self.records[0],
+            {"type": "post", "author": 10, "title": "t", "content": "c"},
+            {"type": "post", "author": 99, "title": "t", "content": "c"},
+        ]
+        with self.assertRaisesMessage(CommandError, "Line 3: ValueError"):
+            self.load(records, batch_size=100)
+        self.assertFalse(User.objects.exists())
+
+    def test_missing_field_is_reported_on_its_line(self):
+        records = [self.records[0], {"type": "post", "author": 10, "title": "t"}]
+        with self.assertRaisesMessage(CommandError, "Line 2: KeyError('content')"):
+            self.load(records, batch_size=1)
+
+    def test_invalid_created_date(self):
+        for created in ("yesterday", "2023-02-30T12:00:00Z", 20230601):
+            post = {"type": "post", "author": 10, "title": "t", "content": "c"}
+            with self.assertRaisesMessage(CommandError, "Line 2: ValueError"):
+                self.load([self.records[0], {**post, "created": created}])
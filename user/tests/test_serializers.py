@@ -93,8 +93,10 @@ class ProfileListSerializerTest(TestCase):
             "username": "testuser",
             "bio": "Test bio",
             "image": None,
-            "followers": [],
-            "following": [],
+            "image_variants": {},
+            "followers_count": 0,
+            "following_count": 0,
+            "posts_count": 0,
         }
         self.assertEqual(serializer.data, expected_data)
 
@@ -119,7 +121,20 @@ class ProfileDetailSerializerTest(TestCase):
             "email": "test@example.com",
             "username": "testuser",
             "image": None,
-            "followers": [],
-            "following": [],
+            "image_variants": {},
+            "followers_count": 0,
+            "following_count": 0,
+            "posts_count": 0,
         }
         self.assertEqual(serializer.data, expected_data)
+
+    def test_follow_lists_on_request(self):
+        other = User.objects.create_user(email="other@example.com")
+        other.following_edges.create(followee=self.user)
+
+        serializer = ProfileDetailSerializer(
+            instance=self.profile, context={"include_follows": True}
+        )
+
+        self.assertEqual(serializer.data["followers"], ["other@example.com"])
+        self.assertEqual(serializer.data["following"], [])
@@ -1,11 +1,25 @@
+import csv
+import io
+import json
+import shutil
+import tempfile
+from base64 import b64encode
+from unittest import mock
+
+from asgiref.sync import sync_to_async
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.urls import reverse
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APIClient
 
-from user.models import Profile
+from post.models import Hashtag, Post
+from user import export, follows
+from user.follow_graph import follow_graph
+from user.models import Follow, Profile
+from user.tests.test_models import make_image
 
 User = get_user_model()
 
@@ -85,8 +99,27 @@ class ProfileViewSetTest(TestCase):
     def test_list_profiles(self):
         response = self.client.get(reverse("user:profile-list"))
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["user"], "test@example.com")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["user"], "test@example.com")
+
+    def test_list_profiles_is_paginated_by_id(self):
+        other = User.objects.create_user(
+            email="other@example.com", password="testpassword"
+        )
+        Profile.objects.create(user=other, username="other", bio="Other bio")
+
+        first = self.client.get(reverse("user:profile-list"), {"page_size": 1})
+        second = self.client.get(first.data["next"])
+
+        self.assertEqual(first.data["results"][0]["username"], "testuser")
+        self.assertEqual(second.data["results"][0]["username"], "other")
+        self.assertIsNone(second.data["next"])
+
+    def test_tampered_cursor(self):
+        for position in ([None], [{"id": 1}], [2**64], ["-99999999999999999999"]):
+            cursor = b64encode(json.dumps({"p": position}).encode()).decode()
+            response = self.client.get(reverse("user:profile-list"), {"cursor": cursor})
+            self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, position)
 
     def test_retrieve_profile(self):
         response = self.client.get(
@@ -100,11 +133,472 @@ class ProfileViewSetTest(TestCase):
             reverse("user:profile-list"), {"username": "testuser"}
         )
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["user"], "test@example.com")
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["user"], "test@example.com")
 
     def test_filter_profiles_by_bio(self):
         response = self.client.get(reverse("user:profile-list"), {"bio": "bio"})
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), 1)
+        self.assertEqual(response.data["results"][0]["user"], "test@example.com")
+
+
+class ProfileViewSetQueryCountTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="viewer@example.com", password="testpassword"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+
+    def create_profiles(self, count):
+        profiles = []
+        for i in range(count):
+            user = User.objects.create_user(
+                email=f"user{i}@example.com", password="testpassword"
+            )
+            profile = Profile.objects.create(user=user, username=f"user{i}", bio="")
+            Follow.objects.create(follower=self.user, followee=user)
+            Follow.objects.create(follower=user, followee=self.user)
+            profiles.append(profile)
+        return profiles
+
+    def test_list_query_count_does_not_grow_with_page_size(self):
+        self.create_profiles(10)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse("user:profile-list"))
+
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(response.data["results"][0]["followers_count"], 1)
+        self.assertNotIn("followers", response.data["results"][0])
+
+    def test_list_with_follows_query_count(self):
+        self.create_profiles(10)
+
+        # Profiles and the two follow prefetches.
+        with self.assertNumQueries(3):
+            response = self.client.get(
+                reverse("user:profile-list"), {"include": "follows"}
+            )
+
+        self.assertEqual(len(response.data["results"]), 10)
+        self.assertEqual(response.data["results"][0]["followers"], [self.user.email])
+
+    def test_retrieve_query_count(self):
+        profile = self.create_profiles(1)[0]
+
+        # Validator lookup and profile.
+        with self.assertNumQueries(2):
+            response = self.client.get(
+                reverse("user:profile-detail", args=[profile.id])
+            )
+
+        self.assertEqual(response.data["following_count"], 1)
+        self.assertNotIn("following", response.data)
+
+    def test_retrieve_with_follows_query_count(self):
+        profile = self.create_profiles(1)[0]
+
+        # Validator lookup, profile and the two follow prefetches.
+        with self.assertNumQueries(4):
+            response = self.client.get(
+                reverse("user:profile-detail", args=[profile.id]),
+                {"include": "follows"},
+            )
+
+        self.assertEqual(response.data["following"], [self.user.email])
+
+
+class FollowSwitchTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="follower@example.com", password="testpassword"
+        )
+        self.profile = Profile.objects.create(
+            user=self.user, username="follower", bio=""
+        )
+        self.target_user = User.objects.create_user(
+            email="target@example.com", password="testpassword"
+        )
+        self.target = Profile.objects.create(
+            user=self.target_user, username="target", bio=""
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("user:profile-follow-switch", args=[self.target.id])
+
+    def test_follow_and_unfollow_update_counters(self):
+        response = self.client.post(self.url)
+        self.assertEqual(response.data, {"status": "follow"})
+        self.target.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.target.followers_count, 1)
+        self.assertEqual(self.profile.following_count, 1)
+        self.assertEqual(list(self.user.following.all()), [self.target_user])
+
+        response = self.client.post(self.url)
+        self.assertEqual(response.data, {"status": "unfollow"})
+        self.target.refresh_from_db()
+        self.profile.refresh_from_db()
+        self.assertEqual(self.target.followers_count, 0)
+        self.assertEqual(self.profile.following_count, 0)
+
+    def test_explicit_state_is_idempotent(self):
+        for _ in range(2):
+            response = self.client.post(self.url, {"follow": True}, format="json")
+            self.assertEqual(response.data, {"status": "follow"})
+        self.assertEqual(Follow.objects.count(), 1)
+        self.target.refresh_from_db()
+        self.assertEqual(self.target.followers_count, 1)
+
+        for _ in range(2):
+            response = self.client.post(self.url, {"follow": False}, format="json")
+            self.assertEqual(response.data, {"status": "unfollow"})
+        self.assertEqual(Follow.objects.count(), 0)
+
+    def test_cannot_follow_yourself(self):
+        response = self.client.post(
+            reverse("user:profile-follow-switch", args=[self.profile.id])
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_counters_are_served(self):
+        self.client.post(self.url)
+        response = self.client.get(
+            reverse("user:profile-detail", args=[self.target.id])
+        )
+        self.assertEqual(response.data["followers_count"], 1)
+        self.assertEqual(response.data["following_count"], 0)
+
+
+class ProfileImageUploadTest(TestCase):
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+
+        self.user = User.objects.create_user(
+            email="test@example.com", password="testpassword"
+        )
+        self.profile = Profile.objects.create(
+            user=self.user, username="testuser", bio="Test bio"
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("user:profile-detail", args=[self.profile.id])
+
+    def test_upload_exposes_variant_urls(self):
+        response = self.client.patch(
+            self.url, {"image": make_image(size=(400, 300))}, format="multipart"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["image_variants"]), {"64", "256", "1024"})
+
+        response = self.client.get(self.url)
+        variants = response.data["image_variants"]
+        self.assertEqual(set(variants), {"64", "256", "1024"})
+        self.assertTrue(variants["64"].startswith("http://testserver/media/uploads/"))
+
+    def test_non_image_upload_is_rejected(self):
+        upload = SimpleUploadedFile("fake.jpg", b"not an image")
+        response = self.client.patch(self.url, {"image": upload}, format="multipart")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ProfileConditionalGetTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="poller@example.com", password="testpassword"
+        )
+        self.profile = Profile.objects.create(user=self.user, username="poller")
+        self.other = User.objects.create_user(
+            email="other@example.com", password="testpassword"
+        )
+        Profile.objects.create(user=self.other, username="other")
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("user:profile-detail", args=[self.profile.id])
+
+    def test_matching_etag_returns_not_modified(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_if_modified_since(self):
+        last_modified = self.client.get(self.url)["Last-Modified"]
+
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_follow_changes_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+        Follow.objects.create(follower=self.other, followee=self.user)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["followers_count"], 1)
+
+    def test_follow_lists_have_their_own_etag(self):
+        etag = self.client.get(self.url)["ETag"]
+
+        response = self.client.get(
+            self.url, {"include": "follows"}, HTTP_IF_NONE_MATCH=etag
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.data["followers"], [])
+
+    def test_follower_email_change_changes_etag(self):
+        Follow.objects.create(follower=self.other, followee=self.user)
+        params = {"include": "follows"}
+        etag = self.client.get(self.url, params)["ETag"]
+        self.other.email = "renamed@example.com"
+        self.other.save()
+
+        response = self.client.get(self.url, params, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["followers"], ["renamed@example.com"])
+
+
+class ExportViewTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="exporter@example.com", password="testpassword"
+        )
+        Profile.objects.create(user=self.user, username="exporter", bio="Bio")
+        self.friend = User.objects.create_user(
+            email="friend@example.com", password="testpassword"
+        )
+        Follow.objects.create(follower=self.friend, followee=self.user)
+        Follow.objects.create(follower=self.user, followee=self.friend)
+        hashtag = Hashtag.objects.create(name="django")
+        for i in range(5):
+            post = Post.objects.create(
+                author=self.user, title=f"Post {i}", content="Content"
+            )
+            post.hashtag.add(hashtag)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("user:export")
+
+    def test_ndjson_export(self):
+        response = self.client.get(self.url)
+
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+        types = [row["type"] for row in rows]
+        self.assertEqual(
+            types, ["user", "profile", *["post"] * 5, "follower", "following"]
+        )
+        self.assertEqual(rows[2]["hashtag"], ["django"])
+        self.assertEqual(rows[-1]["email"], "friend@example.com")
+
+    def test_csv_export(self):
+        response = self.client.get(self.url, {"output": "csv"})
+
+        self.assertEqual(response["Content-Type"], "text/csv")
+        content = b"".join(response.streaming_content).decode()
+        rows = list(csv.DictReader(io.StringIO(content)))
+        self.assertEqual(len(rows), 9)
+        self.assertEqual(rows[2]["title"], "Post 0")
+        self.assertEqual(json.loads(rows[2]["hashtag"]), ["django"])
+
+    def test_posts_are_read_in_chunks(self):
+        with mock.patch.object(export, "CHUNK_SIZE", 2):
+            response = self.client.get(self.url)
+            # Profile, one cursor over the posts with a hashtag prefetch per
+            # chunk of two, and one cursor per follow direction.
+            with self.assertNumQueries(7):
+                lines = list(response.streaming_content)
+
+        self.assertEqual(len(lines), 9)
+
+    def test_unknown_output(self):
+        response = self.client.get(self.url, {"output": "xml"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncProfileDetailTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="viewer@example.com", password="testpassword"
+        )
+        self.other = User.objects.create_user(
+            email="other@example.com", password="testpassword"
+        )
+        self.profile = Profile.objects.create(user=self.other, username="other")
+        Follow.objects.create(follower=self.user, followee=self.other)
+        token = Token.objects.create(user=self.user)
+        self.headers = {"Authorization": f"Token {token.key}"}
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    async def test_matches_sync_detail(self):
+        include = {"include": "follows"}
+        for params, followers in (({}, None), (include, ["viewer@example.com"])):
+            response = await self.async_client.get(
+                reverse("user:async-profile-detail", args=[self.profile.id]),
+                params,
+                headers=self.headers,
+            )
+            expected = await sync_to_async(self.client.get)(
+                reverse("user:profile-detail", args=[self.profile.id]), params
+            )
+
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.json(), expected.json())
+            self.assertEqual(response.json().get("followers"), followers)
+
+    async def test_missing_profile(self):
+        response = await self.async_client.get(
+            reverse("user:async-profile-detail", args=[self.profile.id + 1]),
+            headers=self.headers,
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class ProfileSuggestionsTest(TestCase):
+    def setUp(self):
+        follow_graph.invalidate()
+        self.addCleanup(follow_graph.invalidate)
+        self.users = {}
+        for name in ("me", "a", "b", "c", "d", "e"):
+            self.users[name] = User.objects.create_user(
+                email=f"{name}@example.com", password="testpassword"
+            )
+            # "e" has no profile and is never suggested.
+            if name != "e":
+                Profile.objects.create(user=self.users[name], username=name)
+        for follower, followee in (
+            ("me", "a"),
+            ("me", "b"),
+            ("a", "c"),
+            ("a", "d"),
+            ("a", "me"),
+            ("b", "c"),
+            ("b", "e"),
+        ):
+            follows.follow(self.users[follower].id, self.users[followee].id)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.users["me"])
+        self.url = reverse("user:profile-suggestions")
+
+    def suggest(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(row["username"], row["mutual_follows"]) for row in response.data]
+
+    def test_ranked_by_mutual_follows(self):
+        self.assertEqual(self.suggest(), [("c", 2), ("d", 1)])
+        self.assertEqual(self.suggest(limit=1), [("c", 2)])
+
+    def test_graph_is_loaded_once(self):
+        self.suggest()
+
+        with self.assertNumQueries(1):
+            self.suggest()
+
+    def test_graph_follows_follow_switch(self):
+        self.suggest()
+        profile = Profile.objects.get(user=self.users["c"])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("user:profile-follow-switch", args=[profile.id]))
+        self.assertEqual(self.suggest(), [("d", 1)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse("user:profile-follow-switch", args=[profile.id]))
+        self.assertEqual(self.suggest(), [("c", 2), ("d", 1)])
+
+    def test_changes_during_load_are_kept(self):
+        load = follow_graph._load
+
+        def load_while_unfollowing():
+            graph = load()
+            # Committed after the load query read the edges.
+            follow_graph.remove(self.users["a"].id, self.users["d"].id)
+            return graph
+
+        with mock.patch.object(follow_graph, "_load", load_while_unfollowing):
+            self.assertEqual(self.suggest(), [("c", 2)])
+
+    def test_invalid_limit(self):
+        response = self.client.get(self.url, {"limit": "x"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RelationshipsTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email="me@example.com", password="testpassword"
+        )
+        self.others = [
+            User.objects.create_user(
+                email=f"other{i}@example.com", password="testpassword"
+            )
+            for i in range(4)
+        ]
+        follows.follow(self.user.id, self.others[0].id)
+        follows.follow(self.user.id, self.others[1].id)
+        follows.follow(self.others[1].id, self.user.id)
+        follows.follow(self.others[2].id, self.user.id)
+        # Edges between other users are not the requester's relationships.
+        follows.follow(self.others[3].id, self.others[0].id)
+        self.client = APIClient()
+        self.client.force_authenticate(user=self.user)
+        self.url = reverse("user:profile-relationships")
+
+    def test_flags_in_one_query(self):
+        ids = ",".join(str(user.id) for user in reversed(self.others))
+
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, {"ids": ids})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [
+                (row["id"], row["following"], row["followed_by"])
+                for row in response.data
+            ],
+            [
+                (self.others[3].id, False, False),
+                (self.others[2].id, False, True),
+                (self.others[1].id, True, True),
+                (self.others[0].id, True, False),
+            ],
+        )
+
+    def test_duplicates_are_answered_once(self):
+        other = self.others[0].id
+        response = self.client.get(self.url, {"ids": f"{other},{other}"})
+
         self.assertEqual(len(response.data), 1)
-        self.assertEqual(response.data[0]["user"], "test@example.com")
+
+    def test_invalid_ids(self):
+        for ids in (
+            "",
+            "1,x",
+            "0",
+            "99999999999999999999",
+            ",".join(str(i) for i in range(1, 302)),
+        ):
+            response = self.client.get(self.url, {"ids": ids})
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
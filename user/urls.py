@@ -2,9 +2,11 @@ from rest_framework import routers
 
 from django.urls import path, include
 
+from user import async_views
 from user.views import (
     CreateUserView,
     CreateTokenView,
+    ExportView,
     ManageUserView,
     LogoutUserView,
     ProfileViewSet,
@@ -18,6 +20,12 @@ urlpatterns = [
     path("login/", CreateTokenView.as_view(), name="login"),
     path("logout/", LogoutUserView.as_view(), name="logout"),
     path("me/", ManageUserView.as_view(), name="manage"),
+    path("me/export/", ExportView.as_view(), name="export"),
+    path(
+        "async/profile/<int:pk>/",
+        async_views.profile_detail,
+        name="async-profile-detail",
+    ),
     path("", include(router.urls)),
 ]
 
@@ -1,20 +1,43 @@
+from functools import partial
+
+from django.http import StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import generics, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.settings import api_settings
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet
 
+from social_media_api.conditional import conditional_response, make_etag
+from social_media_api.db_router import ReplicaReadMixin
+from user import export, follows
+from user.follow_graph import follow_graph
+from user.authentication import CachedTokenAuthentication
 from user.models import Profile
+from user.pagination import ProfileCursorPagination
 from user.permissions import IsOwnerOrReadOnly
 from user.serializers import (
     UserSerializer,
     ProfileListSerializer,
     ProfileDetailSerializer,
+    ProfileSuggestionSerializer,
+    RelationshipSerializer,
+    RelationshipQuerySerializer,
+    FollowSwitchSerializer,
+    includes_follows,
+)
+
+INCLUDE_FOLLOWS = OpenApiParameter(
+    "include",
+    type=str,
+    enum=["follows"],
+    description="Add the followers and following email lists, "
+                "ex. ?include=follows",
 )
 
 
@@ -24,11 +47,11 @@ class CreateTokenView(ObtainAuthToken):
 
 class LogoutUserView(APIView):
     serializer_class = UserSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def delete(self, request):
-        request.usern.auth_toke.delete()
+        request.auth.delete()
         return Response(status=status.HTTP_200_OK)
 
 
@@ -36,28 +59,68 @@ class CreateUserView(generics.CreateAPIView):
     serializer_class = UserSerializer
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class ManageUserView(ReplicaReadMixin, generics.RetrieveUpdateAPIView):
     serializer_class = UserSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
 
     def get_object(self):
         return self.request.user
 
 
-class ProfileViewSet(ModelViewSet):
+class ExportView(APIView):
+    authentication_classes = (CachedTokenAuthentication,)
+    permission_classes = (IsAuthenticated,)
+    outputs = {
+        "ndjson": (export.ndjson, "application/x-ndjson"),
+        "csv": (export.csv_lines, "text/csv"),
+    }
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "output",
+                type=str,
+                enum=["ndjson", "csv"],
+                description="Export format (default ndjson) ex. ?output=csv",
+            ),
+        ],
+        responses={200: OpenApiTypes.BINARY},
+        description="Stream the profile, posts, followers and following of "
+        "the current user.",
+    )
+    def get(self, request):
+        output = request.query_params.get("output", "ndjson")
+        if output not in self.outputs:
+            raise ValidationError({"output": f"Choose from {list(self.outputs)}."})
+
+        encode, content_type = self.outputs[output]
+        response = StreamingHttpResponse(
+            encode(export.records(request.user)), content_type=content_type
+        )
+        response["Content-Disposition"] = f'attachment; filename="export.{output}"'
+        return response
+
+
+class ProfileViewSet(ReplicaReadMixin, ModelViewSet):
     queryset = Profile.objects.all()
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = [IsOwnerOrReadOnly, IsAuthenticated]
+    pagination_class = ProfileCursorPagination
+    max_suggestions = 50
+    max_relationships = 300
 
     def get_queryset(self):
-        queryset = self.queryset
+        queryset = self.queryset.select_related("user")
+        if self.action in ("list", "retrieve") and includes_follows(self.request):
+            queryset = queryset.prefetch_related("user__followers", "user__following")
+
         email = self.request.query_params.get("email")
         username = self.request.query_params.get("username")
 
         if email:
-            queryset = queryset.filter(email__contains=email)
+            queryset = queryset.filter(user__email__contains=email)
 
         if username:
             queryset = queryset.filter(username__contains=username)
@@ -69,6 +132,11 @@ class ProfileViewSet(ModelViewSet):
             return ProfileDetailSerializer
         return ProfileListSerializer
 
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context["include_follows"] = includes_follows(self.request)
+        return context
+
     @extend_schema(
         parameters=[
             OpenApiParameter(
@@ -83,20 +151,131 @@ class ProfileViewSet(ModelViewSet):
                 description="Filtering by bio (write some symbol that "
                             "contains in bio). ex. ?bio=bio",
             ),
+            INCLUDE_FOLLOWS,
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
 
-    @action(detail=True, methods=["post"])
+    @extend_schema(parameters=[INCLUDE_FOLLOWS])
+    def retrieve(self, request, *args, **kwargs):
+        render = partial(super().retrieve, request, *args, **kwargs)
+        if set(request.query_params) - {"include"} or not kwargs["pk"].isdigit():
+            return render()
+
+        updated = (
+            Profile.objects.filter(pk=kwargs["pk"])
+            .values_list("updated", flat=True)
+            .first()
+        )
+        if updated is None:
+            return render()
+        return conditional_response(
+            request,
+            render,
+            etag=make_etag(kwargs["pk"], updated, includes_follows(request)),
+            last_modified=updated,
+        )
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "limit",
+                type=int,
+                description="Maximum number of suggestions (default 10, max 50)",
+            ),
+        ],
+        responses=ProfileSuggestionSerializer(many=True),
+        description="Profiles followed by the people the user follows, "
+        "ranked by how many of them follow each one.",
+    )
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def suggestions(self, request):
+        try:
+            limit = min(
+                int(request.query_params.get("limit", 10)), self.max_suggestions
+            )
+        except ValueError:
+            raise ValidationError({"limit": "A valid integer is required."})
+
+        mutual = dict(follow_graph.suggest(request.user.pk, max(limit, 0)))
+        profiles = {
+            profile.user_id: profile
+            for profile in Profile.objects.select_related("user").filter(
+                user_id__in=mutual
+            )
+        }
+        suggestions = []
+        for user_id, count in mutual.items():
+            if user_id in profiles:
+                profiles[user_id].mutual_follows = count
+                suggestions.append(profiles[user_id])
+        return Response(ProfileSuggestionSerializer(suggestions, many=True).data)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                "ids",
+                type=str,
+                required=True,
+                description="Comma separated user ids, at most 300 "
+                            "ex. ?ids=1,2,3",
+            ),
+        ],
+        responses=RelationshipSerializer(many=True),
+        description="Whether the user follows and is followed by each of "
+        "the given users, in the order of ids.",
+    )
+    @action(detail=False, methods=["get"], permission_classes=[IsAuthenticated])
+    def relationships(self, request):
+        values = request.query_params.get("ids", "").split(",")
+        serializer = RelationshipQuerySerializer(
+            data={"ids": [value for value in values if value.strip()]}
+        )
+        serializer.is_valid(raise_exception=True)
+        ids = list(dict.fromkeys(serializer.validated_data["ids"]))
+        if len(ids) > self.max_relationships:
+            raise ValidationError(
+                {"ids": f"Ensure there are at most {self.max_relationships} ids."}
+            )
+
+        flags = follows.relationships(request.user.pk, ids)
+        return Response(
+            RelationshipSerializer(
+                [
+                    {"id": user_id, "following": following, "followed_by": followed}
+                    for user_id, (following, followed) in flags.items()
+                ],
+                many=True,
+            ).data
+        )
+
+    @extend_schema(
+        request=FollowSwitchSerializer,
+        description="Toggle following the profile, or pass "
+        '{"follow": true/false} to set the state idempotently.',
+    )
+    @action(detail=True, methods=["post"], permission_classes=[IsAuthenticated])
     def follow_switch(self, request, pk=None):
-        profile = Profile.objects.get(user=request.user)
+        profile = self.get_object()
         user = request.user
 
-        if profile.followers.filter(pk=user.pk).exists():
-            profile.followers.remove(user)
-            user.profile.following.remove(profile.user)
-            return Response({"status": "unfollow"})
-        profile.followers.add(user)
-        user.profile.following.add(profile.user)
-        return Response({"status": "follow"})
+        if profile.user_id == user.pk:
+            return Response(
+                {"detail": "You cannot follow yourself."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        serializer = FollowSwitchSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        desired = serializer.validated_data.get("follow")
+
+        if desired is None:
+            following = follows.toggle(user.pk, profile.user_id)
+        elif desired:
+            follows.follow(user.pk, profile.user_id)
+            following = True
+        else:
+            follows.unfollow(user.pk, profile.user_id)
+            following = False
+        return Response({"status": "follow" if following else "unfollow"})